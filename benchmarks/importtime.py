@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Import-time benchmark for `sigfoxapi`.
+
+Runs ``python -X importtime -c "import sigfoxapi"`` a number of times and
+reports the median cumulative import time of the `sigfoxapi` package and the
+most expensive modules it imports.
+
+The budget for ``import sigfoxapi`` is 25 ms cumulative (measured with the
+bytecode cache written by a warm-up import), and none of the modules in
+`LAZY_MODULES` must be imported. These are only loaded on the first
+request. The script exits with status 1 if either condition is violated.
+
+``-X importtime`` requires Python 3.7 or later.
+
+Usage::
+
+    python benchmarks/importtime.py [--runs 5] [--budget 25]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+BUDGET_MS = 25.0
+"""Budget for the cumulative import time of `sigfoxapi` in milliseconds."""
+
+LAZY_MODULES = ['drest', 'httplib2', 'http.client', 'urllib.request', 'sigfoxapi.requesthandler']
+"""Modules that must not be imported by ``import sigfoxapi``."""
+
+
+def importtime(module='sigfoxapi'):
+    """Import `module` in a fresh interpreter and return a dictionary
+       mapping the names of all imported modules to their cumulative
+       import time in microseconds.
+    """
+
+    command = [sys.executable, '-X', 'importtime', '-c', 'import %s' % (module)]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    _, stderr = proc.communicate()
+    if proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, command, stderr)
+
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--runs', type=int, default=5, help='number of runs (default: %(default)s)')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS,
+                        help='budget in milliseconds (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    # Write the bytecode cache so that all runs measure the same thing.
+    importtime()
+    runs = [importtime() for _ in range(args.runs)]
+    total = statistics.median(run['sigfoxapi'] for run in runs) / 1000.0
+
+    print('import sigfoxapi: %.1f ms (median of %d runs, budget %.1f ms)' % (total, args.runs, args.budget))
+    print()
+    print('Slowest imports:')
+    startup = importtime('sys')
+    last = dict((name, us) for name, us in runs[-1].items() if name not in startup)
+    for name in sorted(last, key=last.get, reverse=True)[1:11]:
+        print('  %8.1f ms  %s' % (last[name] / 1000.0, name))
+
+    failed = False
+    eager = [name for name in LAZY_MODULES if name in last]
+    if eager:
+        print()
+        print('FAIL: imported eagerly: %s' % (', '.join(eager)))
+        failed = True
+    if total > args.budget:
+        print()
+        print('FAIL: import time exceeds budget')
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
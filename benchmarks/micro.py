@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+CPU micro-benchmarks for the client-side hot paths of `sigfoxapi`.
+
+Every benchmark runs one operation on a synthetic page of 100 messages as
+returned by `Sigfox.devicetype_messages()`:
+
+* ``object_access``: read nested fields through `sigfoxapi.Object`
+  (``__getattr__`` and ``__getitem__`` wrapping).
+* ``object_concat``: concatenate ten pages with ``Object + Object``.
+* ``json_decode``: deserialize a response with drest's
+  ``JsonSerializationHandler``.
+* ``paging_parse``: extract the parameters of the ``paging`` URL like
+  `Sigfox.next()` does.
+* ``make_request``: `sigfoxapi.requesthandler.RequestHandler.make_request()`
+  with the transport replaced by a canned response, i.e. the merging of
+  parameters and headers, building the URL, serialization, tracing spans
+  and deserialization.
+
+For each benchmark the number of operations per second (best of `--repeat`
+timings) and the peak memory allocated by a single operation (measured with
+`tracemalloc`) are reported. ``--save`` writes the results to a baseline
+file. Later runs compare against it and exit with status 1 if a benchmark
+got slower by more than `--tolerance` or allocates more than
+`ALLOC_TOLERANCE` more memory. Baselines depend on the machine and the
+Python version and should be recorded where the comparison runs.
+
+Usage::
+
+    python benchmarks/micro.py [--save] [--baseline FILE] [--tolerance 0.25] [NAME ...]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+import sigfoxapi
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'micro-baseline.json')
+"""Default baseline file."""
+
+ALLOC_TOLERANCE = 0.10
+"""Allowed relative increase of the memory allocated per operation."""
+
+PAGE_SIZE = 100
+URL = 'https://backend.sigfox.com/api/devicetypes/5256c4d6c9a871b80f5a2e50/messages'
+
+
+def message(n):
+    """Return a synthetic message with the nesting of a real one."""
+
+    return {
+        'device': '%04X' % (n),
+        'time': 1496275200 + n,
+        'data': '%024x' % (n * 7919),
+        'snr': '%.2f' % (10 + n % 30 / 3.0),
+        'linkQuality': ['LIMIT', 'AVERAGE', 'GOOD', 'EXCELLENT'][n % 4],
+        'seqNumber': n,
+        'computedLocation': {'lat': 48.8 + n / 1000.0, 'lng': 2.3 + n / 1000.0,
+                             'radius': 1000 + n, 'source': 2, 'status': 1},
+        'rinfos': [{'tap': '%04X' % (n + k), 'delay': 1.5, 'lat': '48.0', 'lng': '2.0',
+                    'snr': '12.0', 'rssi': '-120.0'} for k in range(3)],
+    }
+
+
+def page(offset=0):
+    return {'data': [message(offset + n) for n in range(PAGE_SIZE)],
+            'paging': {'next': '%s?limit=%d&before=%d&offset=%d' % (URL, PAGE_SIZE, 1496275200,
+                                                                   offset + PAGE_SIZE)}}
+
+
+def setup_object_access():
+    data = sigfoxapi.Object(page()['data'])
+
+    def run():
+        for n in range(len(data)):
+            m = data[n]
+            m.device, m.time, m.computedLocation.lat, m['rinfos'][0]['snr']
+    return run
+
+
+def setup_object_concat():
+    pages = [sigfoxapi.Object(page(n * PAGE_SIZE)['data']) for n in range(10)]
+
+    def run():
+        messages = pages[0]
+        for other in pages[1:]:
+            messages = messages + other
+        return messages
+    return run
+
+
+def setup_json_decode():
+    import drest.serialization
+
+    handler = drest.serialization.JsonSerializationHandler()
+    body = json.dumps(page()).encode('utf-8')
+    return lambda: handler.deserialize(body)
+
+
+def setup_paging_parse():
+    import urllib.parse
+
+    response = page()
+
+    def run():
+        cursor = response['paging']['next'].split('?')[1]
+        return dict(urllib.parse.parse_qsl(cursor))
+    return run
+
+
+def setup_make_request():
+    s = sigfoxapi.Sigfox('login', 'password')
+    body = json.dumps(page()).encode('utf-8')
+    handler = s.api.request
+    handler._make_request = lambda url, method, payload=None, headers=None: ({'status': '200'}, body)
+    params = {'limit': PAGE_SIZE, 'before': 1496275200}
+    return lambda: handler.make_request('GET', URL, params=params, headers={'X-Trace': '1'})
+
+
+BENCHMARKS = [
+    ('object_access', setup_object_access),
+    ('object_concat', setup_object_concat),
+    ('json_decode', setup_json_decode),
+    ('paging_parse', setup_paging_parse),
+    ('make_request', setup_make_request),
+]
+
+
+def measure(func, repeat=5, seconds=0.2):
+    """Return ``(ops_per_second, peak_bytes)`` of `func`."""
+
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * seconds / 0.2))
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    func()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return 1.0 / best, peak
+
+
+def compare(results, baseline, tolerance):
+    """Return the list of regressions of `results` against `baseline`."""
+
+    regressions = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['ops'] < base['ops'] * (1 - tolerance):
+            regressions.append('%s: %.0f ops/s, baseline %.0f ops/s' % (name, result['ops'], base['ops']))
+        if result['alloc'] > base['alloc'] * (1 + ALLOC_TOLERANCE):
+            regressions.append('%s: %d bytes allocated, baseline %d bytes' % (
+                name, result['alloc'], base['alloc']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('names', nargs='*', help='benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timings (default: %(default)s)')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file (default: %(default)s)')
+    parser.add_argument('--save', action='store_true', help='save the results as baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative slowdown (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    selected = [(name, setup) for name, setup in BENCHMARKS if not args.names or name in args.names]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+
+    results = {}
+    for name, setup in selected:
+        ops, alloc = measure(setup(), repeat=args.repeat)
+        results[name] = {'ops': ops, 'alloc': alloc}
+        line = '%-14s %12.0f ops/s %10.1f KiB/op' % (name, ops, alloc / 1024.0)
+        if name in baseline:
+            line += '   %+6.1f%%' % ((ops / baseline[name]['ops'] - 1) * 100)
+        print(line)
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as fp:
+            json.dump(baseline, fp, indent=2, sort_keys=True)
+        print()
+        print('Saved baseline to %s' % (args.baseline))
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print()
+        for regression in regressions:
+            print('FAIL: %s' % (regression))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Replay benchmark for `sigfoxapi`.
+
+Sends every request recorded in a `sigfoxapi.cassette.Cassette` file through
+a `sigfoxapi.Sigfox` instance in replay mode and reports the number of
+requests per second and the slowest endpoint families. Without network
+access the results only depend on the client code, which makes them
+comparable between runs and machines.
+
+Record a cassette with ``Sigfox(..., cassette=Cassette(path, mode='record'))``.
+
+Usage::
+
+    python benchmarks/replay.py cassette.jsonl.gz [--runs 5] [--timing] [--profile]
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import cProfile
+import collections
+import json
+import pstats
+import statistics
+import sys
+import time
+import urllib.parse
+
+import sigfoxapi
+import sigfoxapi.breaker
+import sigfoxapi.cassette
+
+
+def replay(sigfox, exchanges):
+    """Send `exchanges` through `sigfox` and return a dictionary mapping
+       endpoint families to the total time spent in seconds.
+    """
+
+    times = collections.Counter()
+    for exchange in exchanges:
+        url, _, query = exchange['url'].partition('?')
+        path = url.split('/api/', 1)[-1]
+        if exchange['method'] == 'GET':
+            params = dict(urllib.parse.parse_qsl(query, True))
+        else:
+            params = json.loads(exchange['body']) if exchange['body'] else None
+
+        start = time.perf_counter()
+        try:
+            sigfox.request(exchange['method'], path, params)
+        except sigfoxapi.SigfoxApiError:
+            pass
+        times[sigfoxapi.breaker.endpoint(exchange['method'], path)] += time.perf_counter() - start
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('path', help='cassette file')
+    parser.add_argument('--runs', type=int, default=5, help='number of runs (default: %(default)s)')
+    parser.add_argument('--timing', action='store_true', help='replay with the recorded timings')
+    parser.add_argument('--profile', action='store_true', help='print a profile of the last run')
+    args = parser.parse_args(argv)
+
+    cassette = sigfoxapi.cassette.Cassette(args.path, timing=args.timing)
+    exchanges = cassette.exchanges()
+    sigfox = sigfoxapi.Sigfox('login', 'password', coalesce=False, cassette=cassette)
+
+    # The first run imports drest and fills caches.
+    replay(sigfox, exchanges)
+    runs = []
+    for run in range(args.runs):
+        profile = cProfile.Profile() if args.profile and run == args.runs - 1 else None
+        if profile is not None:
+            profile.enable()
+        times = replay(sigfox, exchanges)
+        if profile is not None:
+            profile.disable()
+        runs.append(times)
+
+    total = statistics.median(sum(times.values()) for times in runs)
+    print('%d requests: %.1f ms (median of %d runs), %.0f requests/s' % (
+        len(exchanges), total * 1000, args.runs, len(exchanges) / total if total else 0))
+    print()
+    print('Slowest endpoints:')
+    for name, seconds in runs[-1].most_common(10):
+        print('  %8.1f ms  %s' % (seconds * 1000, name))
+
+    if args.profile:
+        print()
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
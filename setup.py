@@ -33,9 +33,15 @@ setup(
     package_dir={'sigfoxapi': 'sigfoxapi'},
     include_package_data=True,
     install_requires=requirements,
+    extras_require={
+        'analytics': ['numpy'],
+    },
     license=__license__,
     zip_safe=False,
     keywords='sigfox',
+    entry_points={
+        'console_scripts': ['sigfoxapi = sigfoxapi.cli:main'],
+    },
     classifiers=[
         'Development Status :: 4 - Beta',
         'Intended Audience :: Developers',
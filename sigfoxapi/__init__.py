@@ -8,14 +8,16 @@ Inspired by https://pypi.python.org/pypi/pySigfox.
 """
 
 import copy
-import urllib.parse
 import functools
+import threading
 
-import drest
-import drest.exc
-import drest.serialization
+# `drest`, `sigfoxapi.requesthandler` (which pulls in `httplib2`) and
+# `urllib.parse` are imported on the first request only. Together they
+# account for most of the import time of this module. See
+# ``benchmarks/importtime.py``.
 
-import sigfoxapi.requesthandler
+import sigfoxapi.concurrency
+import sigfoxapi.tracing
 
 __author__ = 'Markus Juenemann <markus@juenemann.net>'
 __version__ = '0.3.0'
@@ -108,6 +110,27 @@ class SigfoxApiNotFound(SigfoxApiError):
     pass
 
 
+class SigfoxApiTimeout(SigfoxApiError):
+    """Exception raised when the deadline set with
+       `sigfoxapi.concurrency.deadline()` has passed.
+    """
+    pass
+
+
+class SigfoxApiCancelled(SigfoxApiError):
+    """Exception raised when a request has been cancelled through a
+       `sigfoxapi.concurrency.CancelToken`.
+    """
+    pass
+
+
+class SigfoxApiCircuitOpen(SigfoxApiError):
+    """Exception raised without sending the request while the circuit of a
+       `sigfoxapi.breaker.CircuitBreaker` is open.
+    """
+    pass
+
+
 class Object(object):
     """Convert a dictionary to an object.
 
@@ -132,7 +155,7 @@ class Object(object):
                 return Object(self._data[name])
             else:
                 return self._data[name]
-        except KeyError:
+        except (KeyError, TypeError):
             raise AttributeError(name)
 
     def __getitem__(self,  key):
@@ -147,6 +170,21 @@ class Object(object):
     def __len__(self):
         return len(self._data)
 
+    @property
+    def payload(self):
+        """The ``data`` field of a message decoded from hex as `bytes`. It
+           is decoded on first access, see `sigfoxapi.payload` to decode
+           the payloads of a page at once. Objects without a ``data``
+           field raise `AttributeError`.
+        """
+
+        if '_payload' not in self.__dict__:
+            if 'payload' in self._data or 'data' not in self._data:
+                # A field named payload or not a message.
+                return self.__getattr__('payload')
+            self.__dict__['_payload'] = bytes.fromhex(self._data['data'] or '')
+        return self.__dict__['_payload']
+
     def __add__(self, other):
         """Implement ``sigfoxapi.Object + sigfoxapi.Object``."""
         return Object(self._data + other._data)
@@ -155,6 +193,21 @@ class Object(object):
         self._data += other._data
         return self
 
+
+def _unwrap(data):
+    """Return the dictionary or list wrapped by `Object` or `data` itself."""
+    if isinstance(data, Object):
+        return data._data
+    return data
+
+
+def _seconds(timestamp):
+    """Return Unix seconds for timestamps in seconds or milliseconds. The
+       REST-API uses both.
+    """
+    return timestamp / 1000.0 if timestamp > 100000000000 else timestamp
+
+
 class Sigfox(object):
     """Interact with the Sigfox backend API.
 
@@ -162,6 +215,18 @@ class Sigfox(object):
                      Sigfox backend web interface.
        :param password: Password as shown on the *Group* - *REST API* pacge of the
                      Sigfox backend web interface.
+       :param tracer: Optional tracer for profiling requests. See `sigfoxapi.tracing`.
+       :param coalesce: Concurrent identical ``GET`` requests from several
+                     threads are sent only once and all threads receive the
+                     result. Set to ``False`` to disable this.
+       :param limiter: Optional `sigfoxapi.concurrency.RateLimiter` that every
+                     request sent to the backend has to pass.
+       :param hedger: Optional `sigfoxapi.hedging.Hedger` sending duplicates
+                     of slow ``GET`` requests.
+       :param breaker: Optional `sigfoxapi.breaker.CircuitBreaker` failing fast
+                     on endpoints that are currently failing.
+       :param cassette: Optional `sigfoxapi.cassette.Cassette` recording or
+                     replaying all HTTP exchanges.
 
        >>> s = Sigfox('1234567890abcdef', 'fedcba09876543221')
 
@@ -170,7 +235,8 @@ class Sigfox(object):
 
     """
 
-    def next(self, *args, **kwargs):
+    @property
+    def next(self):
         """Fetch the next page of results for some methods.
 
            Call this method whenever another method has returned only
@@ -190,24 +256,82 @@ class Sigfox(object):
            .. warning:: Be mindful that this may return a huge number of
                         results if used exactly as in the example above.
 
+           .. note:: `Sigfox.next` is kept separately for each thread so
+                     several threads can page through results of the same
+                     `Sigfox` instance.
+
         """
 
-        # `Sigfox.next()` will be set in `Sigfox.request()` to ``None`` or
+        # `Sigfox.next` will be set in `Sigfox.request()` to ``None`` or
         # a `functool.partial(...)` method matching the original method.
-        # The code here is only for documentation purposes.
-        pass
+        return getattr(self._local, 'next', None)
+
+
+    @next.setter
+    def next(self, value):
+        self._local.next = value
 
 
-    def __init__(self, login, password):
-        self.api = drest.API(SIGFOX_API_URL, debug=DEBUG,
-                             serialization_handler=drest.serialization.JsonSerializationHandler,
-                             serialize=True,
-                             deserialize=True,
-                             ignore_ssl_validation=IGNORE_SSL_VALIDATION,
-                             trailing_slash=False,
-                             request_handler = sigfoxapi.requesthandler.RequestHandler
-                             )
-        self.api.auth(login, password)
+    @property
+    def cursor(self):
+        """The query string of the next page of the last response, or
+           ``None`` if it was the last page. Passing its parameters as
+           keyword arguments to the same method continues where the
+           response left off.
+
+           >>> for messages in s.pages('device_messages', '4d3091a05ee16b3cc86699ab'):
+           ...     save(messages, s.cursor)
+
+           Like `Sigfox.next` it is kept separately for each thread.
+
+        """
+
+        return getattr(self._local, 'cursor', None)
+
+
+    def __init__(self, login, password, tracer=None, coalesce=True, limiter=None, hedger=None,
+                 breaker=None, cassette=None):
+        self.tracer = tracer or sigfoxapi.tracing.NULL_TRACER
+        self._singleflight = sigfoxapi.concurrency.SingleFlight(copy=copy.deepcopy) if coalesce else None
+        self.limiter = limiter
+        self.hedger = hedger
+        self.breaker = breaker
+        self.cassette = cassette
+        self._login = login
+        self._password = password
+        self._debug = DEBUG
+        self._ignore_ssl_validation = IGNORE_SSL_VALIDATION
+        self._api = None
+        self._api_lock = threading.Lock()
+        self._local = threading.local()
+
+
+    @property
+    def api(self):
+        """The `drest.API` instance. It is created on first access so that
+           importing `sigfoxapi` and creating `Sigfox` instances stays cheap.
+        """
+
+        if self._api is None:
+            with self._api_lock:
+                if self._api is None:
+                    import drest
+                    import drest.serialization
+                    import sigfoxapi.requesthandler
+
+                    api = drest.API(SIGFOX_API_URL, debug=self._debug,
+                                    serialization_handler=drest.serialization.JsonSerializationHandler,
+                                    serialize=True,
+                                    deserialize=True,
+                                    ignore_ssl_validation=self._ignore_ssl_validation,
+                                    trailing_slash=False,
+                                    request_handler = sigfoxapi.requesthandler.RequestHandler,
+                                    tracer=self.tracer,
+                                    cassette=self.cassette
+                                    )
+                    api.auth(self._login, self._password)
+                    self._api = api
+        return self._api
 
 
     def request(self, method, path, params=None, headers=None):
@@ -222,6 +346,164 @@ class Sigfox(object):
 
         """
 
+        return self._request(method, path, params, headers, 0, None)
+
+
+    def pages(self, method, *args, **kwargs):
+        """Iterate through all pages of results of a method.
+
+           :param method: Name of the method, e.g. ``device_messages``.
+           :param \*args: Positional arguments for the method.
+           :param \**kwargs: Keyword arguments for the method.
+
+           >>> for messages in s.pages('device_messages', '4d3091a05ee16b3cc86699ab'):
+           ...     print(len(messages))
+           100
+           100
+           100
+           10
+
+           Unlike the ``while s.next:`` loop shown for `Sigfox.next` this
+           keeps working if other methods are called in between.
+           `Sigfox.cursor` is the position after the page just returned
+           until the next method call.
+
+           The deadline and cancellation token active when `Sigfox.pages()`
+           is called (see `sigfoxapi.concurrency.deadline()`) apply to all
+           pages together.
+
+        """
+
+        return (page for page, _ in self._paginate(method, *args, **kwargs))
+
+
+    def _paginate(self, method, *args, **kwargs):
+        """Like `Sigfox.pages()` but yield tuples of ``(page, cursor)``.
+
+           `cursor` is the query string of the ``paging`` URL of the next page
+           or ``None`` for the last page. Passing the parameters of `cursor`
+           as keyword arguments to `method` continues where this left off.
+
+        """
+
+        return self._iterate(sigfoxapi.concurrency.current(), method, args, kwargs)
+
+
+    def _iterate(self, context, method, args, kwargs):
+        """Implement `Sigfox._paginate()`. Every page is fetched within
+           `context`, which must not stay active while the generator is
+           suspended.
+        """
+
+        with sigfoxapi.concurrency.use(context):
+            page = getattr(self, method)(*args, **kwargs)
+            next, cursor = self.next, self.cursor
+        while next:
+            yield page, cursor
+            with sigfoxapi.concurrency.use(context):
+                page = next()
+                next, cursor = self.next, self.cursor
+        yield page, None
+
+
+    def _request(self, method, path, params, headers, page, cursor):
+        """Implement `Sigfox.request()`.
+
+           :param page: Index of the page within a paged response, starting
+                        at ``0``.
+           :param cursor: Query string of the ``paging`` URL that lead to this
+                          page or ``None`` for the first page.
+
+        """
+
+        attributes = {'http.method': method, 'sigfoxapi.path': path, 'sigfoxapi.page': page}
+        if cursor:
+            attributes['sigfoxapi.cursor'] = cursor
+
+        import urllib.parse
+
+        with self.tracer.start_as_current_span('sigfoxapi.request', attributes=attributes) as span:
+            context = sigfoxapi.concurrency.current()
+            if context is not None:
+                context.check()
+
+            key = self._coalesce_key(method, path, params, headers)
+            if key is None:
+                response = self._send(method, path, params, headers)
+            else:
+                response, shared = self._singleflight.do(key, self._send, method, path, params, headers)
+                if shared:
+                    # Every waiting thread has received its own copy as
+                    # callers may modify the results, e.g.
+                    # ``messages += s.next()``.
+                    span.set_attribute('sigfoxapi.coalesced', True)
+
+            try:
+                data = response['data']
+            except (KeyError, TypeError):
+                data = response
+
+            # Set Sigfox.next()`by extracting the parameters from the 'next' URL and
+            # currying the self._request(). The query string is kept as
+            # `Sigfox.cursor`.
+            with self.tracer.start_as_current_span('sigfoxapi.paginate'):
+                self._local.cursor = None
+                try:
+                    next_cursor = response['paging']['next'].split('?')[1]
+                    next_params = dict(urllib.parse.parse_qsl(next_cursor))
+                    if next_params:
+                        try:
+                            params.update(next_params)
+                        except AttributeError:
+                            params = next_params
+                        self.next = functools.partial(self._request, method, path, params, headers,
+                                                      page + 1, next_cursor)
+                        self._local.cursor = next_cursor
+                    else:
+                        self.next = None
+                except (KeyError, TypeError):
+                    self.next = None
+
+            if RETURN_OBJECTS:  # and isinstance(data, dict):
+                return Object(data)
+            else:
+                return data
+
+
+    def _coalesce_key(self, method, path, params, headers):
+        """Return the key under which concurrent identical requests are
+           coalesced or ``None`` if the request must not be coalesced.
+        """
+
+        if self._singleflight is None or method != 'GET':
+            return None
+        try:
+            return (path, frozenset((params or {}).items()), frozenset((headers or {}).items()))
+        except TypeError:       # Unhashable parameter values
+            return None
+
+
+    def _send(self, method, path, params, headers):
+        """Send the request and return the deserialized response. HTTP errors
+           are mapped to `SigfoxApiError` and its subclasses.
+        """
+
+        send = self._transmit
+        if self.hedger is not None and method == 'GET':
+            send = functools.partial(self.hedger.call, self._transmit)
+        if self.breaker is not None:
+            return self.breaker.call(method, path, send, method, path, params, headers)
+        return send(method, path, params, headers)
+
+
+    def _transmit(self, method, path, params, headers):
+        """Implement `Sigfox._send()` for a single request."""
+
+        import drest.exc
+
+        if self.limiter is not None:
+            self.limiter.acquire()
+
         try:
             resp = self.api.make_request(method, path, params=params, headers=headers)
         except (drest.exc.dRestRequestError) as e:
@@ -238,30 +520,7 @@ class Sigfox(object):
             else:
                 raise SigfoxApiError(str(e))
 
-        try:
-            data = resp.data['data']
-        except (KeyError, TypeError):
-            data = resp.data
-
-        # Set Sigfox.next()`by extracting the parameters from the 'next' URL and
-        # currying the self.request().
-        try:
-            next_params = dict(urllib.parse.parse_qsl(resp.data['paging']['next'].split('?')[1]))
-            if next_params:
-                try:
-                    params.update(next_params)
-                except AttributeError:
-                    params = next_params
-                self.next = functools.partial(self.request,method, path, params, headers)
-            else:
-                self.next = None
-        except (KeyError, TypeError):
-            self.next = None
-
-        if RETURN_OBJECTS:  # and isinstance(data, dict):
-            return Object(data)
-        else:
-            return data
+        return resp.data
 
 
     def group_info(self, groupid):
@@ -359,12 +618,14 @@ class Sigfox(object):
 
            .. note:: The `changes` parameter may already contain the
                      devicetype identifier (``id``) but it will be overridden
-                     by `devicetypeid`.
+                     by `devicetypeid`. `changes` itself is not modified.
+
+           To edit many device types use `sigfoxapi.rollout.DeviceTypeRollout`
+           which only sends the fields that actually differ.
 
         """
 
-        changes.update({'id': devicetypeid})
-        return self.request('POST', '/devicetypes/edit', params=changes)
+        return self.request('POST', '/devicetypes/edit', params=dict(changes, id=devicetypeid))
 
 
     def devicetype_list(self):
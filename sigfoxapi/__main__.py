@@ -0,0 +1,10 @@
+"""
+Allow ``python -m sigfoxapi``. See `sigfoxapi.cli`.
+
+"""
+
+import sys
+
+import sigfoxapi.cli
+
+sys.exit(sigfoxapi.cli.main())
@@ -0,0 +1,300 @@
+"""
+Link-quality analytics over message streams with NumPy.
+
+`LinkQuality` turns pages of messages, e.g. from `Sigfox.pages()` of
+`Sigfox.devicetype_messages()`, into typed arrays and keeps per-device
+SNR statistics, the distribution of the ``linkQuality`` values and the most
+recent messages of every device. It is updated page by page, so reports
+can be refreshed as new pages arrive.
+
+>>> quality = LinkQuality(window=50)
+>>> for page in s.pages('devicetype_messages', '5256c4d6c9a871b80f5a2e50'):
+...     quality.update(page)
+>>> summary = quality.summary()
+>>> dict(zip(summary['device'], summary['mean']))
+{'002C': 14.2, '4830': 9.7, ...}
+>>> quality.degraded(drop=3.0)
+['4830']
+
+All computations on the accumulated data are vectorized. This module
+requires NumPy (``pip install sigfoxapi[analytics]``).
+
+"""
+
+import numpy
+
+import sigfoxapi
+import sigfoxapi.log
+
+LINK_QUALITIES = sigfoxapi.log.LINK_QUALITIES
+"""Link qualities in the order of the columns of `LinkQuality.distribution()`.
+   Column 0 counts messages without a link quality.
+"""
+
+_LINK_QUALITY = dict((name, n) for n, name in enumerate(LINK_QUALITIES))
+
+
+def _floats(values):
+    """Convert a list of numbers, numeric strings and ``None`` to a float
+       array with NaN for missing values.
+    """
+
+    return numpy.array(['nan' if value is None or value == '' else value for value in values]).astype(numpy.float64)
+
+
+def columns(page):
+    """Return the messages of a page as a dictionary of arrays: ``device``
+       (str), ``time`` (Unix seconds), ``snr``, ``link_quality`` (index into
+       `LINK_QUALITIES`), ``lat`` and ``lng`` of the computed location.
+       Missing values are NaN or 0.
+    """
+
+    messages = [sigfoxapi._unwrap(message) for message in sigfoxapi._unwrap(page)]
+    locations = [sigfoxapi._unwrap(message.get('computedLocation')) or {} for message in messages]
+
+    time = numpy.array([message['time'] for message in messages], dtype=numpy.float64)
+    time[time > 1e11] /= 1000.0
+
+    return {
+        'device': numpy.array([message['device'] for message in messages], dtype=str),
+        'time': time,
+        'snr': _floats([message.get('snr') for message in messages]),
+        'link_quality': numpy.array([_LINK_QUALITY.get(message.get('linkQuality'), 0)
+                                     for message in messages], dtype=numpy.int8),
+        'lat': _floats([location.get('lat') for location in locations]),
+        'lng': _floats([location.get('lng') for location in locations]),
+    }
+
+
+def device_columns(devices):
+    """Return the result of `Sigfox.device_list()` as a dictionary of arrays:
+       ``id``, ``averageSnr`` and ``averageRssi``.
+    """
+
+    devices = [sigfoxapi._unwrap(device) for device in sigfoxapi._unwrap(devices)]
+    return {
+        'id': numpy.array([device['id'] for device in devices], dtype=str),
+        'averageSnr': _floats([device.get('averageSnr') for device in devices]),
+        'averageRssi': _floats([device.get('averageRssi') for device in devices]),
+    }
+
+
+def _grow(array, size, fill):
+    if len(array) >= size:
+        return array
+    grown = numpy.full((size,) + array.shape[1:], fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class LinkQuality(object):
+    """Incremental per-device link-quality statistics.
+
+       :param window: Number of most recent messages per device kept for
+                      the recent statistics, `rolling()` and `degraded()`.
+
+       :ivar devices: List of device identifiers in the order of the arrays
+                      returned by `summary()` and `distribution()`.
+
+    """
+
+    def __init__(self, window=50):
+        self.window = window
+        self.devices = []
+        self._codes = {}
+        self._count = numpy.zeros(0, dtype=numpy.int64)
+        self._sum = numpy.zeros(0)
+        self._sumsq = numpy.zeros(0)
+        self._min = numpy.zeros(0)
+        self._max = numpy.zeros(0)
+        self._quality = numpy.zeros((0, len(LINK_QUALITIES)), dtype=numpy.int64)
+        # Ring buffers of the `window` newest messages with an SNR, one row
+        # per device. Unused slots have a NaN time. `_position` is the slot
+        # written next, which is the oldest one once a row is full.
+        self._recent_time = numpy.zeros((0, window))
+        self._recent_snr = numpy.zeros((0, window))
+        self._filled = numpy.zeros(0, dtype=numpy.int64)
+        self._position = numpy.zeros(0, dtype=numpy.int64)
+        self._newest = numpy.zeros(0)
+
+    def _encode(self, devices):
+        """Map device identifiers to consecutive integer codes."""
+
+        unique, inverse = numpy.unique(devices, return_inverse=True)
+        for deviceid in unique:
+            if deviceid not in self._codes:
+                self._codes[deviceid] = len(self.devices)
+                self.devices.append(str(deviceid))
+        lookup = numpy.array([self._codes[deviceid] for deviceid in unique], dtype=numpy.int64)
+        return lookup[inverse.reshape(-1)]
+
+    def update(self, page):
+        """Add the messages of a page.
+
+           :param page: List of messages or the result of `columns()`.
+           :returns: `self`
+
+        """
+
+        data = page if isinstance(page, dict) else columns(page)
+        if not len(data['device']):
+            return self
+
+        codes = self._encode(data['device'])
+        size = len(self.devices)
+        snr = data['snr']
+        valid = ~numpy.isnan(snr)
+
+        self._count = _grow(self._count, size, 0)
+        self._sum = _grow(self._sum, size, 0.0)
+        self._sumsq = _grow(self._sumsq, size, 0.0)
+        self._min = _grow(self._min, size, numpy.inf)
+        self._max = _grow(self._max, size, -numpy.inf)
+        self._quality = _grow(self._quality, size, 0)
+
+        self._count += numpy.bincount(codes[valid], minlength=size)
+        self._sum += numpy.bincount(codes[valid], weights=snr[valid], minlength=size)
+        self._sumsq += numpy.bincount(codes[valid], weights=snr[valid] ** 2, minlength=size)
+        numpy.minimum.at(self._min, codes[valid], snr[valid])
+        numpy.maximum.at(self._max, codes[valid], snr[valid])
+        self._quality += numpy.bincount(codes * len(LINK_QUALITIES) + data['link_quality'],
+                                        minlength=size * len(LINK_QUALITIES)
+                                        ).reshape(size, len(LINK_QUALITIES))
+
+        self._recent_time = _grow(self._recent_time, size, numpy.nan)
+        self._recent_snr = _grow(self._recent_snr, size, numpy.nan)
+        self._filled = _grow(self._filled, size, 0)
+        self._position = _grow(self._position, size, 0)
+        self._newest = _grow(self._newest, size, -numpy.inf)
+
+        code, time, snr = codes[valid], data['time'][valid], snr[valid]
+        order = numpy.lexsort((time, code))
+        code, time, snr = code[order], time[order], snr[order]
+
+        # Messages newer than all messages kept for their device (e.g. from
+        # polling) go to the ring buffer. Devices with older messages (e.g.
+        # pages of a backwards stream) are merged instead.
+        late = numpy.zeros(size, dtype=bool)
+        late[code[time < self._newest[code]]] = True
+        merge = late[code]
+        self._append(code[~merge], time[~merge], snr[~merge], size)
+        if merge.any():
+            self._merge(numpy.flatnonzero(late), code[merge], time[merge], snr[merge], size)
+        return self
+
+    def _append(self, code, time, snr, size):
+        """Write messages sorted by device and time to the ring buffers."""
+
+        if not len(code):
+            return
+        counts = numpy.bincount(code, minlength=size)
+        starts = numpy.cumsum(counts) - counts
+        rank = numpy.arange(len(code)) - starts[code]
+        keep = rank >= counts[code] - self.window
+        code, time, snr, rank = code[keep], time[keep], snr[keep], rank[keep]
+        rank -= numpy.maximum(counts - self.window, 0)[code]
+
+        slot = (self._position[code] + rank) % self.window
+        self._recent_time[code, slot] = time
+        self._recent_snr[code, slot] = snr
+
+        written = numpy.minimum(counts, self.window)
+        self._position = (self._position + written) % self.window
+        self._filled = numpy.minimum(self._filled + written, self.window)
+        numpy.maximum.at(self._newest, code, time)
+
+    def _merge(self, devices, code, time, snr, size):
+        """Merge messages sorted by device and time with the messages kept
+           for `devices` and rewrite their rows oldest first.
+        """
+
+        kept = ~numpy.isnan(self._recent_time[devices])
+        code = numpy.concatenate([numpy.repeat(devices, self.window)[kept.reshape(-1)], code])
+        time = numpy.concatenate([self._recent_time[devices][kept], time])
+        snr = numpy.concatenate([self._recent_snr[devices][kept], snr])
+        order = numpy.lexsort((time, code))
+
+        self._recent_time[devices] = numpy.nan
+        self._recent_snr[devices] = numpy.nan
+        self._filled[devices] = 0
+        self._position[devices] = 0
+        self._newest[devices] = -numpy.inf
+        self._append(code[order], time[order], snr[order], size)
+
+    def summary(self):
+        """Return a dictionary of arrays aligned with `devices`: ``device``,
+           ``count``, ``mean``, ``std``, ``min`` and ``max`` of the SNR of
+           all messages, and ``recent_count``, ``recent_mean`` and
+           ``recent_std`` of the `window` newest messages. Statistics of
+           devices without SNR values are NaN.
+        """
+
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            count = self._count.astype(numpy.float64)
+            mean = self._sum / count
+            std = numpy.sqrt(numpy.maximum(self._sumsq / count - mean ** 2, 0))
+
+            recent_count = self._filled.copy()
+            recent_sum = numpy.nansum(self._recent_snr, axis=1)
+            recent_sumsq = numpy.nansum(self._recent_snr ** 2, axis=1)
+            recent_mean = recent_sum / recent_count
+            recent_std = numpy.sqrt(numpy.maximum(recent_sumsq / recent_count - recent_mean ** 2, 0))
+
+        missing = self._count == 0
+        return {
+            'device': numpy.array(self.devices, dtype=str),
+            'count': self._count.copy(),
+            'mean': mean,
+            'std': std,
+            'min': numpy.where(missing, numpy.nan, self._min),
+            'max': numpy.where(missing, numpy.nan, self._max),
+            'recent_count': recent_count,
+            'recent_mean': recent_mean,
+            'recent_std': recent_std,
+        }
+
+    def distribution(self, normalize=False):
+        """Return an array with one row per device in `devices` and one
+           column per entry of `LINK_QUALITIES` with the number of messages
+           (or fractions if `normalize` is true).
+        """
+
+        if not normalize:
+            return self._quality.copy()
+        totals = self._quality.sum(axis=1, keepdims=True)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            return self._quality / totals.astype(numpy.float64)
+
+    def rolling(self, deviceid, span=10):
+        """Return the times and the moving average of the SNR over `span`
+           messages of the `window` newest messages of a device, oldest
+           first. The first ``span - 1`` averages use fewer messages.
+        """
+
+        code = self._codes[deviceid]
+        times = self._recent_time[code]
+        order = numpy.argsort(times)[:self._filled[code]]
+        times, snr = times[order], self._recent_snr[code][order]
+        cumulative = numpy.concatenate([[0.0], numpy.cumsum(snr)])
+        n = numpy.arange(1, len(snr) + 1)
+        lower = numpy.maximum(n - span, 0)
+        return times, (cumulative[n] - cumulative[lower]) / (n - lower)
+
+    def degraded(self, drop=3.0, min_samples=None):
+        """Return the devices whose mean SNR over the `window` newest
+           messages is more than `drop` dB below their overall mean.
+
+           :param min_samples: Minimum number of recent messages. Defaults
+                               to `window`.
+
+        """
+
+        min_samples = self.window if min_samples is None else min_samples
+        summary = self.summary()
+        with numpy.errstate(invalid='ignore'):
+            selected = ((summary['recent_count'] >= min_samples) &
+                        (summary['recent_mean'] < summary['mean'] - drop))
+        return [self.devices[n] for n in numpy.flatnonzero(selected)]
+
+
+__all__ = ['LinkQuality', 'LINK_QUALITIES', 'columns', 'device_columns']
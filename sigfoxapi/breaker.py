@@ -0,0 +1,182 @@
+"""
+Circuit breaker for requests to the backend.
+
+When the backend degrades every request waits for a timeout or an error.
+With a `CircuitBreaker` a `sigfoxapi.Sigfox` instance tracks the outcome of
+the recent requests per endpoint family (see `endpoint()`). If too many of
+them failed or were slow the circuit opens and further requests to that
+family fail immediately with `sigfoxapi.SigfoxApiCircuitOpen`. After
+`CircuitBreaker.reset_timeout` seconds a single probe request is let
+through (half-open). The circuit closes again if it succeeds.
+
+>>> breaker = CircuitBreaker(error_rate=0.5, slow=10)
+>>> s = Sigfox('1234567890abcdef', 'fedcba09876543221', breaker=breaker)
+>>> try:
+...     s.device_messages('002C')
+... except SigfoxApiCircuitOpen:
+...     reschedule()
+>>> breaker.states()
+{'GET devices/*/messages': 'open', 'GET devicetypes/*': 'closed'}
+
+Failures are `sigfoxapi.SigfoxApiServerError`, `sigfoxapi.SigfoxApiTimeout`
+and transport errors. Other errors such as `sigfoxapi.SigfoxApiNotFound`
+are answers of a healthy backend and count as successes.
+
+"""
+
+import collections
+import threading
+import time
+
+import sigfoxapi
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+def endpoint(method, path):
+    """Return the endpoint family of a request. Identifiers at every second
+       position of the path are replaced by ``*``.
+
+       >>> endpoint('GET', '/devices/002C/messages')
+       'GET devices/*/messages'
+
+    """
+
+    segments = path.strip('/').split('/')
+    return '%s %s' % (method, '/'.join(segment if n % 2 == 0 else '*'
+                                       for n, segment in enumerate(segments)))
+
+
+def _failed(error):
+    if isinstance(error, (sigfoxapi.SigfoxApiServerError, sigfoxapi.SigfoxApiTimeout)):
+        return True
+    return not isinstance(error, sigfoxapi.SigfoxApiError)
+
+
+class _Circuit(object):
+
+    __slots__ = ('state', 'outcomes', 'opened', 'probing')
+
+    def __init__(self, window):
+        self.state = CLOSED
+        self.outcomes = collections.deque(maxlen=window)
+        self.opened = 0.0
+        self.probing = False
+
+
+class CircuitBreaker(object):
+    """Fail fast on endpoint families with many recent failures.
+
+       :param error_rate: Fraction of failed requests within the window at
+                          which the circuit opens.
+       :param slow: Requests taking longer than this many seconds count as
+                    failed. ``None`` to ignore latency.
+       :param window: Number of recent requests per endpoint family.
+       :param min_requests: The circuit doesn't open before this many
+                            requests are in the window.
+       :param reset_timeout: Seconds after which an open circuit lets a
+                             probe request through.
+       :param key: Function returning the endpoint family of ``(method,
+                   path)``. Defaults to `endpoint()`.
+
+    """
+
+    def __init__(self, error_rate=0.5, slow=None, window=20, min_requests=10, reset_timeout=30,
+                 key=endpoint):
+        self.error_rate = error_rate
+        self.slow = slow
+        self.window = window
+        self.min_requests = min_requests
+        self.reset_timeout = reset_timeout
+        self.key = key
+        self._circuits = {}
+        self._lock = threading.Lock()
+
+    def state(self, method, path):
+        """Return the state of the circuit of a request: ``'closed'``,
+           ``'open'`` or ``'half-open'``.
+        """
+
+        with self._lock:
+            circuit = self._circuits.get(self.key(method, path))
+            return CLOSED if circuit is None else circuit.state
+
+    def states(self):
+        """Return a dictionary mapping endpoint families to their states."""
+
+        with self._lock:
+            return dict((key, circuit.state) for key, circuit in self._circuits.items())
+
+    def _acquire(self, key):
+        """Return ``True`` if the request is a probe."""
+
+        with self._lock:
+            circuit = self._circuits.get(key)
+            if circuit is None:
+                circuit = self._circuits[key] = _Circuit(self.window)
+
+            if circuit.state == OPEN:
+                if time.monotonic() - circuit.opened < self.reset_timeout:
+                    raise sigfoxapi.SigfoxApiCircuitOpen('circuit open for %s' % (key))
+                circuit.state = HALF_OPEN
+            if circuit.state == HALF_OPEN:
+                if circuit.probing:
+                    raise sigfoxapi.SigfoxApiCircuitOpen('circuit half-open for %s' % (key))
+                circuit.probing = True
+                return True
+            return False
+
+    def _release(self, key, probe, failed):
+        """Record the outcome of a request. `failed` is ``None`` if the
+           request says nothing about the health of the backend.
+        """
+
+        with self._lock:
+            circuit = self._circuits[key]
+            if failed is None:
+                circuit.probing = circuit.probing and not probe
+                return
+            if probe:
+                circuit.probing = False
+                circuit.outcomes.clear()
+                if failed:
+                    circuit.state = OPEN
+                    circuit.opened = time.monotonic()
+                else:
+                    circuit.state = CLOSED
+                return
+
+            circuit.outcomes.append(failed)
+            if (circuit.state == CLOSED and len(circuit.outcomes) >= self.min_requests and
+                    sum(circuit.outcomes) >= self.error_rate * len(circuit.outcomes)):
+                circuit.state = OPEN
+                circuit.opened = time.monotonic()
+
+    def call(self, method, path, func, *args):
+        """Call ``func(*args)`` for a request of `method` to `path` unless
+           its circuit is open.
+        """
+
+        key = self.key(method, path)
+        probe = self._acquire(key)
+        start = time.monotonic()
+        try:
+            result = func(*args)
+        except sigfoxapi.SigfoxApiCancelled:
+            self._release(key, probe, None)
+            raise
+        except Exception as e:
+            self._release(key, probe, _failed(e))
+            raise
+        except BaseException:
+            self._release(key, probe, None)
+            raise
+
+        slow = self.slow is not None and time.monotonic() - start > self.slow
+        self._release(key, probe, slow)
+        return result
+
+
+__all__ = ['CircuitBreaker', 'endpoint', 'CLOSED', 'OPEN', 'HALF_OPEN']
@@ -0,0 +1,189 @@
+"""
+Record and replay the HTTP exchanges of a `sigfoxapi.Sigfox` instance.
+
+In ``record`` mode a `Cassette` passes every request to the backend and
+appends the request, the response and the time it took to a file. In
+``replay`` mode the responses are served from the file without any network
+access, e.g. to benchmark or profile code using `sigfoxapi` reproducibly on a
+machine without access to the backend.
+
+>>> with Cassette('messages.jsonl.gz', mode='record') as cassette:
+...     s = Sigfox('1234567890abcdef', 'fedcba09876543221', cassette=cassette)
+...     messages = list(s.pages('device_messages', '002C'))
+>>> cassette = Cassette('messages.jsonl.gz')
+>>> s = Sigfox('1234567890abcdef', 'fedcba09876543221', cassette=cassette)
+>>> list(s.pages('device_messages', '002C')) == messages
+True
+
+The file holds one JSON object per exchange and is compressed with gzip if
+its name ends with ``.gz``. Requests are matched by method, URL and body.
+The order of the query parameters doesn't matter, so paging chains replay
+even though `Sigfox.next()` builds the URL of the next page from a
+dictionary. Identical requests are answered in the order they were
+recorded. Credentials are never written to the file.
+
+By default responses are replayed as fast as possible. With ``timing=True``
+every response is delayed by the recorded time divided by `speed`.
+
+"""
+
+import collections
+import gzip
+import json
+import threading
+import time
+import urllib.parse
+
+import sigfoxapi
+import sigfoxapi.concurrency
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+
+def _normalize(url, body):
+    """Return the key of a request: the URL with the query parameters sorted
+       and the body with sorted JSON keys.
+    """
+
+    base, _, query = url.partition('?')
+    if query:
+        base = '%s?%s' % (base, urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(query, True))))
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True)
+    except (TypeError, ValueError):
+        pass
+    return base, body or ''
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Cassette(object):
+    """Record or replay HTTP exchanges.
+
+       :param path: The cassette file.
+       :param mode: ``'replay'`` to serve responses from `path` or
+                    ``'record'`` to send requests and append the exchanges
+                    to `path`.
+       :param timing: Delay replayed responses by their recorded time.
+       :param speed: Divide the recorded times by this factor.
+
+       :ivar hits: Number of responses replayed.
+       :ivar recorded: Number of exchanges recorded.
+
+    """
+
+    def __init__(self, path, mode=REPLAY, timing=False, speed=1.0):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError('mode must be %r or %r' % (RECORD, REPLAY))
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self.speed = speed
+        self.hits = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._exchanges = {}
+        self._served = collections.Counter()
+
+        if mode == REPLAY:
+            with _open(path, 'r') as fp:
+                for line in fp:
+                    if line.strip():
+                        self._add(json.loads(line))
+        else:
+            self._file = _open(path, 'a')
+
+    def _add(self, exchange):
+        key = (exchange['method'],) + _normalize(exchange['url'], exchange['body'])
+        self._exchanges.setdefault(key, []).append(exchange)
+
+    def __len__(self):
+        return sum(len(exchanges) for exchanges in self._exchanges.values())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the file of a recording cassette."""
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def exchanges(self):
+        """Return the list of recorded exchanges in replay mode. Every
+           exchange is a dictionary with the keys ``method``, ``url``,
+           ``body``, ``status``, ``headers``, ``data`` and ``elapsed``.
+        """
+
+        return [exchange for exchanges in self._exchanges.values() for exchange in exchanges]
+
+    def play(self, send, url, method, payload=None, headers=None):
+        """Return the ``(headers, data)`` response of a request like
+           `sigfoxapi.requesthandler.RequestHandler._make_request()`, by
+           calling `send` in record mode or from the file in replay mode.
+
+           :raises sigfoxapi.SigfoxApiError: No exchange was recorded for
+                                             the request.
+
+        """
+
+        if self.mode == RECORD:
+            return self._record(send, url, method, payload, headers)
+
+        key = (method,) + _normalize(url, payload)
+        with self._lock:
+            exchanges = self._exchanges.get(key)
+            if not exchanges:
+                raise sigfoxapi.SigfoxApiError('no recorded exchange for %s %s' % (method, url))
+            # Repeat the last recording once all of them have been served.
+            exchange = exchanges[min(self._served[key], len(exchanges) - 1)]
+            self._served[key] += 1
+            self.hits += 1
+
+        if self.timing:
+            self._delay(exchange['elapsed'] / self.speed)
+        res_headers = dict(exchange['headers'], status=str(exchange['status']))
+        return res_headers, exchange['data'].encode('utf-8')
+
+    def _delay(self, seconds):
+        context = sigfoxapi.concurrency.current()
+        remaining = context.remaining() if context is not None else None
+        if remaining is not None and remaining < seconds:
+            time.sleep(remaining)
+            context.check()
+            raise sigfoxapi.SigfoxApiTimeout('deadline exceeded')
+        time.sleep(seconds)
+
+    def _record(self, send, url, method, payload, headers):
+        start = time.monotonic()
+        res_headers, data = send(url, method, payload, headers=headers)
+        elapsed = time.monotonic() - start
+
+        body = payload.decode('utf-8') if isinstance(payload, bytes) else payload
+        exchange = {'method': method, 'url': url, 'body': body or '',
+                    'status': int(res_headers['status']),
+                    'headers': dict((name, value) for name, value in res_headers.items()
+                                    if name == 'content-type'),
+                    'data': data.decode('utf-8'), 'elapsed': round(elapsed, 6)}
+        line = json.dumps(exchange, separators=(',', ':'), sort_keys=True)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            self.recorded += 1
+        return res_headers, data
+
+
+__all__ = ['Cassette', 'RECORD', 'REPLAY']
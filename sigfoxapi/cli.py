@@ -0,0 +1,410 @@
+"""
+Command line exporter for the list endpoints of the Sigfox backend API.
+
+Results are written as JSON Lines (default) or CSV to standard output, a
+single file (``--output``) or one file per identifier (``--output-dir``).
+All pages of every response are fetched automatically. Several identifiers
+are exported concurrently (``--concurrency``).
+
+With ``--resume CHECKPOINT`` the position reached for every identifier is
+appended to the checkpoint file after each page. Running the same command
+again with the same checkpoint file continues where the previous run
+stopped and appends to the existing output. At most the page that was being
+written when the previous run was interrupted is exported twice.
+
+``--since``, ``--before`` and ``--limit`` are rejected by the commands
+whose endpoint doesn't take them. An identifier without results in the
+``--since``/``--before`` window (the API answers with HTTP 400) counts as
+exported. If the export of an
+identifier fails, the error is reported and the other identifiers are still
+exported. The exit status is 1 if any identifier failed.
+
+The credentials are taken from ``--login`` and ``--password`` or from the
+``SIGFOX_LOGIN_ID`` and ``SIGFOX_PASSWORD`` environment variables.
+
+Examples::
+
+    $ sigfoxapi devicetype-list
+    $ sigfoxapi device-messages 002C 002D --since 2017-06-01 --format csv
+    $ sigfoxapi device-list 4d3091a05ee16b3cc86699ab | jq -r .id | \\
+          sigfoxapi device-messages --ids-from - --concurrency 8 \\
+                    --output-dir messages/ --resume messages.ckpt
+
+"""
+
+from __future__ import print_function
+
+import argparse
+import calendar
+import concurrent.futures
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+import sigfoxapi
+
+COMMANDS = {
+    'group-list': ('group_list', False, True),
+    'devicetype-list': ('devicetype_list', False, False),
+    'devicetype-errors': ('devicetype_errors', True, True),
+    'devicetype-warnings': ('devicetype_warnings', True, True),
+    'devicetype-messages': ('devicetype_messages', True, True),
+    'callback-list': ('callback_list', True, False),
+    'callback-errors': ('callback_errors', False, True),
+    'device-list': ('device_list', True, True),
+    'device-messages': ('device_messages', True, True),
+    'device-locations': ('device_locations', True, True),
+    'device-errors': ('device_errors', True, True),
+    'device-warnings': ('device_warnings', True, True),
+    'user-list': ('user_list', True, True),
+}
+"""Map command names to the `sigfoxapi.Sigfox` method, whether the method
+   takes an identifier as first argument and whether it takes the
+   ``since``, ``before`` and ``limit`` keyword arguments.
+"""
+
+FILTERS = ('since', 'before', 'limit')
+
+
+def timestamp(value):
+    """Convert a command line timestamp to Unix seconds.
+
+       Accepts Unix seconds or UTC dates in the formats ``YYYY-MM-DD``,
+       ``YYYY-MM-DDTHH:MM`` and ``YYYY-MM-DDTHH:MM:SS``.
+
+    """
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    for fmt in ('%Y-%m-%d', '%Y-%m-%dT%H:%M', '%Y-%m-%dT%H:%M:%S'):
+        try:
+            return calendar.timegm(time.strptime(value, fmt))
+        except ValueError:
+            pass
+
+    raise argparse.ArgumentTypeError('invalid timestamp: %r' % (value))
+
+
+def flatten(record, prefix=''):
+    """Flatten nested dictionaries into dotted keys for CSV output.
+       Lists are encoded as JSON.
+    """
+
+    result = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            result.update(flatten(value, prefix + key + '.'))
+        elif isinstance(value, list):
+            result[prefix + key] = json.dumps(value, sort_keys=True)
+        else:
+            result[prefix + key] = value
+    return result
+
+
+class JsonLinesWriter(object):
+    """Write records as JSON Lines."""
+
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, records):
+        for record in records:
+            self.fp.write(json.dumps(record, sort_keys=True))
+            self.fp.write('\n')
+        self.fp.flush()
+
+
+class CsvWriter(object):
+    """Write records as CSV.
+
+       The columns are taken from the first record unless `fields` is given.
+       Columns that are missing in the first record are ignored.
+
+    """
+
+    def __init__(self, fp, append=False, fields=None):
+        self.fp = fp
+        self.fields = fields
+        self._writer = None
+        self._header = not append
+
+    def write(self, records):
+        for record in records:
+            record = flatten(record)
+            if self._writer is None:
+                self._writer = csv.DictWriter(self.fp, self.fields or sorted(record),
+                                              extrasaction='ignore')
+                if self._header:
+                    self._writer.writeheader()
+            self._writer.writerow(record)
+        self.fp.flush()
+
+
+class Checkpoint(object):
+    """Position reached by an export, persisted as JSON Lines.
+
+       ``done`` is the set of identifiers that have been exported completely,
+       ``cursors`` maps identifiers to the query string of their next page.
+
+       The first line of the file holds ``done`` and ``cursors``, every
+       `update()` appends one line. `close()` rewrites the file as a single
+       line. A partial last line left by a crash is ignored.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self.cursors = {}
+        self._fp = None
+        self._lock = threading.Lock()
+
+        if path and os.path.exists(path):
+            with open(path) as fp:
+                for line in fp:
+                    try:
+                        state = json.loads(line)
+                    except ValueError:
+                        break
+                    if 'key' in state:
+                        self._apply(state['key'], state['cursor'])
+                    else:
+                        self.done = set(state['done'])
+                        self.cursors = state['cursors']
+
+    def exists(self):
+        return bool(self.done or self.cursors)
+
+    def _apply(self, key, cursor):
+        if cursor is None:
+            self.done.add(key)
+            self.cursors.pop(key, None)
+        else:
+            self.cursors[key] = cursor
+
+    def update(self, key, cursor):
+        """Record that `key` continues at `cursor` or is done if `cursor` is ``None``."""
+
+        with self._lock:
+            self._apply(key, cursor)
+            if not self.path:
+                return
+            if self._fp is None:
+                # Drop updates of a previous run before appending.
+                self._save()
+                self._fp = open(self.path, 'a')
+            self._fp.write(json.dumps({'key': key, 'cursor': cursor}) + '\n')
+            self._fp.flush()
+
+    def close(self):
+        """Rewrite the file with the current state as a single line."""
+
+        with self._lock:
+            if self._fp is not None:
+                self._fp.close()
+                self._fp = None
+                self._save()
+
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({'done': sorted(self.done), 'cursors': self.cursors}, fp)
+            fp.write('\n')
+        os.replace(tmp, self.path)
+
+
+class Exporter(object):
+    """Export a list endpoint for a number of identifiers.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param method: Name of the `sigfoxapi.Sigfox` method.
+       :param ids: List of identifiers or ``[None]`` for methods without
+                   identifier.
+       :param kwargs: Keyword arguments for the method.
+       :param open_writer: Function returning the writer for an identifier.
+       :param checkpoint: `Checkpoint` instance.
+
+       :ivar errors: List of tuples ``(identifier, exception)`` of the
+                     identifiers whose export failed in the last `run()`.
+
+    """
+
+    def __init__(self, sigfox, method, ids, kwargs, open_writer, checkpoint):
+        self.sigfox = sigfox
+        self.method = method
+        self.ids = ids
+        self.kwargs = kwargs
+        self.open_writer = open_writer
+        self.checkpoint = checkpoint
+        self.records = 0
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def export(self, key):
+        """Export all pages for one identifier."""
+
+        kwargs = dict(self.kwargs)
+        cursor = self.checkpoint.cursors.get(str(key))
+        if cursor:
+            kwargs.update(urllib.parse.parse_qsl(cursor))
+
+        args = (key,) if key is not None else ()
+        writer = None
+        try:
+            for page in self.sigfox.pages(self.method, *args, **kwargs):
+                cursor = self.sigfox.cursor
+                with self._lock:
+                    if writer is None:
+                        writer = self.open_writer(key)
+                    writer.write(page)
+                    self.records += len(page)
+                    self.checkpoint.update(str(key), cursor)
+        except sigfoxapi.SigfoxApiBadRequest:
+            # The API answers with HTTP 400 instead of an empty page if
+            # there are no results between `since` and `before`.
+            if writer is not None:
+                raise
+            with self._lock:
+                self.checkpoint.update(str(key), None)
+
+    def run(self, concurrency=1):
+        """Export all identifiers that haven't been exported yet. An API or
+           transport error of one identifier doesn't stop the others.
+
+           :returns: The number of records exported.
+
+        """
+
+        import drest.exc
+
+        self.errors = []
+        todo = [key for key in self.ids if str(key) not in self.checkpoint.done]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for key, future in [(key, executor.submit(self.export, key)) for key in todo]:
+                try:
+                    future.result()
+                except (sigfoxapi.SigfoxApiError, drest.exc.dRestAPIError) as e:
+                    self.errors.append((key, e))
+        return self.records
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='sigfoxapi',
+                                     description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('command', choices=sorted(COMMANDS), help='the list endpoint to export')
+    parser.add_argument('ids', nargs='*', metavar='ID',
+                        help='device, device type or group identifiers')
+    parser.add_argument('--ids-from', metavar='FILE',
+                        help='read identifiers from FILE, one per line ("-" for standard input)')
+    parser.add_argument('--login', default=os.environ.get('SIGFOX_LOGIN_ID'),
+                        help='API login (default: $SIGFOX_LOGIN_ID)')
+    parser.add_argument('--password', default=os.environ.get('SIGFOX_PASSWORD'),
+                        help='API password (default: $SIGFOX_PASSWORD)')
+    parser.add_argument('--since', type=timestamp, help='Unix seconds or UTC date (YYYY-MM-DD[THH:MM[:SS]])')
+    parser.add_argument('--before', type=timestamp, help='Unix seconds or UTC date (YYYY-MM-DD[THH:MM[:SS]])')
+    parser.add_argument('--limit', type=int, help='number of results per page')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl',
+                        help='output format (default: %(default)s)')
+    parser.add_argument('--fields', help='comma separated list of CSV columns')
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--output', '-o', metavar='FILE', help='write to FILE instead of standard output')
+    output.add_argument('--output-dir', metavar='DIR', help='write one file per identifier to DIR')
+    parser.add_argument('--concurrency', '-c', type=int, default=4,
+                        help='number of identifiers exported in parallel (default: %(default)s)')
+    parser.add_argument('--resume', metavar='CHECKPOINT',
+                        help='record progress in CHECKPOINT and continue from it')
+
+    args = parser.parse_args(argv)
+
+    if not args.login or not args.password:
+        parser.error('--login and --password or $SIGFOX_LOGIN_ID and $SIGFOX_PASSWORD are required')
+
+    if args.ids_from:
+        fp = sys.stdin if args.ids_from == '-' else open(args.ids_from)
+        with fp:
+            args.ids += [line.strip() for line in fp if line.strip()]
+
+    method, takes_id, takes_filters = COMMANDS[args.command]
+    if not takes_filters:
+        for name in FILTERS:
+            if getattr(args, name) is not None:
+                parser.error('%s does not take --%s' % (args.command, name))
+    if takes_id and not args.ids:
+        parser.error('%s requires at least one identifier' % (args.command))
+    if not takes_id and args.ids:
+        parser.error('%s does not take identifiers' % (args.command))
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+
+    return args
+
+
+def main(argv=None, sigfox=None):
+    """Entry point of the ``sigfoxapi`` command."""
+
+    args = parse_args(argv)
+    method, takes_id, _ = COMMANDS[args.command]
+
+    kwargs = {}
+    for name in FILTERS:
+        if getattr(args, name) is not None:
+            kwargs[name] = getattr(args, name)
+
+    checkpoint = Checkpoint(args.resume)
+    resuming = checkpoint.exists()
+    fields = args.fields.split(',') if args.fields else None
+
+    files = []
+    shared = []
+
+    def make_writer(path):
+        if path is None:
+            fp, append = sys.stdout, resuming
+        else:
+            append = resuming and os.path.exists(path) and os.path.getsize(path) > 0
+            fp = open(path, 'a' if append else 'w', newline='')
+            files.append(fp)
+
+        if args.format == 'csv':
+            return CsvWriter(fp, append=append, fields=fields)
+        else:
+            return JsonLinesWriter(fp)
+
+    def open_writer(key):
+        if args.output_dir:
+            name = '%s.%s' % (key if key is not None else args.command, args.format)
+            return make_writer(os.path.join(args.output_dir, name))
+
+        if not shared:
+            shared.append(make_writer(args.output))
+        return shared[0]
+
+    if args.output_dir and not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    sigfox = sigfox or sigfoxapi.Sigfox(args.login, args.password)
+    exporter = Exporter(sigfox, method, args.ids if takes_id else [None], kwargs, open_writer, checkpoint)
+
+    try:
+        exporter.run(concurrency=args.concurrency)
+    finally:
+        checkpoint.close()
+        for fp in files:
+            fp.close()
+
+    for key, e in exporter.errors:
+        if key is None:
+            print('sigfoxapi: %s: %s' % (e.__class__.__name__, e), file=sys.stderr)
+        else:
+            print('sigfoxapi: %s: %s: %s' % (key, e.__class__.__name__, e), file=sys.stderr)
+    return 1 if exporter.errors else 0
+
+
+__all__ = ['main']
@@ -0,0 +1,315 @@
+"""
+Helpers for using `sigfoxapi.Sigfox` from several threads.
+
+Deadlines and cancellation
+--------------------------
+
+`deadline()` limits the time all requests within a block may take in
+total. A `CancelToken` cancels them from another thread.
+
+>>> token = CancelToken()
+>>> with deadline(30, token):
+...     for page in s.pages('device_messages', '002C'):
+...         store(page)
+
+A request that is started after the deadline has passed or the token has
+been cancelled raises `sigfoxapi.SigfoxApiTimeout` or
+`sigfoxapi.SigfoxApiCancelled`. The socket timeout of a request is set to
+the remaining time and cancelling shuts down the connections of requests in
+progress so that blocked threads return immediately.
+
+`Sigfox.pages()` keeps the deadline and token that were active when it was
+called for all pages, even if the pages are fetched later or by another
+thread (e.g. by `sigfoxapi.streams` or `sigfoxapi.pipeline`).
+
+"""
+
+import contextlib
+import threading
+import time
+
+import sigfoxapi
+
+
+class _Call(object):
+    """A call in progress within `SingleFlight`."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.copies = None
+
+
+def _copy_error(error):
+    """Return a new instance of `error` so that threads don't share (and
+       modify) the traceback of the original exception. Returns `error`
+       itself if its constructor doesn't accept its ``args``.
+    """
+
+    try:
+        return error.__class__(*error.args)
+    except Exception:
+        return error
+
+
+class SingleFlight(object):
+    """Coalesce concurrent calls with the same key into a single call.
+
+       The first thread calling `SingleFlight.do()` with a given key executes
+       the function. Threads calling `SingleFlight.do()` with the same key
+       while the first call is still in progress wait for it to complete and
+       receive the same result or an exception of the same type. If the
+       first call fails with `sigfoxapi.SigfoxApiTimeout` or
+       `sigfoxapi.SigfoxApiCancelled`, its deadline or token may not apply
+       to the waiting threads, so they call the function again instead (one
+       of them executes it and the others wait for that call). The same
+       applies to exceptions that aren't `Exception` subclasses, such as
+       `KeyboardInterrupt`, which only concern the first thread.
+
+       >>> flight = SingleFlight(copy=copy.deepcopy)
+       >>> result, shared = flight.do(('GET', '/devices/002C'), s.device_info, '002C')
+
+       :param copy: Function returning a copy of a result. If given, every
+                    waiting thread receives its own copy, made before any
+                    of the threads is released, so that the caller that
+                    executed the function may modify its result. If it
+                    fails, the waiting threads receive its exception.
+
+    """
+
+    def __init__(self, copy=None):
+        self.copy = copy
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Call ``func(*args, **kwargs)`` unless a call with the same `key`
+           is already in progress.
+
+           :returns: Tuple of ``(result, shared)`` where `shared` is ``True``
+                     if other threads received the result as well. Without
+                     `copy` the result is the same object for all threads
+                     so it must not be modified if `shared` is ``True``.
+
+        """
+
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = _Call()
+                    break
+                call.waiters += 1
+
+            context = current()
+            if context is None:
+                call.event.wait()
+            else:
+                context.wait(call.event)
+            if isinstance(call.error, (sigfoxapi.SigfoxApiTimeout, sigfoxapi.SigfoxApiCancelled)):
+                # The deadline or token of the leader, try again.
+                continue
+            if call.error is not None and not isinstance(call.error, Exception):
+                # E.g. KeyboardInterrupt or SystemExit of the leader.
+                continue
+            if call.error is not None:
+                raise _copy_error(call.error)
+            if call.copies is not None:
+                return call.copies.pop(), True
+            return call.result, True
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            try:
+                if call.error is None and call.waiters and self.copy is not None:
+                    try:
+                        call.copies = [self.copy(call.result) for _ in range(call.waiters)]
+                    except BaseException as e:
+                        # Only the waiting threads fail, the result of this
+                        # thread is still valid.
+                        call.error = e
+                        if not isinstance(e, Exception):
+                            raise
+            finally:
+                call.event.set()
+
+        return call.result, call.waiters > 0
+
+
+class RateLimiter(object):
+    """Token bucket limiting the rate of calls across threads.
+
+       :param rate: Number of calls per second.
+       :param burst: Number of calls that may be made at once after the
+                     limiter has been idle.
+
+       >>> limiter = RateLimiter(10)
+       >>> for callbackid in callbackids:
+       ...     limiter.acquire()
+       ...     s.callback_delete('5256c4d6c9a871b80f5a2e50', callbackid)
+
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+
+    def acquire(self):
+        """Block until a call may be made."""
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Take the token now, even if it isn't available yet, so that
+            # waiting threads are served in order without holding the lock.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
+
+
+class CancelToken(object):
+    """Cancel requests from another thread. See `deadline()`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._callbacks = []
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        """Cancel all requests using this token."""
+
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Call `callback` when the token is cancelled, immediately if it
+           already is.
+        """
+
+        with self._lock:
+            if not self._cancelled:
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class Context(object):
+    """Deadline and cancellation tokens applying to requests.
+
+       :param deadline: Absolute deadline in seconds of `time.monotonic()`
+                        or ``None``.
+       :param tokens: Sequence of `CancelToken`.
+
+    """
+
+    def __init__(self, deadline=None, tokens=()):
+        self.deadline = deadline
+        self.tokens = tuple(tokens)
+
+    def check(self):
+        """Raise `sigfoxapi.SigfoxApiCancelled` or `sigfoxapi.SigfoxApiTimeout`
+           if the requests must not continue.
+        """
+
+        for token in self.tokens:
+            if token.cancelled:
+                raise sigfoxapi.SigfoxApiCancelled('cancelled')
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise sigfoxapi.SigfoxApiTimeout('deadline exceeded')
+
+    def remaining(self):
+        """Return the number of seconds left or ``None`` if there is no
+           deadline. See `Context.check()` for the exceptions.
+        """
+
+        self.check()
+        if self.deadline is None:
+            return None
+        return max(0.001, self.deadline - time.monotonic())
+
+    def wait(self, event):
+        """Wait for a `threading.Event` until the deadline or cancellation."""
+
+        while True:
+            remaining = self.remaining()
+            # Poll the tokens every 50 ms.
+            if self.tokens:
+                remaining = 0.05 if remaining is None else min(remaining, 0.05)
+            if event.wait(remaining):
+                return
+
+
+_local = threading.local()
+
+
+def current():
+    """Return the `Context` of the current thread or ``None``."""
+    return getattr(_local, 'context', None)
+
+
+@contextlib.contextmanager
+def use(context):
+    """Make `context` (a `Context` or ``None``) the context of the current
+       thread within the block.
+    """
+
+    outer = current()
+    _local.context = context
+    try:
+        yield context
+    finally:
+        _local.context = outer
+
+
+def deadline(timeout=None, token=None):
+    """Limit the requests within the block to `timeout` seconds in total
+       and/or let them be cancelled through `token`.
+
+       :param timeout: Seconds or ``None``.
+       :param token: `CancelToken` or ``None``.
+
+       Nested blocks keep the earlier deadline and all tokens of the outer
+       blocks.
+
+       >>> with deadline(5):
+       ...     s.device_info('002C')
+
+    """
+
+    outer = current() or Context()
+    end = outer.deadline
+    if timeout is not None:
+        end = time.monotonic() + timeout if end is None else min(end, time.monotonic() + timeout)
+    tokens = outer.tokens + ((token,) if token is not None else ())
+    return use(Context(end, tokens))
+
+
+__all__ = ['CancelToken', 'Context', 'RateLimiter', 'SingleFlight', 'current', 'deadline', 'use']
@@ -0,0 +1,197 @@
+"""
+Fleet-wide cache for `Sigfox.device_consumptions()`.
+
+The consumptions of past years never change. `ConsumptionCache` fetches
+them only once and keeps them in a local store, one file per year. Only the
+consumptions of the current year are fetched again, at most every
+`ConsumptionCache.current_ttl` seconds. Missing (device, year) pairs are
+fetched concurrently.
+
+>>> cache = ConsumptionCache(s, 'consumptions/')
+>>> consumptions = cache.fetch(['002C', '002D', '4830'], 2016)
+>>> frames, downlinks = consumptions['002C']
+>>> frames[0]           # Uplink frames on 1 January 2016
+12
+>>> cache.totals(['002C', '002D', '4830'], 2016)
+{'002C': (3510, 12), '002D': (1208, 0), '4830': (17211, 355)}
+
+Each device-year is stored as two arrays of 366 unsigned integers (uplink
+and downlink frame counts per day, starting with the 1st of January). On
+disk a device-year takes a fixed-size record of about 3 kB.
+
+"""
+
+import array
+import concurrent.futures
+import os
+import struct
+import threading
+import time
+
+import sigfoxapi
+
+DAYS = 366
+"""Number of slots per device-year."""
+
+_ID = struct.Struct('<16s')
+_RECORD_SIZE = _ID.size + 2 * DAYS * array.array('I').itemsize
+
+
+def _arrays(consumptions):
+    """Convert the list of per-day dictionaries to two arrays."""
+
+    frames = array.array('I', [0] * DAYS)
+    downlinks = array.array('I', [0] * DAYS)
+    for day, consumption in enumerate(consumptions[:DAYS]):
+        frames[day] = consumption.get('frameCount') or 0
+        downlinks[day] = consumption.get('downlinkFrameCount') or 0
+    return frames, downlinks
+
+
+class ConsumptionStore(object):
+    """Append-only store of device-year consumptions, one file per year.
+
+       :param path: Directory of the store. Created if it doesn't exist.
+
+       Every record consists of the device identifier (16 bytes) followed by
+       the uplink and downlink arrays. If a device is stored more than once
+       for a year the last record wins.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._years = {}
+        self._lock = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _filename(self, year):
+        return os.path.join(self.path, '%d.bin' % (year))
+
+    def _load(self, year):
+        if year in self._years:
+            return self._years[year]
+
+        records = {}
+        try:
+            with open(self._filename(year), 'rb') as fp:
+                data = fp.read()
+        except IOError:
+            data = b''
+
+        # Ignore an incomplete record at the end of the file.
+        for offset in range(0, len(data) - _RECORD_SIZE + 1, _RECORD_SIZE):
+            deviceid = _ID.unpack_from(data, offset)[0].rstrip(b'\0').decode('ascii')
+            values = array.array('I')
+            values.frombytes(data[offset + _ID.size:offset + _RECORD_SIZE])
+            records[deviceid] = (values[:DAYS], values[DAYS:])
+
+        self._years[year] = records
+        return records
+
+    def get(self, deviceid, year):
+        """Return the tuple ``(frames, downlinks)`` or ``None``."""
+
+        with self._lock:
+            return self._load(year).get(deviceid)
+
+    def put(self, deviceid, year, frames, downlinks):
+        """Store the arrays for a device-year."""
+
+        with self._lock:
+            self._load(year)[deviceid] = (frames, downlinks)
+            with open(self._filename(year), 'ab') as fp:
+                fp.write(_ID.pack(deviceid.encode('ascii')))
+                fp.write(frames.tobytes())
+                fp.write(downlinks.tobytes())
+
+
+class ConsumptionCache(object):
+    """Fetch and cache `Sigfox.device_consumptions()` for many devices.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param path: Directory for storing past years. Without `path` past
+                    years are only kept in memory.
+       :param max_workers: Maximum number of concurrent requests.
+       :param current_ttl: Number of seconds after which the consumptions of
+                           the current year are fetched again.
+
+    """
+
+    def __init__(self, sigfox, path=None, max_workers=8, current_ttl=3600):
+        self.sigfox = sigfox
+        self.store = ConsumptionStore(path) if path else None
+        self.max_workers = max_workers
+        self.current_ttl = current_ttl
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _current_year(self):
+        return time.gmtime().tm_year
+
+    def _cached(self, deviceid, year):
+        with self._lock:
+            entry = self._memory.get((deviceid, year))
+        if entry is not None:
+            fetched, consumptions = entry
+            if year < self._current_year() or time.time() - fetched < self.current_ttl:
+                return consumptions
+            return None
+
+        if self.store is not None and year < self._current_year():
+            consumptions = self.store.get(deviceid, year)
+            if consumptions is not None:
+                with self._lock:
+                    self._memory[(deviceid, year)] = (time.time(), consumptions)
+            return consumptions
+
+        return None
+
+    def _fetch(self, deviceid, year):
+        response = sigfoxapi._unwrap(self.sigfox.device_consumptions(deviceid, year))
+        consumptions = _arrays(response['consumption']['consumptions'])
+
+        with self._lock:
+            self._memory[(deviceid, year)] = (time.time(), consumptions)
+        if self.store is not None and year < self._current_year():
+            self.store.put(deviceid, year, *consumptions)
+        return consumptions
+
+    def get(self, deviceid, year):
+        """Return the tuple ``(frames, downlinks)`` for one device-year."""
+        return self.fetch([deviceid], year)[deviceid]
+
+    def fetch(self, deviceids, year):
+        """Return a dictionary mapping each device identifier to a tuple
+           ``(frames, downlinks)``. Device-years that aren't cached are
+           fetched concurrently.
+        """
+
+        result = {}
+        missing = []
+        for deviceid in deviceids:
+            consumptions = self._cached(deviceid, year)
+            if consumptions is None:
+                missing.append(deviceid)
+            else:
+                result[deviceid] = consumptions
+
+        if missing:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self._fetch, deviceid, year) for deviceid in missing]
+                for deviceid, future in zip(missing, futures):
+                    result[deviceid] = future.result()
+
+        return result
+
+    def totals(self, deviceids, year):
+        """Return a dictionary mapping each device identifier to a tuple
+           of the total ``(frames, downlinks)`` of the year.
+        """
+
+        return dict((deviceid, (sum(frames), sum(downlinks)))
+                    for deviceid, (frames, downlinks) in self.fetch(deviceids, year).items())
+
+
+__all__ = ['ConsumptionCache', 'ConsumptionStore']
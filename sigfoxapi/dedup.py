@@ -0,0 +1,194 @@
+"""
+Remove duplicate messages from overlapping results.
+
+Messages are identified by ``(device, time, data)``, with the time in
+seconds whether the endpoint returned seconds or milliseconds. Duplicates
+have the same ``time`` so the filters are partitioned by message time:
+every check only looks at one partition and partitions older than the
+retention period are dropped as a whole, which bounds the memory.
+
+>>> seen = BloomFilter(capacity=10000000)
+>>> for message in dedup(messages_from_everywhere(), seen):
+...     store(message)
+
+Two filters are available.
+
+* `ExactFilter` keeps the keys in sets. It never drops unique messages but
+  needs about 100 bytes per key.
+* `BloomFilter` keeps a Bloom filter per partition. It needs about 1.2 bytes
+  per key at the default error rate of 1% (about 360 MB for 300 million
+  keys per day with the default retention) but drops that fraction of
+  unique messages as false positives.
+
+Messages older than the retention period relative to the newest message
+seen can't be checked and are always passed through.
+
+"""
+
+import abc
+import hashlib
+import math
+import struct
+import threading
+
+import sigfoxapi
+
+_HASHES = struct.Struct('<QQ')
+
+
+def message_key(message):
+    """Return the de-duplication key of a message as bytes."""
+
+    message = sigfoxapi._unwrap(message)
+    time = message.get('time')
+    if time is not None:
+        # Endpoints return the time in seconds or milliseconds.
+        time = float(sigfoxapi._seconds(time))
+    return ('%s\0%r\0%s' % (message.get('device'), time, message.get('data'))).encode('utf-8')
+
+
+class _PartitionedFilter(object, metaclass=abc.ABCMeta):
+    """Base class of the filters. Subclasses implement how the keys of a
+       partition are stored.
+
+       :param partition: Length of a partition in seconds.
+       :param retention: Number of seconds for which keys are kept, relative
+                         to the newest message time seen.
+
+    """
+
+    def __init__(self, partition=3600, retention=86400):
+        self.partition = partition
+        self.retention = retention
+        self._partitions = {}
+        self._newest = None
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def _new_partition(self):
+        """Return an empty partition."""
+
+    @abc.abstractmethod
+    def _contains(self, partition, key):
+        """Return whether `key` has been inserted into `partition`."""
+
+    @abc.abstractmethod
+    def _insert(self, partition, key):
+        """Insert `key` into `partition`."""
+
+    def __len__(self):
+        """Number of partitions currently kept."""
+        return len(self._partitions)
+
+    def add(self, key, timestamp):
+        """Add `key` of a message sent at `timestamp` (Unix seconds or
+           milliseconds).
+
+           :returns: ``True`` if the key is new (or too old to be checked),
+                     ``False`` if it has been added before.
+
+        """
+
+        number = int(sigfoxapi._seconds(timestamp) // self.partition)
+        with self._lock:
+            if self._newest is not None and number < self._newest - self.retention // self.partition:
+                return True
+
+            partition = self._partitions.get(number)
+            if partition is None:
+                partition = self._partitions[number] = self._new_partition()
+                if self._newest is None or number > self._newest:
+                    self._newest = number
+                    self._evict()
+            elif self._contains(partition, key):
+                return False
+
+            self._insert(partition, key)
+            return True
+
+    def _evict(self):
+        oldest = self._newest - self.retention // self.partition
+        for number in [number for number in self._partitions if number < oldest]:
+            del self._partitions[number]
+
+
+class ExactFilter(_PartitionedFilter):
+    """Filter that keeps all keys in sets, one per partition.
+
+       See `_PartitionedFilter` for the parameters.
+
+    """
+
+    def _new_partition(self):
+        return set()
+
+    def _contains(self, partition, key):
+        return key in partition
+
+    def _insert(self, partition, key):
+        partition.add(key)
+
+
+class BloomFilter(_PartitionedFilter):
+    """Filter that keeps a Bloom filter per partition.
+
+       :param capacity: Expected number of keys per partition. The error
+                        rate increases if more keys are added.
+       :param error_rate: Acceptable rate of false positives, i.e. unique
+                          messages that are treated as duplicates.
+
+       See `_PartitionedFilter` for the other parameters.
+
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.01, partition=3600, retention=86400):
+        super(BloomFilter, self).__init__(partition, retention)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self._hashes = max(1, int(round(self._bits / float(capacity) * math.log(2))))
+
+    def _new_partition(self):
+        return bytearray((self._bits + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: the k positions are derived from two 64 bit hashes.
+        h1, h2 = _HASHES.unpack(hashlib.md5(key).digest())
+        return [(h1 + n * h2) % self._bits for n in range(self._hashes)]
+
+    def _contains(self, partition, key):
+        for position in self._positions(key):
+            if not partition[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def _insert(self, partition, key):
+        for position in self._positions(key):
+            partition[position >> 3] |= 1 << (position & 7)
+
+
+def dedup(messages, seen=None, key=message_key):
+    """Yield the messages of an iterable that haven't been seen before.
+
+       :param messages: Iterable of messages, e.g. from
+                        `Sigfox.devicetype_messages()`, `Sigfox.device_messages()`
+                        or `Sigfox.callback_errors()`.
+       :param seen: `ExactFilter` or `BloomFilter` instance. Share it between
+                    calls to remove duplicates across iterables. Defaults to
+                    a new `ExactFilter`.
+       :param key: Function returning the key of a message.
+
+       >>> seen = ExactFilter()
+       >>> for page in s.pages('devicetype_messages', '5256c4d6c9a871b80f5a2e50'):
+       ...     messages = list(dedup(page, seen))
+
+    """
+
+    if seen is None:
+        seen = ExactFilter()
+    for message in messages:
+        if seen.add(key(message), sigfoxapi._unwrap(message)['time']):
+            yield message
+
+
+__all__ = ['BloomFilter', 'ExactFilter', 'dedup', 'message_key']
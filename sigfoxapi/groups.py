@@ -0,0 +1,215 @@
+"""
+Crawl the group hierarchy and index it in memory.
+
+`GroupCrawler` expands the group tree breadth-first. The children of all
+groups of one level are fetched concurrently, following all pages of
+`Sigfox.group_list()`. The result is a `GroupTree`.
+
+>>> crawler = GroupCrawler(s, max_workers=8)
+>>> tree = crawler.crawl()
+>>> tree.children('510b848ee4b0ca47869752b5')
+['51f13454bc54518c7bae7d4d', ...]
+>>> tree.save('groups.json')
+>>> tree = GroupTree.load('groups.json')
+>>> crawler.refresh(tree, '51f13454bc54518c7bae7d4d')
+
+"""
+
+import concurrent.futures
+import json
+
+import sigfoxapi
+
+
+class GroupTree(object):
+    """In-memory index of groups.
+
+       :param groups: Iterable of group dictionaries as returned by
+                      `Sigfox.group_list()`.
+
+       The parent of a group is the last element of its ``path`` field.
+       Groups whose parent is not part of the tree are roots.
+
+       * `GroupTree.get()`, `GroupTree.parent()` and `GroupTree.children()`
+         take O(1).
+       * `GroupTree.ancestors()` and `GroupTree.is_descendant()` take O(depth).
+       * `GroupTree.subtree()` takes O(size of the subtree).
+
+    """
+
+    def __init__(self, groups=()):
+        self._groups = {}
+        self._children = {}
+        for group in groups:
+            self.add(group)
+
+    def __len__(self):
+        return len(self._groups)
+
+    def __contains__(self, groupid):
+        return groupid in self._groups
+
+    def __iter__(self):
+        return iter(self._groups.values())
+
+    def add(self, group):
+        """Add or replace a group."""
+
+        group = sigfoxapi._unwrap(group)
+        groupid = group['id']
+        if groupid in self._groups:
+            self._unlink(groupid)
+        self._groups[groupid] = group
+        self._children.setdefault(groupid, [])
+        self._children.setdefault(self._parentid(group), []).append(groupid)
+
+    def remove(self, groupid):
+        """Remove a group and all its descendants."""
+
+        for descendant in list(self.subtree(groupid)):
+            self._unlink(descendant['id'])
+            del self._groups[descendant['id']]
+            self._children.pop(descendant['id'], None)
+
+    def _unlink(self, groupid):
+        siblings = self._children.get(self._parentid(self._groups[groupid]), [])
+        if groupid in siblings:
+            siblings.remove(groupid)
+
+    @staticmethod
+    def _parentid(group):
+        path = group.get('path') or []
+        return path[-1] if path else None
+
+    def get(self, groupid):
+        """Return the group dictionary for `groupid`."""
+        return self._groups[groupid]
+
+    def parent(self, groupid):
+        """Return the identifier of the parent group or ``None`` for roots."""
+
+        parentid = self._parentid(self._groups[groupid])
+        return parentid if parentid in self._groups else None
+
+    def children(self, groupid):
+        """Return the list of identifiers of the child groups."""
+        return list(self._children.get(groupid, []))
+
+    def roots(self):
+        """Return the identifiers of all groups without parent in the tree."""
+        return [groupid for groupid in self._groups if self.parent(groupid) is None]
+
+    def ancestors(self, groupid):
+        """Return the identifiers of all ancestors, starting with the root.
+           Ancestors outside of the tree are included as listed in ``path``.
+        """
+        return list(self._groups[groupid].get('path') or [])
+
+    def is_descendant(self, groupid, ancestorid):
+        """Return ``True`` if `groupid` is a descendant of `ancestorid`."""
+        return ancestorid in (self._groups[groupid].get('path') or [])
+
+    def depth(self, groupid):
+        """Return the number of ancestors of a group."""
+        return len(self._groups[groupid].get('path') or [])
+
+    def subtree(self, groupid):
+        """Iterate breadth-first through a group and all its descendants."""
+
+        level = [groupid]
+        while level:
+            for member in level:
+                yield self._groups[member]
+            level = [child for member in level for child in self._children.get(member, [])]
+
+    def dump(self, fp):
+        """Write the tree to the file-like object `fp` as JSON."""
+        json.dump({'groups': list(self._groups.values())}, fp)
+
+    @classmethod
+    def parse(cls, fp):
+        """Read a tree written by `GroupTree.dump()`."""
+        return cls(json.load(fp)['groups'])
+
+    def save(self, path):
+        """Write the tree to the file `path`."""
+        with open(path, 'w') as fp:
+            self.dump(fp)
+
+    @classmethod
+    def load(cls, path):
+        """Read a tree from the file `path`."""
+        with open(path) as fp:
+            return cls.parse(fp)
+
+
+class GroupCrawler(object):
+    """Crawl the group hierarchy breadth-first.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param max_workers: Maximum number of concurrent requests.
+       :param limit: Number of groups per page.
+
+    """
+
+    def __init__(self, sigfox, max_workers=8, limit=100):
+        self.sigfox = sigfox
+        self.max_workers = max_workers
+        self.limit = limit
+
+    def _children(self, parentid):
+        kwargs = {'limit': self.limit}
+        if parentid is not None:
+            kwargs['parentId'] = parentid
+
+        children = []
+        for page in self.sigfox.pages('group_list', **kwargs):
+            children.extend(sigfoxapi._unwrap(page))
+        return children
+
+    def _expand(self, tree, level):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while level:
+                added = []
+                for children in executor.map(self._children, level):
+                    for group in children:
+                        group = sigfoxapi._unwrap(group)
+                        if group['id'] not in tree:
+                            tree.add(group)
+                            added.append(group['id'])
+                level = added
+        return tree
+
+    def crawl(self, root=None):
+        """Crawl all groups below `root` and return a `GroupTree`.
+
+           :param root: Identifier of the group to start from. By default
+                        the crawl starts at the group of the API login.
+
+           `root` itself is not part of the returned tree unless it is
+           listed by `Sigfox.group_list()`.
+
+        """
+
+        return self._expand(GroupTree(), [root])
+
+    def refresh(self, tree, groupid=None):
+        """Crawl the descendants of `groupid` again and replace them in `tree`.
+
+           Without `groupid` all roots of `tree` are refreshed, i.e. the
+           whole tree is crawled again. Groups that no longer exist are
+           removed.
+
+        """
+
+        if groupid is None:
+            for root in tree.roots():
+                tree.remove(root)
+            return self._expand(tree, [None])
+
+        for child in tree.children(groupid):
+            tree.remove(child)
+        return self._expand(tree, [groupid])
+
+
+__all__ = ['GroupTree', 'GroupCrawler']
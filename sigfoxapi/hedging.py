@@ -0,0 +1,235 @@
+"""
+Hedged ``GET`` requests.
+
+A few slow backend nodes make the tail latency of requests many times the
+median. With a `Hedger` a `sigfoxapi.Sigfox` instance sends a duplicate of a
+``GET`` request if no response has arrived within a percentile of the
+recent latencies. Whichever response arrives first is used.
+
+>>> hedger = Hedger(percentile=95, budget=0.05)
+>>> s = Sigfox('1234567890abcdef', 'fedcba09876543221', hedger=hedger)
+>>> s.device_info('002C')
+>>> hedger.stats()
+{'requests': 1000, 'hedged': 41, 'wins': 33, 'skipped': 7, 'delay': 0.412}
+
+The original request is sent from the calling thread. Duplicates are sent
+from a thread pool, so the duplicate goes out on a different connection
+than the original request (every thread has its own connection). When the
+duplicate answers first, the original request is cancelled like with a
+`sigfoxapi.concurrency.CancelToken`.
+
+Every request adds `Hedger.budget` to a token bucket holding at most
+`Hedger.burst` tokens, and every duplicate takes one token. This caps the
+extra load on the backend at `Hedger.budget` times the recent number of
+requests.
+
+"""
+
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+
+import sigfoxapi.concurrency
+
+
+class _Hedge(object):
+    """A request in progress within `Hedger.call()`."""
+
+    def __init__(self):
+        self.done = False
+        self.future = None
+        self.won = False
+        self.result = None
+        self.primary = sigfoxapi.concurrency.CancelToken()
+        self.duplicate = sigfoxapi.concurrency.CancelToken()
+
+
+class Hedger(object):
+    """Send duplicates of slow requests.
+
+       :param percentile: Percentile of the recent latencies after which a
+                          duplicate is sent.
+       :param budget: Maximum number of duplicates as a fraction of the
+                      requests.
+       :param burst: Maximum number of duplicates that may be sent at once
+                     after a period without slow requests.
+       :param window: Number of recent latencies to keep.
+       :param min_samples: No duplicates are sent before this many latencies
+                           have been measured.
+       :param max_workers: Size of the thread pool sending the duplicates.
+
+    """
+
+    def __init__(self, percentile=95, budget=0.05, burst=10, window=1000, min_samples=20, max_workers=16):
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+        self._latencies = collections.deque(maxlen=window)
+        self._delay = None
+        self._changes = 0
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._timers = []
+        self._sequence = itertools.count()
+        self._wakeup = threading.Condition(self._lock)
+        self._scheduler = None
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+        self.skipped = 0
+
+    def _record(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+            self._changes += 1
+            # Sorting the window on every request would be wasteful.
+            if self._delay is None or self._changes >= 50:
+                if len(self._latencies) >= self.min_samples:
+                    latencies = sorted(self._latencies)
+                    index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100.0))
+                    self._delay = latencies[index]
+                    self._changes = 0
+
+    @property
+    def delay(self):
+        """Seconds after which a duplicate is sent or ``None`` if there
+           aren't enough measurements yet.
+        """
+        return self._delay
+
+    def stats(self):
+        """Return a dictionary with the number of ``requests``, the number
+           of duplicates sent (``hedged``), the number of duplicates that
+           answered first (``wins``), the number of duplicates not sent
+           because the budget was exhausted (``skipped``) and the current
+           ``delay``.
+        """
+
+        with self._lock:
+            return {'requests': self.requests, 'hedged': self.hedged, 'wins': self.wins,
+                    'skipped': self.skipped, 'delay': self._delay}
+
+    def _schedule(self, when, callback):
+        """Call `callback` from the scheduler thread at `when` (in seconds
+           of `time.monotonic()`).
+        """
+
+        with self._lock:
+            heapq.heappush(self._timers, (when, next(self._sequence), callback))
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._run_timers, name='sigfoxapi-hedger')
+                self._scheduler.daemon = True
+                self._scheduler.start()
+            self._wakeup.notify()
+
+    def _run_timers(self):
+        while True:
+            with self._lock:
+                while True:
+                    if self._scheduler is not threading.current_thread():
+                        # Closed.
+                        return
+                    now = time.monotonic()
+                    if self._timers and self._timers[0][0] <= now:
+                        callback = heapq.heappop(self._timers)[2]
+                        break
+                    self._wakeup.wait(self._timers[0][0] - now if self._timers else None)
+            callback()
+
+    def _hedge(self, hedge, context, func, args):
+        """Send the duplicate of a request unless the original request has
+           completed or the budget is exhausted.
+        """
+
+        with self._lock:
+            if hedge.done:
+                return
+            if self._tokens < 1:
+                self.skipped += 1
+                return
+            self._tokens -= 1
+            self.hedged += 1
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+            hedge.future = self._executor.submit(self._duplicate, hedge, context, func, args)
+
+    def _duplicate(self, hedge, context, func, args):
+        context = context or sigfoxapi.concurrency.Context()
+        with sigfoxapi.concurrency.use(sigfoxapi.concurrency.Context(
+                context.deadline, context.tokens + (hedge.duplicate,))):
+            result = func(*args)
+        with self._lock:
+            if hedge.done:
+                return
+            hedge.done = hedge.won = True
+            hedge.result = result
+            self.wins += 1
+        hedge.primary.cancel()
+
+    def call(self, func, *args):
+        """Call ``func(*args)`` and a duplicate if it's slow. Return the
+           result of the call that completes first without an exception.
+        """
+
+        context = sigfoxapi.concurrency.current()
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.burst, self._tokens + self.budget)
+            delay = self._delay
+
+        start = time.monotonic()
+        if delay is None:
+            result = func(*args)
+            self._record(time.monotonic() - start)
+            return result
+
+        hedge = _Hedge()
+        self._schedule(start + delay, lambda: self._hedge(hedge, context, func, args))
+        outer = context or sigfoxapi.concurrency.Context()
+        try:
+            with sigfoxapi.concurrency.use(sigfoxapi.concurrency.Context(
+                    outer.deadline, outer.tokens + (hedge.primary,))):
+                result = func(*args)
+        except Exception:
+            with self._lock:
+                future = hedge.future
+                if future is None:
+                    hedge.done = True
+            # Use the answer of the duplicate if there is one.
+            if future is None or future.exception() is not None or not hedge.won:
+                raise
+            # The original request was usually cancelled because the
+            # duplicate answered. Its latency is at least the time until
+            # then, which is above the percentile already.
+            self._record(time.monotonic() - start)
+            return hedge.result
+        # The latency of the original request is recorded even if the
+        # duplicate wins so that the percentile isn't biased.
+        self._record(time.monotonic() - start)
+        with self._lock:
+            won = hedge.won
+            hedge.done = True
+        hedge.duplicate.cancel()
+        return hedge.result if won else result
+
+    def close(self):
+        """Shut down the thread pool and the scheduler thread. Both are
+           started again if the hedger is used after it has been closed.
+        """
+
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._scheduler = None
+            del self._timers[:]
+            self._wakeup.notify_all()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+__all__ = ['Hedger']
@@ -0,0 +1,320 @@
+"""
+Append-only binary log of messages for replaying historic traffic.
+
+A log consists of three files next to each other.
+
+* ``<path>.rec``: Fixed-layout records (see `RECORD`), one per message.
+* ``<path>.dat``: The decoded payloads. Records point into this file.
+* ``<path>.idx``: Sparse time index. One entry with the lowest and highest
+  message time per block of `MessageLogWriter.block` records.
+
+>>> with MessageLogWriter('fleet-2017-06') as log:
+...     for page in s.pages('devicetype_messages', '5256c4d6c9a871b80f5a2e50'):
+...         log.append(page)
+
+`MessageLog` reads a log through `mmap`. Records are unpacked straight from
+the mapped file and payloads are returned as `memoryview` slices of the
+mapped payload file so iterating doesn't copy any data.
+
+>>> with MessageLog('fleet-2017-06') as log:
+...     for record in log.records(since=1496275200000, before=1496361600000):
+...         decode(record.device, record.payload)
+
+Times are stored in milliseconds. Blocks whose time range doesn't overlap
+the requested range are skipped using the index. Messages may be appended
+in any order (the API returns the newest messages first) but the index is
+most effective if the messages of a block are close in time.
+
+"""
+
+import binascii
+import collections
+import math
+import mmap
+import os
+import struct
+
+import sigfoxapi
+import sigfoxapi.payload
+
+RECORD = struct.Struct('<8sqfddIQHB5x')
+"""Layout of a record: device identifier (8 bytes ASCII), time (ms), SNR,
+   latitude, longitude, radius (m), payload offset, payload length and
+   link quality (see `LINK_QUALITIES`), padded to 56 bytes. Missing values
+   are stored as NaN or 0.
+"""
+
+INDEX = struct.Struct('<qqQQ')
+"""Layout of an index entry: lowest time, highest time, number of the
+   first record and number of records of a block.
+"""
+
+_TIME = struct.Struct('<q')
+_TIME_OFFSET = 8
+
+LINK_QUALITIES = [None, 'LIMIT', 'AVERAGE', 'GOOD', 'EXCELLENT']
+"""Link qualities in the order of their numeric representation."""
+
+_LINK_QUALITY = dict((name, n) for n, name in enumerate(LINK_QUALITIES))
+_NAN = float('nan')
+
+Record = collections.namedtuple('Record', ['device', 'time', 'snr', 'lat', 'lng', 'radius',
+                                           'link_quality', 'payload'])
+"""A message read from the log. `payload` is a `memoryview`."""
+
+
+def _float(value):
+    return _NAN if value is None else float(value)
+
+
+def _truncate(filename, size):
+    """Truncate a file to a multiple of `size` bytes and return its new
+       length. Missing files have length 0.
+    """
+
+    length = os.path.getsize(filename) if os.path.exists(filename) else 0
+    if length % size:
+        length -= length % size
+        with open(filename, 'r+b') as fp:
+            fp.truncate(length)
+    return length
+
+
+class MessageLogWriter(object):
+    """Append messages to a log.
+
+       :param path: Path of the log without extension.
+       :param block: Number of records per index entry.
+
+    """
+
+    def __init__(self, path, block=1024):
+        self.path = path
+        self.block = block
+
+        # Discard a partially written record or index entry at the end.
+        recfile, datfile, idxfile = path + '.rec', path + '.dat', path + '.idx'
+        self._count = _truncate(recfile, RECORD.size) // RECORD.size
+        entries = _truncate(idxfile, INDEX.size) // INDEX.size
+
+        with open(recfile, 'ab+') as fp:
+            # Discard payloads that no record points to.
+            end = 0
+            if self._count:
+                fp.seek((self._count - 1) * RECORD.size)
+                record = RECORD.unpack(fp.read(RECORD.size))
+                end = record[6] + record[7]
+            if os.path.exists(datfile) and os.path.getsize(datfile) > end:
+                with open(datfile, 'r+b') as dat:
+                    dat.truncate(end)
+
+            # Read the times of the records after the last index entry.
+            indexed = 0
+            if entries:
+                with open(idxfile, 'rb') as idx:
+                    idx.seek((entries - 1) * INDEX.size)
+                    _, _, first, count = INDEX.unpack(idx.read(INDEX.size))
+                indexed = first + count
+            fp.seek(indexed * RECORD.size)
+            data = fp.read()
+            times = [_TIME.unpack_from(data, position + _TIME_OFFSET)[0]
+                     for position in range(0, len(data), RECORD.size)]
+
+        self._rec = open(recfile, 'ab')
+        self._dat = open(datfile, 'ab')
+        self._idx = open(idxfile, 'ab')
+        self._offset = self._dat.tell()
+
+        # Index the blocks that were completed but not indexed and rebuild
+        # the time range of the incomplete block.
+        self._min = self._max = None
+        index = []
+        for n, time in enumerate(times, indexed + 1):
+            self._track(time)
+            if n % self.block == 0:
+                index.append(INDEX.pack(self._min, self._max, n - self.block, self.block))
+                self._min = self._max = None
+        self._idx.write(b''.join(index))
+        self._idx.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _track(self, time):
+        self._min = time if self._min is None else min(self._min, time)
+        self._max = time if self._max is None else max(self._max, time)
+
+    def append(self, messages):
+        """Append messages (dictionaries as returned by `Sigfox.device_messages()`
+           or `Sigfox.devicetype_messages()`) to the log.
+        """
+
+        records = []
+        payloads = []
+        index = []
+        # The payloads of all messages are decoded in one pass.
+        for message in sigfoxapi.payload.PageBuffer(messages):
+            device = message['device'].encode('ascii')
+            if len(device) > 8:
+                raise ValueError('device identifier too long: %r' % (message['device']))
+
+            payload = message.payload
+            location = sigfoxapi._unwrap(message.get('computedLocation')) or {}
+            time = int(round(sigfoxapi._seconds(message['time']) * 1000))
+
+            records.append(RECORD.pack(device, time, _float(message.get('snr')),
+                                       _float(location.get('lat')), _float(location.get('lng')),
+                                       int(location.get('radius') or 0),
+                                       self._offset, len(payload),
+                                       _LINK_QUALITY.get(message.get('linkQuality'), 0)))
+            payloads.append(payload)
+            self._offset += len(payload)
+
+            self._track(time)
+            self._count += 1
+            if self._count % self.block == 0:
+                index.append(INDEX.pack(self._min, self._max, self._count - self.block, self.block))
+                self._min = self._max = None
+
+        # Payloads first and index last so that nothing points beyond the
+        # end of another file if writing is interrupted.
+        self._dat.write(b''.join(payloads))
+        self._dat.flush()
+        self._rec.write(b''.join(records))
+        self._rec.flush()
+        self._idx.write(b''.join(index))
+        self._idx.flush()
+
+    def close(self):
+        for fp in (self._dat, self._rec, self._idx):
+            fp.close()
+
+
+def _map(filename):
+    """Map a file read-only. Empty files can't be mapped."""
+
+    with open(filename, 'rb') as fp:
+        if os.fstat(fp.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class MessageLog(object):
+    """Read a log through `mmap`.
+
+       :param path: Path of the log without extension.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._rec = _map(path + '.rec')
+        self._dat = _map(path + '.dat')
+        self._payloads = memoryview(self._dat)
+        with open(path + '.idx', 'rb') as fp:
+            self._index = [INDEX.unpack_from(entry) for entry in iter(lambda: fp.read(INDEX.size), b'')
+                           if len(entry) == INDEX.size]
+        self._count = len(self._rec) // RECORD.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self._count
+        if not 0 <= n < self._count:
+            raise IndexError(n)
+        return self._record(n * RECORD.size)
+
+    def __iter__(self):
+        return self.records()
+
+    def _record(self, position):
+        device, time, snr, lat, lng, radius, offset, length, quality = RECORD.unpack_from(self._rec, position)
+        return Record(device.rstrip(b'\0').decode('ascii'), time, snr, lat, lng, radius,
+                      LINK_QUALITIES[quality], self._payloads[offset:offset + length])
+
+    def _blocks(self, since, before):
+        """Yield ranges of record numbers that may contain records with
+           ``since <= time < before``.
+        """
+
+        indexed = 0
+        for low, high, first, count in self._index:
+            indexed = max(indexed, first + count)
+            if high >= since and low < before:
+                yield first, min(first + count, self._count)
+
+        # Records after the last complete block are not indexed.
+        yield indexed, self._count
+
+    def records(self, since=None, before=None, start=0):
+        """Iterate through the records.
+
+           :param since: Only records with ``time >= since`` (milliseconds).
+           :param before: Only records with ``time < before`` (milliseconds).
+           :param start: Number of the first record.
+
+        """
+
+        if since is None and before is None:
+            for position in range(start * RECORD.size, self._count * RECORD.size, RECORD.size):
+                yield self._record(position)
+            return
+
+        since = -2 ** 63 if since is None else since
+        before = 2 ** 63 - 1 if before is None else before
+        for first, last in self._blocks(since, before):
+            for position in range(max(first, start) * RECORD.size, last * RECORD.size, RECORD.size):
+                if since <= _TIME.unpack_from(self._rec, position + _TIME_OFFSET)[0] < before:
+                    yield self._record(position)
+
+    def messages(self, **kwargs):
+        """Like `MessageLog.records()` but yield dictionaries in the format
+           of `Sigfox.device_messages()` with ``time`` in milliseconds. This
+           copies the data.
+        """
+
+        for record in self.records(**kwargs):
+            message = {'device': record.device, 'time': record.time,
+                       'data': binascii.hexlify(record.payload).decode('ascii')}
+            if not math.isnan(record.snr):
+                message['snr'] = '%.6g' % (record.snr)
+            if not math.isnan(record.lat):
+                message['computedLocation'] = {'lat': record.lat, 'lng': record.lng,
+                                               'radius': record.radius}
+            if record.link_quality:
+                message['linkQuality'] = record.link_quality
+            yield message
+
+    def close(self):
+        """Unmap the files. Payloads of records that are still referenced
+           keep the payload file mapped until they are released.
+        """
+
+        if isinstance(self._rec, mmap.mmap):
+            self._rec.close()
+        try:
+            self._payloads.release()
+            if isinstance(self._dat, mmap.mmap):
+                self._dat.close()
+        except BufferError:
+            # Payloads are still referenced. They keep the mapping alive
+            # and it is closed when the last one is released.
+            pass
+        self._rec = self._dat = self._payloads = None
+
+
+__all__ = ['MessageLog', 'MessageLogWriter', 'Record', 'RECORD', 'INDEX', 'LINK_QUALITIES']
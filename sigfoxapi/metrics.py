@@ -0,0 +1,171 @@
+"""
+Compute message metrics locally instead of calling
+`Sigfox.device_messagemetrics()` for every device.
+
+`MessageMetrics` keeps rolling counters per device that are fed from
+messages that have been fetched anyway, e.g. through
+`Sigfox.devicetype_messages()`, `Sigfox.device_messages()` or callbacks.
+
+>>> metrics = MessageMetrics()
+>>> for page in s.pages('devicetype_messages', '5256c4d6c9a871b80f5a2e50', since=time.time() - 30 * 86400):
+...     metrics.update(page)
+>>> metrics.get('002C')
+{'lastDay': 47, 'lastWeek': 276, 'lastMonth': 784}
+>>> metrics.reconcile(s, ['002C'])      # Compare with the backend
+{}
+
+The windows are rolling: ``lastDay`` counts the messages of the last 24
+hours, ``lastWeek`` of the last 7 days and ``lastMonth`` of the last 30
+days. Messages are counted in buckets of `MessageMetrics.bucket` seconds
+(one hour by default) so the windows move forward in steps of one bucket.
+
+.. note:: Every message passed to `MessageMetrics.update()` is counted. Pass
+          overlapping results through `sigfoxapi.dedup.dedup()` first.
+
+"""
+
+import array
+import concurrent.futures
+import threading
+import time
+
+import sigfoxapi
+
+WINDOWS = (('lastDay', 86400), ('lastWeek', 7 * 86400), ('lastMonth', 30 * 86400))
+"""Names and lengths in seconds of the windows, as returned by
+   `Sigfox.device_messagemetrics()`.
+"""
+
+
+class _Counters(object):
+    """Ring buffer of message counts for one device.
+
+       `head` is the number of the newest bucket, `totals` holds the running
+       totals of the windows.
+
+    """
+
+    __slots__ = ('counts', 'head', 'totals')
+
+    def __init__(self, size, head):
+        self.counts = array.array('I', [0] * size)
+        self.head = head
+        self.totals = [0] * len(WINDOWS)
+
+
+class MessageMetrics(object):
+    """Rolling per-device message counters.
+
+       :param bucket: Size of the buckets in seconds.
+
+       Looking up the metrics of a device takes O(1). Adding a message
+       takes O(1) amortized.
+
+    """
+
+    def __init__(self, bucket=3600):
+        self.bucket = bucket
+        self._windows = [int(seconds // bucket) for _, seconds in WINDOWS]
+        self._size = max(self._windows)
+        self._devices = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, deviceid):
+        return deviceid in self._devices
+
+    def _advance(self, counters, head):
+        """Move the ring buffer forward to bucket `head`."""
+
+        if head - counters.head >= self._size:
+            counters.counts = array.array('I', [0] * self._size)
+            counters.totals = [0] * len(WINDOWS)
+        else:
+            counts = counters.counts
+            totals = counters.totals
+            for newest in range(counters.head + 1, head + 1):
+                for n, window in enumerate(self._windows):
+                    totals[n] -= counts[(newest - window) % self._size]
+                counts[newest % self._size] = 0
+        counters.head = head
+
+    def add(self, deviceid, timestamp):
+        """Count a message of `deviceid` sent at `timestamp` (Unix seconds
+           or milliseconds).
+        """
+
+        number = int(sigfoxapi._seconds(timestamp) // self.bucket)
+        with self._lock:
+            counters = self._devices.get(deviceid)
+            if counters is None:
+                counters = self._devices[deviceid] = _Counters(self._size, number)
+            elif number > counters.head:
+                self._advance(counters, number)
+
+            age = counters.head - number
+            if age >= self._size:
+                return
+            counters.counts[number % self._size] += 1
+            for n, window in enumerate(self._windows):
+                if age < window:
+                    counters.totals[n] += 1
+
+    def update(self, messages):
+        """Count all messages of an iterable, e.g. a page returned by
+           `Sigfox.device_messages()`.
+        """
+
+        for message in sigfoxapi._unwrap(messages):
+            message = sigfoxapi._unwrap(message)
+            self.add(message['device'], message['time'])
+
+    def get(self, deviceid, now=None):
+        """Return the metrics of a device in the format of
+           `Sigfox.device_messagemetrics()`.
+
+           :param now: Unix timestamp the windows end at. Defaults to the
+                       current time.
+
+        """
+
+        number = int((time.time() if now is None else now) // self.bucket)
+        with self._lock:
+            counters = self._devices.get(deviceid)
+            if counters is None:
+                return dict((name, 0) for name, _ in WINDOWS)
+            if number > counters.head:
+                self._advance(counters, number)
+            return dict((name, total) for (name, _), total in zip(WINDOWS, counters.totals))
+
+    def reconcile(self, sigfox, deviceids=None, max_workers=8, now=None):
+        """Compare the local metrics with `Sigfox.device_messagemetrics()`.
+
+           :param sigfox: `sigfoxapi.Sigfox` instance.
+           :param deviceids: The devices to compare. Defaults to all devices.
+           :param max_workers: Maximum number of concurrent requests.
+           :param now: See `MessageMetrics.get()`.
+           :returns: Dictionary mapping the identifiers of devices whose
+                     metrics differ to tuples ``(local, backend)``.
+
+           As the windows of the backend may not be aligned with the
+           buckets, small differences are expected for devices that sent
+           messages close to the window boundaries.
+
+        """
+
+        deviceids = list(self._devices if deviceids is None else deviceids)
+
+        def compare(deviceid):
+            backend = dict(sigfoxapi._unwrap(sigfox.device_messagemetrics(deviceid)))
+            local = self.get(deviceid, now)
+            return deviceid, local, dict((name, backend.get(name)) for name, _ in WINDOWS)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict((deviceid, (local, backend))
+                        for deviceid, local, backend in executor.map(compare, deviceids)
+                        if local != backend)
+
+
+__all__ = ['MessageMetrics', 'WINDOWS']
@@ -0,0 +1,131 @@
+"""
+Decode the hex payloads of messages once.
+
+The ``data`` field of a message is its payload as a hex string. `Message` is
+a dictionary with a `Message.payload` property that decodes ``data`` on
+first access and keeps the bytes.
+
+>>> for message in messages(s.device_messages('002C')):
+...     temperature = struct.unpack_from('<h', message.payload)[0] / 10.0
+
+The results of `sigfoxapi.Sigfox` are plain dictionaries (or `sigfoxapi.Object`
+with ``sigfoxapi.RETURN_OBJECTS = True``) and aren't decoded. Pass them to
+`messages()` or `PageBuffer` to get `Message` instances. `sigfoxapi.Object`
+has a `payload` property as well, which decodes ``data`` on every access.
+
+`PageBuffer` is the columnar variant. All payloads of a page are decoded in
+one pass into a single buffer and the payload of every message is a
+`memoryview` slice of it.
+
+>>> for page in columnar(s.pages('devicetype_messages', '5256c4d6c9a871b80f5a2e50')):
+...     for message in page:
+...         temperature = struct.unpack_from('<h', message.payload)[0] / 10.0
+
+"""
+
+import array
+
+import sigfoxapi
+
+
+class Message(dict):
+    """A message dictionary with a lazily decoded payload.
+
+       The payload is decoded when `payload` is first accessed. Later
+       changes of ``data`` aren't reflected.
+
+    """
+
+    __slots__ = ('_payload',)
+
+    @property
+    def payload(self):
+        """The decoded ``data`` field as `bytes` (or `memoryview` if the
+           message is part of a `PageBuffer`). Raises `ValueError` if
+           ``data`` isn't valid hex.
+        """
+
+        try:
+            return self._payload
+        except AttributeError:
+            self._payload = bytes.fromhex(self.get('data') or '')
+            return self._payload
+
+    def __reduce__(self):
+        # Slices of a `PageBuffer` can't be pickled, so the payload is
+        # decoded again after unpickling.
+        return (Message, (dict(self),))
+
+
+def messages(page):
+    """Return the messages of a page (a list of dictionaries, e.g. the result
+       of `Sigfox.device_messages()`) as a list of `Message` instances.
+    """
+
+    return [Message(sigfoxapi._unwrap(message)) for message in sigfoxapi._unwrap(page)]
+
+
+class PageBuffer(object):
+    """The messages of a page with all payloads decoded into one buffer.
+
+       :param page: List of message dictionaries.
+
+       :ivar messages: List of `Message` instances.
+       :ivar buffer: The concatenated payloads of all messages as `bytes`.
+       :ivar offsets: `array.array` of the offsets of the payloads within
+                      `buffer`, one more than messages.
+
+       The messages can also be accessed by index and iteration. If the
+       ``data`` field of a message isn't valid hex, the payloads are decoded
+       one at a time on access instead and `buffer` is ``None``.
+
+    """
+
+    def __init__(self, page):
+        self.messages = messages(page)
+
+        hexes = [message.get('data') or '' for message in self.messages]
+        self.offsets = array.array('I', [0])
+        position = 0
+        for data in hexes:
+            position += len(data) // 2
+            self.offsets.append(position)
+
+        # Odd lengths would shift all following payloads.
+        self.buffer = None
+        if not any(len(data) % 2 for data in hexes):
+            try:
+                self.buffer = bytes.fromhex(''.join(hexes))
+            except ValueError:
+                pass
+
+        if self.buffer is not None:
+            view = memoryview(self.buffer)
+            offsets = self.offsets
+            for n, message in enumerate(self.messages):
+                message._payload = view[offsets[n]:offsets[n + 1]]
+
+    def __len__(self):
+        return len(self.messages)
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __getitem__(self, index):
+        return self.messages[index]
+
+    def payload(self, index):
+        """Return the payload of the message at `index`."""
+        return self.messages[index].payload
+
+
+def columnar(pages):
+    """Yield a `PageBuffer` for every page of an iterable of pages, e.g.
+       `Sigfox.pages()`.
+    """
+
+    for page in pages:
+        yield PageBuffer(page)
+
+
+__all__ = ['Message', 'PageBuffer', 'columnar', 'messages']
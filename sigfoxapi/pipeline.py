@@ -0,0 +1,193 @@
+"""
+Decode message payloads in worker processes.
+
+Decoding the ``data`` of millions of messages is CPU bound and doesn't
+scale with threads. `decode()` takes pages from any message iterator, e.g.
+`Sigfox.pages()` of `Sigfox.devicetype_messages()`, `Sigfox.device_messages()`
+or `Sigfox.callback_errors()`, and ships them in large batches to a
+`concurrent.futures.ProcessPoolExecutor`.
+
+>>> def temperature(device, time, payload):
+...     return {'temperature': struct.unpack_from('<h', payload)[0] / 10.0}
+>>> pages = s.pages('devicetype_messages', '5256c4d6c9a871b80f5a2e50')
+>>> for message in decode(pages, temperature):
+...     print(message['device'], message['decoded']['temperature'])
+
+* The messages are yielded in the order of the pages.
+* Only the device identifiers, times and payloads of a batch are sent to
+  the workers, packed into a single byte string (see `encode_batch()`),
+  instead of pickling the message dictionaries. The decoded values are
+  sent back.
+* Pages are fetched by a background thread while the workers decode
+  earlier batches.
+
+The decoder must be a module-level function so that it can be pickled.
+
+"""
+
+import array
+import collections
+import concurrent.futures
+import queue
+import struct
+import threading
+
+import sigfoxapi
+
+_HEADER = struct.Struct('<III')
+_END = object()
+
+
+def encode_batch(messages):
+    """Pack the ``device``, ``time`` and ``data`` fields of messages into a
+       byte string: a header with the number of messages and the sizes of
+       the device and payload sections, the times (64 bit), the offsets of
+       the payloads (32 bit, one more than messages), the ``\\0``-separated
+       device identifiers and the concatenated hex payloads.
+    """
+
+    times = array.array('q')
+    offsets = array.array('I', [0])
+    devices = []
+    payloads = []
+    position = 0
+    for message in messages:
+        times.append(int(message['time']))
+        devices.append(message['device'])
+        data = message.get('data') or ''
+        payloads.append(data)
+        position += len(data)
+        offsets.append(position)
+
+    devices = '\0'.join(devices).encode('ascii')
+    payloads = ''.join(payloads).encode('ascii')
+    return b''.join([_HEADER.pack(len(times), len(devices), len(payloads)),
+                     times.tobytes(), offsets.tobytes(), devices, payloads])
+
+
+def decode_batch(blob):
+    """Unpack a byte string created by `encode_batch()` into a list of
+       tuples ``(device, time, payload)`` with `payload` as bytes.
+    """
+
+    count, devices_size, payloads_size = _HEADER.unpack_from(blob)
+    position = _HEADER.size
+    times = array.array('q')
+    times.frombytes(blob[position:position + 8 * count])
+    position += 8 * count
+    offsets = array.array('I')
+    offsets.frombytes(blob[position:position + 4 * (count + 1)])
+    position += 4 * (count + 1)
+    devices = blob[position:position + devices_size].decode('ascii').split('\0') if count else []
+    position += devices_size
+    payloads = blob[position:position + payloads_size].decode('ascii')
+
+    # Decode all payloads in one pass unless one has an odd length.
+    if all(offset % 2 == 0 for offset in offsets):
+        data = bytes.fromhex(payloads)
+        return [(devices[n], times[n], data[offsets[n] // 2:offsets[n + 1] // 2])
+                for n in range(count)]
+    return [(devices[n], times[n], bytes.fromhex(payloads[offsets[n]:offsets[n + 1]]))
+            for n in range(count)]
+
+
+def _run(decoder, blob):
+    """Executed in the worker processes."""
+    return [decoder(device, time, payload) for device, time, payload in decode_batch(blob)]
+
+
+def _fetch(pages, output, stop):
+    try:
+        for page in pages:
+            if stop.is_set():
+                return
+            output.put(sigfoxapi._unwrap(page))
+    except Exception as e:
+        output.put(e)
+    output.put(_END)
+
+
+def _batches(pages, size, prefetch):
+    """Fetch pages in a background thread and yield lists of `size`
+       messages.
+    """
+
+    pending = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    thread = threading.Thread(target=_fetch, args=(iter(pages), pending, stop))
+    thread.daemon = True
+    thread.start()
+
+    try:
+        batch = []
+        while True:
+            page = pending.get()
+            if page is _END:
+                break
+            if isinstance(page, Exception):
+                raise page
+            batch.extend(sigfoxapi._unwrap(message) for message in page)
+            while len(batch) >= size:
+                yield batch[:size]
+                batch = batch[size:]
+        if batch:
+            yield batch
+    finally:
+        # Unblock the thread if the consumer stopped early.
+        stop.set()
+        while not pending.empty():
+            pending.get_nowait()
+
+
+def decode(pages, decoder, field='decoded', batch=10000, max_workers=None, prefetch=4,
+           executor=None):
+    """Decode the messages of an iterable of pages in worker processes.
+
+       :param pages: Iterable of pages of messages, e.g. `Sigfox.pages()`.
+       :param decoder: Function ``decoder(device, time, payload)`` returning
+                       the decoded value of a message. `payload` are the
+                       bytes of the ``data`` field.
+       :param field: The decoded value is stored in this field of each
+                     message.
+       :param batch: Number of messages per batch.
+       :param max_workers: Number of worker processes. Defaults to the
+                           number of CPUs.
+       :param prefetch: Number of pages fetched ahead.
+       :param executor: Use this `concurrent.futures.Executor` instead of
+                        creating a `concurrent.futures.ProcessPoolExecutor`.
+
+       Yields the messages in order, each with the decoded value added.
+
+    """
+
+    own = executor is None
+    if own:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    workers = max_workers or getattr(executor, '_max_workers', None) or 1
+
+    # Keep every worker busy plus one batch queued for each.
+    inflight = collections.deque()
+    batches = _batches(pages, batch, prefetch)
+    try:
+        for messages in batches:
+            inflight.append((messages, executor.submit(_run, decoder, encode_batch(messages))))
+            while len(inflight) > 2 * workers:
+                messages, future = inflight.popleft()
+                for message, value in zip(messages, future.result()):
+                    message[field] = value
+                    yield message
+
+        while inflight:
+            messages, future = inflight.popleft()
+            for message, value in zip(messages, future.result()):
+                message[field] = value
+                yield message
+    finally:
+        batches.close()
+        for _, future in inflight:
+            future.cancel()
+        if own:
+            executor.shutdown()
+
+
+__all__ = ['decode', 'decode_batch', 'encode_batch']
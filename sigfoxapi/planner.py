@@ -0,0 +1,214 @@
+"""
+Plan how to fetch the messages of many devices.
+
+Messages of a set of devices can be fetched with one `Sigfox.device_messages()`
+stream per device or with one `Sigfox.devicetype_messages()` stream per
+device type, dropping the messages of the devices that weren't asked for.
+`QueryPlanner` groups the devices by device type and estimates the number
+of requests and bytes of both options from the message metrics, then picks
+the cheaper option for every device type.
+
+>>> planner = QueryPlanner(s, registry)
+>>> plan = planner.plan(deviceids, since=time.time() - 86400)
+>>> plan.streams        # Device types fetched with devicetype_messages()
+{'5256c4d6c9a871b80f5a2e50': {'002C', '002D', ...}}
+>>> plan.devices        # Devices fetched with device_messages()
+['4830']
+>>> plan.requests, plan.bytes
+(53, 1640000)
+>>> for message in planner.execute(plan):
+...     store(message)
+
+"""
+
+import concurrent.futures
+import math
+import time
+
+import sigfoxapi
+import sigfoxapi.metrics
+import sigfoxapi.registry
+import sigfoxapi.streams
+
+MESSAGE_SIZE = 250
+"""Estimated size of a message in a response, in bytes."""
+
+REQUEST_COST = 20000
+"""Cost of a request relative to the cost of one byte of response. The
+   round trip of a request takes about as long as transferring this many
+   bytes.
+"""
+
+
+def _rate(metrics, window):
+    """Messages per second from the result of `Sigfox.device_messagemetrics()`,
+       using the shortest metrics window that covers `window` seconds.
+    """
+
+    for name, seconds in sigfoxapi.metrics.WINDOWS:
+        if seconds >= window:
+            break
+    return (metrics.get(name) or 0) / float(seconds)
+
+
+def _spread(items, count):
+    """Return `count` items evenly spaced over the sorted `items`."""
+
+    count = min(count, len(items))
+    return [items[n * len(items) // count] for n in range(count)]
+
+
+def _requests(messages, limit):
+    return max(1, int(math.ceil(messages / float(limit))))
+
+
+class Plan(object):
+    """The result of `QueryPlanner.plan()`.
+
+       :ivar since: Start of the time window (Unix seconds).
+       :ivar before: End of the time window (Unix seconds).
+       :ivar streams: Dictionary mapping device type identifiers to the sets
+                      of devices fetched through `Sigfox.devicetype_messages()`.
+       :ivar devices: Devices fetched through `Sigfox.device_messages()`.
+       :ivar requests: Estimated number of requests.
+       :ivar bytes: Estimated number of bytes.
+
+    """
+
+    def __init__(self, since, before):
+        self.since = since
+        self.before = before
+        self.streams = {}
+        self.devices = []
+        self.requests = 0
+        self.bytes = 0
+
+    def __repr__(self):
+        return '<Plan streams=%d devices=%d requests=%d bytes=%d>' % (
+            len(self.streams), len(self.devices), self.requests, self.bytes)
+
+
+class QueryPlanner(object):
+    """Choose between per-device and per-device-type message fetches.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param registry: `sigfoxapi.registry.DeviceRegistry` used to find the
+                        device type of each device and the number of devices
+                        per device type. A new registry of all device types
+                        is loaded if it isn't given.
+       :param metrics: `sigfoxapi.metrics.MessageMetrics` with the message
+                       counts of the devices. Without it the counts of up to
+                       `sample` devices per device type are fetched with
+                       `Sigfox.device_messagemetrics()` and extrapolated.
+       :param sample: Number of devices per device type whose metrics are
+                      fetched (at least one). The sample is spread evenly
+                      over the sorted device identifiers.
+       :param limit: Number of messages per page.
+       :param max_workers: Maximum number of concurrent requests.
+
+    """
+
+    def __init__(self, sigfox, registry=None, metrics=None, sample=20, limit=100, max_workers=8):
+        self.sigfox = sigfox
+        self.registry = registry
+        self.metrics = metrics
+        self.sample = sample
+        self.limit = limit
+        self.max_workers = max_workers
+
+    def _rates(self, deviceids, window, now):
+        """Return the message rates of the devices, by fetching metrics if
+           there aren't local metrics.
+        """
+
+        if self.metrics is not None:
+            return [_rate(self.metrics.get(deviceid, now), window) for deviceid in deviceids]
+
+        def rate(deviceid):
+            return _rate(dict(sigfoxapi._unwrap(self.sigfox.device_messagemetrics(deviceid))), window)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(rate, deviceids))
+
+    def plan(self, deviceids, since, before=None):
+        """Plan fetching the messages of `deviceids` with ``since <= time < before``.
+
+           :param since: Unix timestamp in seconds. Fractions are truncated.
+           :param before: Unix timestamp in seconds. Defaults to now.
+           :returns: `Plan`
+
+           Devices that aren't part of the registry are always fetched
+           with `Sigfox.device_messages()`.
+
+        """
+
+        # The API only accepts whole seconds.
+        since = int(since)
+        before = int(time.time() if before is None else before)
+        window = max(0, before - since)
+        plan = Plan(since, before)
+
+        if self.registry is None:
+            self.registry = sigfoxapi.registry.DeviceRegistry(self.sigfox, max_workers=self.max_workers)
+            self.registry.refresh()
+
+        bytype = {}
+        for deviceid in set(deviceids):
+            device = self.registry.get(deviceid)
+            if device is None or device.get('type') is None:
+                plan.devices.append(deviceid)
+                plan.requests += 1
+            else:
+                bytype.setdefault(device['type'], []).append(deviceid)
+
+        for devicetypeid, selected in sorted(bytype.items()):
+            selected = sorted(selected)
+            members = [device['id'] for device in self.registry.find('type', devicetypeid)]
+
+            if self.metrics is not None:
+                rates = dict(zip(members, self._rates(members, window, before)))
+                selected_messages = [rates[deviceid] * window for deviceid in selected]
+                type_messages = sum(rates.values()) * window
+            else:
+                sampled = self._rates(_spread(selected, max(1, self.sample)), window, before)
+                average = sum(sampled) / len(sampled)
+                selected_messages = [average * window] * len(selected)
+                type_messages = average * window * len(members)
+
+            device_requests = sum(_requests(messages, self.limit) for messages in selected_messages)
+            device_bytes = sum(selected_messages) * MESSAGE_SIZE
+            type_requests = _requests(type_messages, self.limit)
+            type_bytes = type_messages * MESSAGE_SIZE
+
+            if type_requests * REQUEST_COST + type_bytes < device_requests * REQUEST_COST + device_bytes:
+                plan.streams[devicetypeid] = set(selected)
+                plan.requests += type_requests
+                plan.bytes += int(type_bytes)
+            else:
+                plan.devices.extend(selected)
+                plan.requests += device_requests
+                plan.bytes += int(device_bytes)
+
+        return plan
+
+    def _filtered(self, pages, deviceids):
+        for page in pages:
+            yield [message for message in sigfoxapi._unwrap(page)
+                   if sigfoxapi._unwrap(message)['device'] in deviceids]
+
+    def execute(self, plan):
+        """Fetch the messages of a `Plan`, newest first. The streams are
+           fetched concurrently and merged with `sigfoxapi.streams.merge_pages()`.
+           Streams without messages in the window (HTTP 400) are empty.
+        """
+
+        kwargs = {'since': int(plan.since), 'before': int(plan.before), 'limit': self.limit}
+        sources = [self._filtered(self.sigfox.pages('devicetype_messages', devicetypeid, **kwargs),
+                                  deviceids)
+                   for devicetypeid, deviceids in sorted(plan.streams.items())]
+        sources.extend(self.sigfox.pages('device_messages', deviceid, **kwargs)
+                       for deviceid in plan.devices)
+        return sigfoxapi.streams.merge_pages(sources, max_workers=self.max_workers)
+
+
+__all__ = ['Plan', 'QueryPlanner', 'MESSAGE_SIZE', 'REQUEST_COST']
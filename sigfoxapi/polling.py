@@ -0,0 +1,159 @@
+"""
+Poll for new messages of devices that actually sent something.
+
+`Sigfox.device_list()` returns the time of the last message of every
+device. `ChangePoller` keeps a high-water mark per device and on every
+cycle refreshes the device lists (through a `sigfoxapi.registry.DeviceRegistry`),
+compares ``last`` with the marks and calls `Sigfox.device_messages()` only
+for devices that have sent messages since the previous cycle.
+
+>>> poller = ChangePoller(s, path='marks.json')
+>>> while True:
+...     for deviceid, messages in poller.poll().items():
+...         store(deviceid, messages)
+...     time.sleep(600)
+
+Devices seen for the first time start at their current ``last`` time, i.e.
+only later messages are returned, unless `since` is passed to
+`ChangePoller`.
+
+The marks only move on once the messages of a device have been fetched
+completely. If fetching the messages of a device fails, the error is kept
+in `ChangePoller.errors` and the device is fetched again from the same
+mark in the next cycle. The other devices aren't affected.
+
+"""
+
+import concurrent.futures
+import json
+import os
+
+import sigfoxapi
+import sigfoxapi.registry
+
+
+class ChangePoller(object):
+    """Fetch new messages of devices whose ``last`` time has moved on.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param registry: `sigfoxapi.registry.DeviceRegistry` to refresh. By
+                        default a registry of `devicetypeids` is created.
+       :param devicetypeids: Device types to poll. Defaults to all device
+                             types.
+       :param path: File the high-water marks are persisted in as JSON.
+       :param since: Unix timestamp new devices start at. By default new
+                     devices start at their current ``last`` time.
+       :param max_workers: Maximum number of concurrent requests.
+       :param limit: Number of messages per page.
+
+       :ivar marks: Dictionary mapping device identifiers to the time of
+                    the newest message seen (Unix seconds).
+       :ivar skipped: Number of devices that weren't fetched in the last
+                      cycle because they haven't changed.
+       :ivar errors: Dictionary mapping the identifiers of the devices whose
+                     messages couldn't be fetched in the last cycle to the
+                     `sigfoxapi.SigfoxApiError` raised.
+
+    """
+
+    def __init__(self, sigfox, registry=None, devicetypeids=None, path=None, since=None,
+                 max_workers=8, limit=100):
+        self.sigfox = sigfox
+        self.registry = registry or sigfoxapi.registry.DeviceRegistry(
+            sigfox, devicetypeids, max_workers=max_workers, limit=limit)
+        self.path = path
+        self.since = since
+        self.max_workers = max_workers
+        self.limit = limit
+        self.marks = {}
+        self.skipped = 0
+        self.errors = {}
+
+        if path and os.path.exists(path):
+            with open(path) as fp:
+                self.marks = json.load(fp)
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump(self.marks, fp)
+        os.replace(tmp, self.path)
+
+    def changed(self):
+        """Refresh the registry and return the list of tuples ``(deviceid,
+           mark, last)`` of the devices that have sent messages after their
+           mark.
+        """
+
+        self.registry.refresh()
+
+        changed = []
+        skipped = 0
+        for device in self.registry:
+            if device.get('last') is None:
+                continue
+            last = sigfoxapi._seconds(device['last'])
+            mark = self.marks.get(device['id'])
+            if mark is None:
+                mark = self.marks[device['id']] = last if self.since is None else self.since
+            if last > mark:
+                changed.append((device['id'], mark, last))
+            else:
+                skipped += 1
+
+        self.skipped = skipped
+        return changed
+
+    def _fetch(self, deviceid, mark, last):
+        """Return the tuple ``(messages, newest)`` of the messages after
+           `mark` and the new mark of a device.
+        """
+
+        messages = []
+        newest = last
+        for page in self.sigfox.pages('device_messages', deviceid, since=int(mark), limit=self.limit):
+            for message in sigfoxapi._unwrap(page):
+                time = sigfoxapi._seconds(sigfoxapi._unwrap(message)['time'])
+                if time > mark:
+                    messages.append(message)
+                    newest = max(newest, time)
+
+        # Messages after `last` move `last` on, so the device is fetched
+        # again in the next cycle.
+        return messages, newest
+
+    def poll(self):
+        """Run one polling cycle.
+
+           :returns: Dictionary mapping the identifiers of devices with new
+                     messages to lists of the new messages (newest first).
+                     Devices that failed are left out and listed in
+                     `errors`.
+
+        """
+
+        changed = self.changed()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(deviceid, executor.submit(self._fetch, deviceid, mark, last))
+                       for deviceid, mark, last in changed]
+
+        results = {}
+        errors = {}
+        for deviceid, future in futures:
+            try:
+                messages, newest = future.result()
+            except sigfoxapi.SigfoxApiError as e:
+                errors[deviceid] = e
+                continue
+            self.marks[deviceid] = newest
+            if messages:
+                results[deviceid] = messages
+
+        self.errors = errors
+        self._save()
+        return results
+
+
+__all__ = ['ChangePoller']
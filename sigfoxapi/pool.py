@@ -0,0 +1,183 @@
+"""
+Use many Sigfox API accounts in parallel.
+
+Every group has its own API login. `SigfoxPool` keeps one `sigfoxapi.Sigfox`
+instance per account, each with its own rate limit, connections and thread
+pool, and routes calls to the account that owns a device type or group.
+Work for different accounts runs concurrently so the quota of every
+account is used at the same time.
+
+>>> pool = SigfoxPool({
+...     'north': ('1234567890abcdef', 'fedcba09876543221'),
+...     'south': ('abcdef1234567890', '09876543221fedcba'),
+... }, rate=10)
+>>> pool.discover()
+(57, 12)
+>>> pool.for_devicetype('5256c4d6c9a871b80f5a2e50').device_list('5256c4d6c9a871b80f5a2e50')
+[...]
+>>> pool.map(lambda s, devicetypeid: s.callback_list(devicetypeid), devicetypeids)
+[[...], [...], ...]
+>>> pool.broadcast('devicetype_list')
+{'north': [...], 'south': [...]}
+
+"""
+
+import concurrent.futures
+
+import sigfoxapi
+from sigfoxapi.concurrency import RateLimiter
+
+
+class SigfoxPool(object):
+    """Pool of `sigfoxapi.Sigfox` instances for several accounts.
+
+       :param accounts: Dictionary mapping account names to tuples of
+                        ``(login, password)``.
+       :param rate: Maximum number of requests per second per account
+                    (``None`` for no limit).
+       :param max_workers: Maximum number of concurrent requests per account.
+       :param kwargs: Further keyword arguments for `sigfoxapi.Sigfox`.
+
+    """
+
+    def __init__(self, accounts, rate=None, max_workers=8, **kwargs):
+        self.max_workers = max_workers
+        self._accounts = {}
+        self._executors = {}
+        for name, (login, password) in accounts.items():
+            limiter = RateLimiter(rate) if rate else None
+            self._accounts[name] = sigfoxapi.Sigfox(login, password, limiter=limiter, **kwargs)
+            self._executors[name] = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._devicetypes = {}
+        self._groups = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __iter__(self):
+        return iter(self._accounts)
+
+    def __getitem__(self, name):
+        """Return the `sigfoxapi.Sigfox` instance of an account."""
+        return self._accounts[name]
+
+    def discover(self):
+        """Find out which account owns which device types and groups using
+           `Sigfox.devicetype_list()` and `Sigfox.group_list()` of every
+           account. The accounts are queried concurrently.
+
+           :returns: Tuple with the numbers of device types and groups found.
+
+        """
+
+        def devicetypes(sigfox):
+            return sigfoxapi._unwrap(sigfox.devicetype_list())
+
+        def groups(sigfox):
+            result = []
+            for page in sigfox.pages('group_list'):
+                result.extend(sigfoxapi._unwrap(page))
+            return result
+
+        devicetype_futures = dict((name, self.submit(name, devicetypes)) for name in self._accounts)
+        group_futures = dict((name, self.submit(name, groups)) for name in self._accounts)
+
+        owners = {}
+        groupowners = {}
+        for name in self._accounts:
+            for devicetype in devicetype_futures[name].result():
+                devicetype = sigfoxapi._unwrap(devicetype)
+                owners[devicetype['id']] = name
+                if devicetype.get('group'):
+                    groupowners[devicetype['group']] = name
+            for group in group_futures[name].result():
+                groupowners[sigfoxapi._unwrap(group)['id']] = name
+
+        self._devicetypes = owners
+        self._groups = groupowners
+        return len(owners), len(groupowners)
+
+    def assign(self, name, devicetypeids=(), groupids=()):
+        """Record that account `name` owns device types and groups without
+           calling `SigfoxPool.discover()`.
+        """
+
+        if name not in self._accounts:
+            raise KeyError(name)
+        for devicetypeid in devicetypeids:
+            self._devicetypes[devicetypeid] = name
+        for groupid in groupids:
+            self._groups[groupid] = name
+
+    def devicetype_owner(self, devicetypeid):
+        """Return the name of the account owning a device type. Raises
+           `KeyError` if the device type is unknown.
+        """
+        return self._devicetypes[devicetypeid]
+
+    def group_owner(self, groupid):
+        """Return the name of the account owning a group. Raises `KeyError`
+           if the group is unknown.
+        """
+        return self._groups[groupid]
+
+    def for_devicetype(self, devicetypeid):
+        """Return the `sigfoxapi.Sigfox` instance owning a device type."""
+        return self._accounts[self.devicetype_owner(devicetypeid)]
+
+    def for_group(self, groupid):
+        """Return the `sigfoxapi.Sigfox` instance owning a group."""
+        return self._accounts[self.group_owner(groupid)]
+
+    def submit(self, name, func, *args, **kwargs):
+        """Call ``func(sigfox, *args, **kwargs)`` in the thread pool of
+           account `name`.
+
+           :returns: `concurrent.futures.Future`
+
+        """
+
+        return self._executors[name].submit(func, self._accounts[name], *args, **kwargs)
+
+    def map(self, func, items, route=None):
+        """Call ``func(sigfox, item)`` for every item with the `sigfoxapi.Sigfox`
+           instance of the account the item is routed to. All accounts work
+           concurrently.
+
+           :param route: Function returning the account name for an item.
+                         Defaults to `SigfoxPool.devicetype_owner()`.
+           :returns: List of results in the order of `items`.
+
+           >>> pool.map(lambda s, groupid: s.group_info(groupid), groupids, pool.group_owner)
+
+        """
+
+        route = route or self.devicetype_owner
+        futures = [self.submit(route(item), func, item) for item in items]
+        return [future.result() for future in futures]
+
+    def broadcast(self, method, *args, **kwargs):
+        """Call a `sigfoxapi.Sigfox` method on all accounts concurrently.
+
+           :returns: Dictionary mapping account names to results.
+
+        """
+
+        futures = dict((name, self.submit(name, lambda sigfox: getattr(sigfox, method)(*args, **kwargs)))
+                       for name in self._accounts)
+        return dict((name, future.result()) for name, future in futures.items())
+
+    def close(self):
+        """Shut down the thread pools."""
+
+        for executor in self._executors.values():
+            executor.shutdown()
+
+
+__all__ = ['SigfoxPool']
@@ -0,0 +1,209 @@
+"""
+Indexed in-memory registry of devices.
+
+`DeviceRegistry` loads `Sigfox.device_list()` for all device types and
+indexes the devices by identifier and by the fields in
+`DeviceRegistry.HASH_FIELDS` (exact lookups) and `DeviceRegistry.SORTED_FIELDS`
+(range queries).
+
+>>> registry = DeviceRegistry(s)
+>>> registry.refresh()
+(1520, 0, 0)
+>>> registry.get('002C')['name']
+'Labege 4'
+>>> registry.find('contractId', '7896541254789654aedfba4c')
+[{'id': '002C', ...}, ...]
+>>> registry.range('tokenEnd', before=1449010800000)          # Tokens ending before a date
+[...]
+>>> registry.range('last', before=int(time.time()) - 86400)   # Silent for a day
+[...]
+
+`DeviceRegistry.refresh()` can be called again at any time. Only devices
+that were added, removed or changed (usually because their ``last`` message
+time moved on) are re-indexed.
+
+"""
+
+import bisect
+import concurrent.futures
+import threading
+
+import sigfoxapi
+
+
+class DeviceRegistry(object):
+    """Indexed in-memory registry of devices.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param devicetypeids: Identifiers of the device types to load. By
+                             default all device types returned by
+                             `Sigfox.devicetype_list()` are loaded.
+       :param max_workers: Maximum number of concurrent requests.
+       :param limit: Number of devices per page.
+
+    """
+
+    HASH_FIELDS = ('name', 'contractId', 'state', 'type', 'tokenType')
+    """Fields that can be used with `DeviceRegistry.find()`."""
+
+    SORTED_FIELDS = ('last', 'tokenEnd', 'activationTime')
+    """Fields that can be used with `DeviceRegistry.range()`."""
+
+    BULK = 64
+    """Above this number of changes `DeviceRegistry.refresh()` rebuilds the
+       sorted indexes with one sort instead of updating them device by device.
+    """
+
+    def __init__(self, sigfox, devicetypeids=None, max_workers=8, limit=100):
+        self.sigfox = sigfox
+        self.devicetypeids = devicetypeids
+        self.max_workers = max_workers
+        self.limit = limit
+        self._lock = threading.RLock()
+        self._devices = {}
+        self._hash = dict((field, {}) for field in self.HASH_FIELDS)
+        self._sorted = dict((field, []) for field in self.SORTED_FIELDS)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __contains__(self, deviceid):
+        return deviceid in self._devices
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._devices.values()))
+
+    def get(self, deviceid, default=None):
+        """Return the device with identifier `deviceid`."""
+        return self._devices.get(deviceid, default)
+
+    def find(self, field, value):
+        """Return all devices whose `field` equals `value`.
+
+           >>> registry.find('state', 0)
+
+        """
+
+        with self._lock:
+            return [self._devices[deviceid] for deviceid in self._hash[field].get(value, ())]
+
+    def range(self, field, since=None, before=None):
+        """Return all devices with ``since <= device[field] < before``,
+           ordered by `field`. Devices without `field` are never returned.
+
+           >>> registry.range('tokenEnd', before=1449010800000)
+
+        """
+
+        with self._lock:
+            index = self._sorted[field]
+            start = 0 if since is None else bisect.bisect_left(index, (since,))
+            end = len(index) if before is None else bisect.bisect_left(index, (before,))
+            return [self._devices[deviceid] for _, deviceid in index[start:end]]
+
+    def _index(self, device, sort=True):
+        """Add a device to the indexes. With ``sort=False`` the sorted
+           indexes are left to `_sort()`.
+        """
+
+        deviceid = device['id']
+        self._devices[deviceid] = device
+        for field in self.HASH_FIELDS:
+            if device.get(field) is not None:
+                self._hash[field].setdefault(device[field], set()).add(deviceid)
+        if sort:
+            for field in self.SORTED_FIELDS:
+                if device.get(field) is not None:
+                    bisect.insort(self._sorted[field], (device[field], deviceid))
+
+    def _unindex(self, deviceid, sort=True):
+        device = self._devices.pop(deviceid)
+        for field in self.HASH_FIELDS:
+            if device.get(field) is not None:
+                ids = self._hash[field][device[field]]
+                ids.discard(deviceid)
+                if not ids:
+                    del self._hash[field][device[field]]
+        if sort:
+            for field in self.SORTED_FIELDS:
+                if device.get(field) is not None:
+                    index = self._sorted[field]
+                    del index[bisect.bisect_left(index, (device[field], deviceid))]
+
+    def _sort(self):
+        """Rebuild the sorted indexes from scratch."""
+
+        for field in self.SORTED_FIELDS:
+            self._sorted[field] = sorted((device[field], deviceid)
+                                         for deviceid, device in self._devices.items()
+                                         if device.get(field) is not None)
+
+    def _device_list(self, devicetypeid):
+        devices = []
+        for page in self.sigfox.pages('device_list', devicetypeid, limit=self.limit):
+            devices.extend(sigfoxapi._unwrap(page))
+        return devices
+
+    def refresh(self, devicetypeids=None):
+        """Load the devices of all (or the given) device types and update
+           the indexes.
+
+           :param devicetypeids: Only refresh these device types.
+           :returns: Tuple with the numbers of added, changed and removed
+                     devices.
+
+        """
+
+        devicetypeids = devicetypeids or self.devicetypeids
+        if devicetypeids is None:
+            devicetypeids = [devicetype['id'] for devicetype in
+                             sigfoxapi._unwrap(self.sigfox.devicetype_list())]
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(self._device_list, devicetypeids))
+
+        added = changed = removed = 0
+        with self._lock:
+            # A device may be returned on two pages if the list changed
+            # while it was paged. The last one is kept.
+            seen = {}
+            for devicetypeid, devices in zip(devicetypeids, results):
+                for device in devices:
+                    device = sigfoxapi._unwrap(device)
+                    device.setdefault('type', devicetypeid)
+                    seen[device['id']] = device
+
+            updates = []
+            stale = []
+            for deviceid, device in seen.items():
+                old = self._devices.get(deviceid)
+                if old is None:
+                    added += 1
+                elif old == device:
+                    continue
+                else:
+                    changed += 1
+                    stale.append(deviceid)
+                updates.append(device)
+
+            refreshed = set(devicetypeids)
+            for deviceid, device in self._devices.items():
+                if device.get('type') in refreshed and deviceid not in seen:
+                    stale.append(deviceid)
+                    removed += 1
+
+            # Inserting into the sorted lists one by one is quadratic, e.g.
+            # on the first refresh.
+            bulk = len(updates) + len(stale) > self.BULK
+            for deviceid in stale:
+                self._unindex(deviceid, sort=not bulk)
+            for device in updates:
+                self._index(device, sort=not bulk)
+            if bulk:
+                self._sort()
+
+        return added, changed, removed
+
+
+__all__ = ['DeviceRegistry']
@@ -17,12 +17,115 @@ else:
     from urllib.request import urlopen # pragma: no cover
 
 import socket
+import threading
 from httplib2 import Http, ServerNotFoundError
 
 from drest import exc, interface, meta, serialization, response, request
 
+import sigfoxapi
+import sigfoxapi.concurrency
+import sigfoxapi.tracing
+
 class RequestHandler(request.RequestHandler):
 
+    class Meta:
+        tracer = None
+        cassette = None
+
+    def __init__(self, **kw):
+        self._local = threading.local()
+        self._generation = 0
+        super(RequestHandler, self).__init__(**kw)
+
+    # -------------------------------------------------------------------------
+    # Keep one httplib2.Http() object per thread. httplib2.Http is not thread
+    # safe and a separate connection per thread allows concurrent requests
+    # through a single `sigfoxapi.Sigfox` instance.
+
+    def _get_http(self):
+        local = self._local
+        if getattr(local, 'http', None) is None or local.generation != self._generation:
+            if self._meta.ignore_ssl_validation:
+                http = Http(disable_ssl_certificate_validation=True,
+                            timeout=self._meta.timeout)
+            else:
+                http = Http(timeout=self._meta.timeout)
+
+            if self._auth_credentials:
+                http.add_credentials(self._auth_credentials[0],
+                                     self._auth_credentials[1])
+
+            local.http = http
+            local.generation = self._generation
+        return local.http
+
+    def _clear_http(self):
+        self._local.http = None
+
+    def set_auth_credentials(self, user, password):
+        self._generation += 1
+        super(RequestHandler, self).set_auth_credentials(user, password)
+    # -------------------------------------------------------------------------
+
+    # -------------------------------------------------------------------------
+    # Honour the deadline and cancellation token of
+    # `sigfoxapi.concurrency.current()`. The socket timeout is set to the
+    # remaining time and the retry of drest's _make_request() is only made
+    # within it.
+
+    def _set_timeout(self, http, timeout):
+        http.timeout = timeout
+        for conn in list(http.connections.values()):
+            conn.timeout = timeout
+            if getattr(conn, 'sock', None) is not None:
+                conn.sock.settimeout(timeout)
+
+    def _make_request(self, url, method, payload=None, headers=None):
+        if payload is None:
+            payload = {}
+        if headers is None:
+            headers = {}
+
+        context = sigfoxapi.concurrency.current()
+        for attempt in range(2):
+            remaining = None if context is None else context.remaining()
+            timeout = self._meta.timeout if remaining is None else remaining
+            http = self._get_http()
+            self._set_timeout(http, timeout)
+
+            def abort():
+                # Unblock the thread waiting for the response. httplib2
+                # reconnects once if the connection is closed, so make that
+                # attempt time out immediately.
+                http.timeout = 0.001
+                for conn in list(http.connections.values()):
+                    conn.timeout = 0.001
+                    if getattr(conn, 'sock', None) is not None:
+                        try:
+                            conn.sock.shutdown(socket.SHUT_RDWR)
+                        except socket.error:
+                            pass
+
+            tokens = context.tokens if context is not None else ()
+            for token in tokens:
+                token.add_callback(abort)
+            try:
+                return http.request(url, method, payload, headers=headers)
+            except socket.error as e:
+                self._clear_http()
+                if context is not None:
+                    context.check()
+                    if isinstance(e, socket.timeout) and context.deadline is not None:
+                        raise sigfoxapi.SigfoxApiTimeout('deadline exceeded')
+                # Try again just in case there was an issue with the cached _http
+                if attempt:
+                    raise exc.dRestAPIError(e)
+            except ServerNotFoundError as e:
+                raise exc.dRestAPIError(e.args[0])
+            finally:
+                for token in tokens:
+                    token.remove_callback(abort)
+    # -------------------------------------------------------------------------
 
     def make_request(self, method, url, params=None, headers=None):
         """
@@ -67,23 +170,36 @@ class RequestHandler(request.RequestHandler):
             print('DREST_DEBUG: method=%s url=%s params=%s headers=%s' % \
                    (method, url, params, headers))
 
-        if self._meta.serialize: 
-            payload = self._serialize(params)
-        else:
-            payload = urlencode(params)
+        tracer = self._meta.tracer or sigfoxapi.tracing.NULL_TRACER
+
+        with tracer.start_as_current_span('sigfoxapi.serialize'):
+            if self._meta.serialize:
+                payload = self._serialize(params)
+            else:
+                payload = urlencode(params)
 
         if method is 'GET' and not self._meta.allow_get_body:
             payload = ''
             if self._meta.debug:
                 print("DREST_DEBUG: supressing body for GET request")
 
-        res_headers, data = self._make_request(url, method, payload,
-                                               headers=headers)
+        with tracer.start_as_current_span('sigfoxapi.transport',
+                                          attributes={'http.method': method, 'http.url': url}) as span:
+            if self._meta.cassette is not None:
+                res_headers, data = self._meta.cassette.play(self._make_request, url, method,
+                                                             payload, headers=headers)
+            else:
+                res_headers, data = self._make_request(url, method, payload,
+                                                       headers=headers)
+            span.set_attribute('http.status_code', int(res_headers['status']))
+            span.set_attribute('sigfoxapi.response_size', len(data))
+
         unserialized_data = data
         serialized_data = None
         if self._meta.deserialize:
             serialized_data = data
-            data = self._deserialize(data)
+            with tracer.start_as_current_span('sigfoxapi.deserialize'):
+                data = self._deserialize(data)
 
         return_response = response.ResponseHandler(
             int(res_headers['status']), data, res_headers,
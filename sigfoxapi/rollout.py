@@ -0,0 +1,322 @@
+"""
+Roll out configuration to many device types.
+
+`CallbackReconciler` takes the desired set of callbacks and brings the
+callbacks of many device types in line with it. The current callbacks of
+all device types are fetched concurrently and compared with the desired
+ones. Only the requests that are actually needed are sent:
+
+* ``callback_new`` for missing callbacks (one request per device type),
+* ``callback_enable`` and ``callback_disable`` for callbacks whose
+  ``enabled`` flag differs,
+* ``callback_downlink`` for callbacks that should be the downlink callback,
+* ``callback_delete`` for callbacks that aren't desired.
+
+>>> callbacks = [{
+...     "channel" : "URL",
+...     "callbackType" : 0,
+...     "callbackSubtype" : 2,
+...     "url" : "http://myserver.com/sigfox/callback",
+...     "httpMethod" : "POST",
+...     "enabled" : True,
+... }]
+>>> reconciler = CallbackReconciler(s, callbacks, rate=5)
+>>> plan = reconciler.plan(devicetypeids)
+>>> sum(len(actions) for actions in plan.values())      # Number of POSTs
+12
+>>> for result in reconciler.apply(plan).values():
+...     if result.error:
+...         print(result.devicetypeid, result.error)
+
+`DeviceTypeRollout` does the same for `Sigfox.devicetype_edit()`. The
+current device types are read concurrently (or taken from a cache such as
+the result of `Sigfox.devicetype_list()`) and only the fields that differ
+are sent. Device types that are already up to date are skipped.
+
+>>> rollout = DeviceTypeRollout(s, {'keepAlive': 3600}, current=s.devicetype_list())
+>>> results = rollout.reconcile(devicetypeids)
+
+The actions of one device type are applied in order, device types are
+processed concurrently. All POSTs share one `sigfoxapi.concurrency.RateLimiter`.
+A device type whose current state can't be read is reported with the error
+in its `Result` and doesn't stop the others.
+
+"""
+
+import collections
+import concurrent.futures
+
+import sigfoxapi
+from sigfoxapi.concurrency import RateLimiter
+
+Action = collections.namedtuple('Action', ['devicetypeid', 'method', 'args'])
+"""A request to send: ``getattr(sigfox, method)(devicetypeid, *args)``."""
+
+Result = collections.namedtuple('Result', ['devicetypeid', 'applied', 'error'])
+"""The outcome for one device type: the actions that have been applied and
+   the exception that stopped the remaining actions (or ``None``).
+"""
+
+IDENTITY_FIELDS = ('channel', 'callbackType', 'callbackSubtype', 'url')
+"""Fields that must be equal for a callback to match a desired callback."""
+
+STATE_FIELDS = ('id', 'enabled', 'dead', 'downlinkHook')
+"""Fields that are not part of the definition of a callback."""
+
+
+class Plan(dict):
+    """The result of ``plan()``: a dictionary mapping device type
+       identifiers to lists of `Action`. Lists are empty for device types
+       that are up to date.
+
+       :ivar errors: Dictionary mapping the identifiers of the device types
+                     whose current state couldn't be read to the exception.
+
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(Plan, self).__init__(*args, **kwargs)
+        self.errors = {}
+
+
+def _definition(callback):
+    """Return the fields defining a callback. ``callback_list()`` returns
+       the URL as ``urlPattern``, ``callback_new()`` expects ``url``.
+    """
+
+    definition = dict((key, value) for key, value in callback.items() if key not in STATE_FIELDS)
+    if 'urlPattern' in definition:
+        definition.setdefault('url', definition.pop('urlPattern'))
+    return definition
+
+
+def _matches(current, desired):
+    """Fields that aren't returned by ``callback_list()`` can't be compared
+       and are ignored.
+    """
+
+    for key in IDENTITY_FIELDS:
+        if current.get(key) != desired.get(key):
+            return False
+    return all(current[key] == desired[key] for key in set(current) & set(desired))
+
+
+def diff_callbacks(devicetypeid, current, desired, prune=True):
+    """Return the list of actions turning the `current` callbacks of a
+       device type into the `desired` ones.
+
+       :param current: Callbacks as returned by `Sigfox.callback_list()`.
+       :param desired: Callbacks in the format of `Sigfox.callback_new()`.
+                       ``enabled`` defaults to ``True``. A callback with
+                       ``downlinkHook`` set to ``True`` is selected as the
+                       downlink callback.
+       :param prune: Delete current callbacks that aren't desired.
+
+    """
+
+    current = [sigfoxapi._unwrap(callback) for callback in current]
+    definitions = [_definition(callback) for callback in current]
+    unmatched = list(range(len(current)))
+
+    create = []
+    actions = []
+    downlinks = []
+    for callback in desired:
+        definition = _definition(callback)
+        match = None
+        for n in unmatched:
+            if _matches(definitions[n], definition):
+                match = n
+                break
+
+        if match is None:
+            new = dict(definition, enabled=callback.get('enabled', True))
+            create.append(new)
+            if callback.get('downlinkHook'):
+                downlinks.append(Action(devicetypeid, 'callback_downlink', (new,)))
+            continue
+
+        unmatched.remove(match)
+        existing = current[match]
+        if callback.get('enabled', True) != existing.get('enabled'):
+            method = 'callback_enable' if callback.get('enabled', True) else 'callback_disable'
+            actions.append(Action(devicetypeid, method, (existing['id'],)))
+        if callback.get('downlinkHook') and not existing.get('downlinkHook'):
+            downlinks.append(Action(devicetypeid, 'callback_downlink', (existing['id'],)))
+
+    if create:
+        actions.insert(0, Action(devicetypeid, 'callback_new', (create,)))
+    actions.extend(downlinks)
+    if prune:
+        actions.extend(Action(devicetypeid, 'callback_delete', (current[n]['id'],)) for n in unmatched)
+    return actions
+
+
+class _Rollout(object):
+    """Base class of the rollouts.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param plan_type: Function returning the list of actions for one
+                         device type. It may raise `sigfoxapi.SigfoxApiError`.
+       :param max_workers: Maximum number of concurrent requests.
+       :param rate: Maximum number of POSTs per second (``None`` for no
+                    limit).
+
+    """
+
+    def __init__(self, sigfox, plan_type, max_workers=8, rate=10):
+        self.sigfox = sigfox
+        self.plan_type = plan_type
+        self.max_workers = max_workers
+        self.limiter = RateLimiter(rate) if rate else None
+
+    def _prepare(self, action):
+        """Called right before an action is applied."""
+        return action
+
+    def plan(self, devicetypeids):
+        """Fetch the current state concurrently.
+
+           :returns: `Plan`. An error reading one device type is recorded in
+                     ``Plan.errors`` and doesn't stop the others.
+
+        """
+
+        plan = Plan()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(devicetypeid, executor.submit(self.plan_type, devicetypeid))
+                       for devicetypeid in devicetypeids]
+            for devicetypeid, future in futures:
+                try:
+                    plan[devicetypeid] = future.result()
+                except sigfoxapi.SigfoxApiError as e:
+                    plan.errors[devicetypeid] = e
+        return plan
+
+    def _apply(self, devicetypeid, actions):
+        applied = []
+        try:
+            for action in actions:
+                action = self._prepare(action)
+                if self.limiter is not None:
+                    self.limiter.acquire()
+                getattr(self.sigfox, action.method)(action.devicetypeid, *action.args)
+                applied.append(action)
+        except sigfoxapi.SigfoxApiError as e:
+            return Result(devicetypeid, applied, e)
+        return Result(devicetypeid, applied, None)
+
+    def apply(self, plan):
+        """Apply a plan returned by ``plan()``.
+
+           :returns: Dictionary mapping the device type identifiers of the
+                     plan to `Result`. Device types without actions have
+                     an empty ``applied`` list. An error stops the remaining
+                     actions of that device type only. Device types in
+                     ``Plan.errors`` are reported with their error.
+
+        """
+
+        results = dict((devicetypeid, Result(devicetypeid, [], None))
+                       for devicetypeid, actions in plan.items() if not actions)
+        results.update((devicetypeid, Result(devicetypeid, [], error))
+                       for devicetypeid, error in getattr(plan, 'errors', {}).items())
+        pending = [(devicetypeid, actions) for devicetypeid, actions in plan.items() if actions]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._apply, devicetypeid, actions)
+                       for devicetypeid, actions in pending]
+            results.update((result.devicetypeid, result)
+                           for result in (future.result() for future in futures))
+        return results
+
+    def reconcile(self, devicetypeids):
+        """Plan and apply in one step."""
+        return self.apply(self.plan(devicetypeids))
+
+
+class CallbackReconciler(_Rollout):
+    """Reconcile the callbacks of many device types with a desired set.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param callbacks: The desired callbacks, see `diff_callbacks()`.
+       :param prune: Delete callbacks that aren't desired.
+       :param max_workers: Maximum number of concurrent requests.
+       :param rate: Maximum number of POSTs per second (``None`` for no
+                    limit).
+
+    """
+
+    def __init__(self, sigfox, callbacks, prune=True, max_workers=8, rate=10):
+        super(CallbackReconciler, self).__init__(sigfox, self._plan_type, max_workers, rate)
+        self.callbacks = list(callbacks)
+        self.prune = prune
+
+    def _plan_type(self, devicetypeid):
+        current = sigfoxapi._unwrap(self.sigfox.callback_list(devicetypeid))
+        return diff_callbacks(devicetypeid, current, self.callbacks, self.prune)
+
+    def _prepare(self, action):
+        """Find the identifier of a callback created by this rollout."""
+
+        if action.method != 'callback_downlink' or not isinstance(action.args[0], dict):
+            return action
+
+        definition = _definition(action.args[0])
+        for current in sigfoxapi._unwrap(self.sigfox.callback_list(action.devicetypeid)):
+            current = sigfoxapi._unwrap(current)
+            if _matches(_definition(current), definition):
+                return action._replace(args=(current['id'],))
+        raise sigfoxapi.SigfoxApiError('created callback not found on device type %s' %
+                                       (action.devicetypeid))
+
+
+def diff_devicetype(current, changes):
+    """Return the fields of `changes` whose values differ from the
+       `current` device type (as returned by `Sigfox.devicetype_info()`).
+    """
+
+    current = sigfoxapi._unwrap(current)
+    return dict((key, value) for key, value in changes.items()
+                if key != 'id' and current.get(key) != value)
+
+
+class DeviceTypeRollout(_Rollout):
+    """Edit many device types, sending only the fields that differ.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param changes: Dictionary of the format of `Sigfox.devicetype_edit()`
+                       or a function returning such a dictionary for the
+                       current device type.
+       :param current: Iterable of device types as returned by
+                       `Sigfox.devicetype_list()`. Device types that aren't
+                       part of it are read with `Sigfox.devicetype_info()`.
+       :param max_workers: Maximum number of concurrent requests.
+       :param rate: Maximum number of POSTs per second (``None`` for no
+                    limit).
+
+       >>> rollout = DeviceTypeRollout(s, lambda devicetype: {
+       ...     'description': devicetype['name'] + ' (production)'})
+       >>> for result in rollout.reconcile(devicetypeids).values():
+       ...     print(result.devicetypeid, result.applied, result.error)
+
+    """
+
+    def __init__(self, sigfox, changes, current=None, max_workers=8, rate=10):
+        super(DeviceTypeRollout, self).__init__(sigfox, self._plan_type, max_workers, rate)
+        self.changes = changes
+        self.current = {}
+        for devicetype in sigfoxapi._unwrap(current) or ():
+            devicetype = sigfoxapi._unwrap(devicetype)
+            self.current[devicetype['id']] = devicetype
+
+    def _plan_type(self, devicetypeid):
+        current = self.current.get(devicetypeid)
+        if current is None:
+            current = sigfoxapi._unwrap(self.sigfox.devicetype_info(devicetypeid))
+        changes = self.changes(current) if callable(self.changes) else self.changes
+        fields = diff_devicetype(current, changes)
+        return [Action(devicetypeid, 'devicetype_edit', (fields,))] if fields else []
+
+
+__all__ = ['Action', 'CallbackReconciler', 'DeviceTypeRollout', 'Plan', 'Result', 'diff_callbacks',
+           'diff_devicetype', 'IDENTITY_FIELDS', 'STATE_FIELDS']
@@ -0,0 +1,296 @@
+"""
+Spatial index of device and message locations.
+
+`SpatialIndex` keeps points in a sorted list ordered by their geohash, i.e.
+the interleaved bits of longitude and latitude. All points of a geohash
+cell are adjacent in that list, so a query visits a few cells that cover
+the search area and finds the points of each with a binary search.
+
+>>> index = SpatialIndex()
+>>> index.update_devices(s.device_list('5256c4d6c9a871b80f5a2e50'))
+>>> index.radius(43.45, 1.54, 2000)                 # Within 2 km
+[(0.0, '002C'), (1523.4, '4830')]
+>>> index.bbox(43.0, 1.0, 44.0, 2.0)
+['002C', '4830', ...]
+>>> index.nearest(43.45, 1.54, k=3)
+[(0.0, '002C'), (1523.4, '4830'), (8812.0, '4831')]
+>>> index.save('devices.json')
+
+Points are identified by string keys: the device identifier for
+`SpatialIndex.update_devices()` and ``'<deviceid>/<time>'`` for the
+location histories added with `SpatialIndex.update_locations()`. Adding a
+key again moves the point. Distances are in metres.
+
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+
+import sigfoxapi
+
+BITS = 26
+"""Bits per coordinate. Cells at the finest level are about 0.6 m wide."""
+
+EARTH_RADIUS = 6371008.8
+"""Mean radius of the earth in metres."""
+
+_METRES_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+BULK = 64
+"""Above this number of points `SpatialIndex.update_devices()` and
+   `SpatialIndex.update_locations()` re-sort the index once instead of
+   inserting the points one by one.
+"""
+
+
+def _spread(v):
+    """Insert a zero bit before every bit of a 32 bit integer."""
+
+    v = (v | (v << 16)) & 0x0000FFFF0000FFFF
+    v = (v | (v << 8)) & 0x00FF00FF00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F0F0F0F0F
+    v = (v | (v << 2)) & 0x3333333333333333
+    return (v | (v << 1)) & 0x5555555555555555
+
+
+def _interleave(x, y):
+    return (_spread(x) << 1) | _spread(y)
+
+
+def _cell(lat, lng, level):
+    """Return the cell column and row of a point at `level`."""
+
+    size = 1 << level
+    x = min(size - 1, int((lng + 180.0) / 360.0 * size))
+    y = min(size - 1, int((lat + 90.0) / 180.0 * size))
+    return x, y
+
+
+def geohash(lat, lng):
+    """Return the geohash of a point as an integer of ``2 * BITS`` bits."""
+
+    x, y = _cell(lat, lng, BITS)
+    return _interleave(x, y)
+
+
+def distance(lat1, lng1, lat2, lng2):
+    """Return the great-circle distance between two points in metres."""
+
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _location(lat, lng):
+    lat, lng = float(lat), float(lng)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError('invalid location: %r, %r' % (lat, lng))
+    return lat, lng
+
+
+class SpatialIndex(object):
+    """Geohash index of points.
+
+       :param path: Load the index from this file (see `save()`).
+
+    """
+
+    def __init__(self, path=None):
+        self._points = {}
+        self._index = []
+        self._lock = threading.RLock()
+        if path is not None and os.path.exists(path):
+            with open(path) as fp:
+                points = json.load(fp)['points']
+            self._points = dict((key, (lat, lng)) for key, lat, lng in points)
+            self._index = sorted((geohash(lat, lng), key) for key, lat, lng in points)
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def get(self, key, default=None):
+        """Return the tuple ``(lat, lng)`` of a point."""
+        return self._points.get(key, default)
+
+    def add(self, key, lat, lng):
+        """Add a point or move an existing one."""
+
+        lat, lng = _location(lat, lng)
+        with self._lock:
+            if key in self._points:
+                if self._points[key] == (lat, lng):
+                    return
+                self.remove(key)
+            self._points[key] = (lat, lng)
+            bisect.insort(self._index, (geohash(lat, lng), key))
+
+    def remove(self, key):
+        """Remove a point. Missing keys are ignored."""
+
+        with self._lock:
+            point = self._points.pop(key, None)
+            if point is not None:
+                del self._index[bisect.bisect_left(self._index, (geohash(*point), key))]
+
+    def update_devices(self, devices, computed=False):
+        """Add or move the devices of the result of `Sigfox.device_list()`
+           (or a `sigfoxapi.registry.DeviceRegistry`). Devices without a
+           location are removed.
+
+           :param computed: Use ``computedLocation`` instead of ``lat`` and
+                            ``lng`` if the device has one.
+
+        """
+
+        points = []
+        removed = []
+        for device in sigfoxapi._unwrap(devices):
+            device = sigfoxapi._unwrap(device)
+            location = device
+            if computed and device.get('computedLocation'):
+                location = sigfoxapi._unwrap(device['computedLocation'])
+            if location.get('lat') is None or location.get('lng') is None:
+                removed.append(device['id'])
+            else:
+                points.append((device['id'], location['lat'], location['lng']))
+        self._update(points, removed)
+
+    def update_locations(self, deviceid, locations):
+        """Add the result of `Sigfox.device_locations()`. Locations that
+           aren't ``valid`` are skipped.
+        """
+
+        points = []
+        for location in sigfoxapi._unwrap(locations):
+            location = sigfoxapi._unwrap(location)
+            if location.get('valid', True) and location.get('lat') is not None:
+                points.append(('%s/%s' % (deviceid, location['time']), location['lat'], location['lng']))
+        self._update(points)
+
+    def _update(self, points, removed=()):
+        """Add or move the points of a list of tuples ``(key, lat, lng)``
+           and remove the keys in `removed`.
+        """
+
+        if len(points) + len(removed) <= BULK:
+            for key in removed:
+                self.remove(key)
+            for key, lat, lng in points:
+                self.add(key, lat, lng)
+            return
+
+        points = [(key,) + _location(lat, lng) for key, lat, lng in points]
+        with self._lock:
+            changed = set(removed)
+            changed.update(key for key, _, _ in points)
+            for key in removed:
+                self._points.pop(key, None)
+            for key, lat, lng in points:
+                self._points[key] = (lat, lng)
+            # The remaining entries are still sorted, so the sort merges them
+            # with the new ones in about linear time.
+            index = [entry for entry in self._index if entry[1] not in changed]
+            index.extend((geohash(*self._points[key]), key) for key in changed if key in self._points)
+            index.sort()
+            self._index = index
+
+    def _scan(self, south, west, north, east):
+        """Yield the keys and locations of the points within a box that
+           doesn't cross the antimeridian.
+        """
+
+        # Choose the level at which the box covers about two cells per
+        # dimension.
+        width = max(east - west, 1e-9)
+        height = max(north - south, 1e-9)
+        level = max(0, min(BITS, int(math.floor(min(math.log(360.0 / width, 2),
+                                                     math.log(180.0 / height, 2))))))
+        shift = 2 * (BITS - level)
+        x0, y0 = _cell(south, west, level)
+        x1, y1 = _cell(north, east, level)
+
+        index = self._index
+        for x in range(x0, x1 + 1):
+            for y in range(y0, y1 + 1):
+                low = _interleave(x << (BITS - level), y << (BITS - level))
+                start = bisect.bisect_left(index, (low,))
+                end = bisect.bisect_left(index, (low + (1 << shift),))
+                for _, key in index[start:end]:
+                    lat, lng = self._points[key]
+                    if south <= lat <= north and west <= lng <= east:
+                        yield key, lat, lng
+
+    def _box(self, south, west, north, east):
+        if west <= east:
+            return list(self._scan(south, west, north, east))
+        return list(self._scan(south, west, north, 180.0)) + list(self._scan(south, -180.0, north, east))
+
+    def bbox(self, south, west, north, east):
+        """Return the keys of the points within a bounding box in degrees.
+           If `west` is greater than `east` the box crosses the
+           antimeridian.
+        """
+
+        with self._lock:
+            return [key for key, _, _ in self._box(south, west, north, east)]
+
+    def radius(self, lat, lng, radius):
+        """Return the list of tuples ``(distance, key)`` of the points within
+           `radius` metres of a location, nearest first.
+        """
+
+        dlat = radius / _METRES_PER_DEGREE
+        south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+        cos = math.cos(math.radians(max(abs(south), abs(north))))
+        if north >= 90 or south <= -90 or cos * 180 <= dlat:
+            west, east = -180.0, 180.0
+        else:
+            dlng = dlat / cos
+            west, east = lng - dlng, lng + dlng
+            west = west + 360 if west < -180 else west
+            east = east - 360 if east > 180 else east
+
+        with self._lock:
+            found = []
+            for key, plat, plng in self._box(south, west, north, east):
+                d = distance(lat, lng, plat, plng)
+                if d <= radius:
+                    found.append((d, key))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lng, k=1, start=1000.0):
+        """Return the list of tuples ``(distance, key)`` of the `k` points
+           nearest to a location, nearest first.
+
+           :param start: Initial search radius in metres. The radius is
+                         doubled until `k` points are found.
+
+        """
+
+        radius = start
+        while True:
+            found = self.radius(lat, lng, radius)
+            if len(found) >= k or radius > math.pi * EARTH_RADIUS:
+                return found[:k]
+            radius *= 2
+
+    def save(self, path):
+        """Write the index to a JSON file."""
+
+        with self._lock:
+            points = [[key, lat, lng] for key, (lat, lng) in sorted(self._points.items())]
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as fp:
+            json.dump({'points': points}, fp)
+        os.replace(tmp, path)
+
+
+__all__ = ['SpatialIndex', 'BITS', 'EARTH_RADIUS', 'distance', 'geohash']
@@ -0,0 +1,186 @@
+"""
+Merge paged results of many endpoints into one time-ordered stream.
+
+The API returns events newest first. `merge()` performs a k-way merge of
+the pages of many sources and yields the events of all sources newest
+first, without fetching everything before the first event is returned.
+
+>>> for event in devicetype_events(s, devicetypeids, since=time.time() - 86400):
+...     print(event['time'], event['severity'], event['deviceId'], event['message'])
+
+Pages are fetched by a thread pool shared by all sources, at most one page
+per source at a time. Every source buffers at most `prefetch` pages ahead
+of the merge; a source whose buffer is full isn't fetched until the merge
+has consumed a page from it. Memory is therefore bounded by the number of
+sources times ``prefetch + 1`` pages.
+
+The API answers with HTTP 400 instead of an empty list if there are no
+results between `since` and `before`. A source raising
+`sigfoxapi.SigfoxApiBadRequest` before its first page is therefore merged
+as an empty source.
+
+"""
+
+import collections
+import concurrent.futures
+import heapq
+import threading
+
+import sigfoxapi
+
+
+class _Source(object):
+    """Fetch the pages of one iterator ahead of the consumer."""
+
+    def __init__(self, pages, executor, prefetch):
+        self._pages = pages
+        self._executor = executor
+        self._prefetch = prefetch
+        self._cond = threading.Condition()
+        self._buffer = collections.deque()
+        self._running = False
+        self._done = False
+        self._error = None
+        self._first = True
+        with self._cond:
+            self._schedule()
+
+    def _schedule(self):
+        # Called with the lock held.
+        if self._running or self._done or len(self._buffer) >= self._prefetch:
+            return
+        try:
+            self._executor.submit(self._fetch)
+            self._running = True
+        except RuntimeError:
+            # The executor has been shut down because the merge was closed.
+            self._done = True
+
+    def _fetch(self):
+        error = None
+        try:
+            page = next(self._pages, None)
+        except sigfoxapi.SigfoxApiBadRequest as e:
+            # No results in the since/before window.
+            page = None
+            if not self._first:
+                error = e
+        except Exception as e:
+            page = None
+            error = e
+
+        with self._cond:
+            self._first = False
+            self._running = False
+            if page is None:
+                self._done = True
+                self._error = error
+            else:
+                self._buffer.append(sigfoxapi._unwrap(page))
+                self._schedule()
+            self._cond.notify_all()
+
+    def get(self):
+        """Return the next page or ``None`` if there are no more pages."""
+
+        with self._cond:
+            while not self._buffer and not self._done:
+                self._cond.wait()
+            if self._buffer:
+                page = self._buffer.popleft()
+                self._schedule()
+                return page
+            if self._error is not None:
+                raise self._error
+            return None
+
+
+def _newest_first(event):
+    return -sigfoxapi._seconds(sigfoxapi._unwrap(event)['time'])
+
+
+def merge_pages(iterables, key=_newest_first, prefetch=2, max_workers=8):
+    """Merge iterables of pages whose items are sorted by `key`.
+
+       :param iterables: Iterables yielding pages (lists of items).
+       :param key: Function returning the sort key of an item. Defaults to
+                   ``time``, newest first.
+       :param prefetch: Number of pages to buffer per iterable.
+       :param max_workers: Maximum number of concurrent requests.
+
+       Items with equal keys are yielded in the order of `iterables`. An
+       iterable raising `sigfoxapi.SigfoxApiBadRequest` before its first
+       page is treated as empty.
+
+    """
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        sources = [_Source(iter(pages), executor, prefetch) for pages in iterables]
+        iterators = [iter(()) for _ in sources]
+        heap = []
+
+        def push(n):
+            # Skip empty pages.
+            while True:
+                for item in iterators[n]:
+                    heapq.heappush(heap, (key(item), n, item))
+                    return
+                page = sources[n].get()
+                if page is None:
+                    return
+                iterators[n] = iter(page)
+
+        for n in range(len(sources)):
+            push(n)
+
+        while heap:
+            _, n, item = heapq.heappop(heap)
+            yield item
+            push(n)
+    finally:
+        executor.shutdown(wait=False)
+
+
+def merge(sigfox, sources, prefetch=2, max_workers=8, **kwargs):
+    """Merge the results of several methods, newest first.
+
+       :param sigfox: `sigfoxapi.Sigfox` instance.
+       :param sources: Tuples of a method name and its positional arguments.
+       :param kwargs: Keyword arguments for all methods, e.g. ``since``,
+                      ``before`` or ``limit``.
+
+       >>> merge(s, [('device_errors', '002C'), ('device_warnings', '002C'),
+       ...           ('devicetype_errors', '5256c4d6c9a871b80f5a2e50')])
+
+    """
+
+    return merge_pages([sigfox.pages(source[0], *source[1:], **kwargs) for source in sources],
+                       prefetch=prefetch, max_workers=max_workers)
+
+
+def devicetype_events(sigfox, devicetypeids, **kwargs):
+    """Merge `Sigfox.devicetype_errors()` and `Sigfox.devicetype_warnings()`
+       of several device types. See `merge()` for the keyword arguments.
+    """
+
+    sources = []
+    for devicetypeid in devicetypeids:
+        sources.append(('devicetype_errors', devicetypeid))
+        sources.append(('devicetype_warnings', devicetypeid))
+    return merge(sigfox, sources, **kwargs)
+
+
+def device_events(sigfox, deviceids, **kwargs):
+    """Merge `Sigfox.device_errors()` and `Sigfox.device_warnings()` of
+       several devices. See `merge()` for the keyword arguments.
+    """
+
+    sources = []
+    for deviceid in deviceids:
+        sources.append(('device_errors', deviceid))
+        sources.append(('device_warnings', deviceid))
+    return merge(sigfox, sources, **kwargs)
+
+
+__all__ = ['device_events', 'devicetype_events', 'merge', 'merge_pages']
@@ -0,0 +1,163 @@
+"""
+Tracing hooks for `sigfoxapi.Sigfox`.
+
+A tracer is any object with a ``start_as_current_span(name, attributes=None)``
+method that returns a context manager yielding a span. `sigfoxapi` always
+passes the attributes as keyword argument, i.e.
+``start_as_current_span(name, attributes={...})``. A span must provide
+``set_attribute(key, value)``. This is a subset of the OpenTelemetry
+``Tracer`` interface, whose ``start_as_current_span(name, context=None,
+kind=..., attributes=None)`` takes the parent context as second argument,
+so an OpenTelemetry tracer can be used directly without `sigfoxapi`
+depending on it.
+
+>>> from opentelemetry import trace
+>>> s = Sigfox(login, password, tracer=trace.get_tracer('sigfoxapi'))
+
+The following spans are emitted for every call of `Sigfox.request()`.
+
+* ``sigfoxapi.request``: The whole call, including all phases below.
+* ``sigfoxapi.serialize``: Serialization of the request parameters by `drest`.
+* ``sigfoxapi.transport``: The HTTP(S) request itself.
+* ``sigfoxapi.deserialize``: Decoding of the JSON response.
+* ``sigfoxapi.paginate``: Parsing of the ``paging`` URL of the response.
+
+The ``sigfoxapi.request`` span carries the pagination lineage in the
+``sigfoxapi.page`` attribute (``0`` for the first page, incremented by every
+call of `Sigfox.next()`) and the ``sigfoxapi.cursor`` attribute (the query
+string of the ``paging`` URL the page was requested with).
+
+"""
+
+import threading
+import time
+
+
+class NullSpan(object):
+    """Span that discards everything. Used when no tracer has been configured."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+
+class NullTracer(object):
+    """Tracer that emits `NullSpan` objects only."""
+
+    def start_as_current_span(self, name, attributes=None):
+        return NULL_SPAN
+
+
+NULL_SPAN = NullSpan()
+NULL_TRACER = NullTracer()
+
+
+class RecordedSpan(object):
+    """A span recorded by `RecordingTracer`.
+
+       :param name: The span name, e.g. ``sigfoxapi.transport``.
+       :param attributes: Dictionary of span attributes.
+       :param parent: The enclosing `RecordedSpan` or ``None``.
+
+    """
+
+    def __init__(self, tracer, name, attributes, parent):
+        self._tracer = tracer
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = parent
+        self.start = None
+        self.end = None
+        self.error = None
+
+    @property
+    def duration(self):
+        """Duration of the span in seconds or ``None`` if it hasn't ended yet."""
+        if self.end is None:
+            return None
+        return self.end - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self._tracer._push(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.end = time.perf_counter()
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        self._tracer._pop(self)
+        return False
+
+    def __repr__(self):
+        return '<RecordedSpan %s %s>' % (self.name, self.attributes)
+
+
+class RecordingTracer(object):
+    """Tracer that keeps all finished spans in memory.
+
+       This is meant for profiling runs when no OpenTelemetry setup is
+       available.
+
+       >>> tracer = sigfoxapi.tracing.RecordingTracer()
+       >>> s = Sigfox(login, password, tracer=tracer)
+       >>> messages = s.devicetype_messages('5256c4d6c9a871b80f5a2e50')
+       >>> while s.next:
+       ...     messages += s.next()
+       >>> tracer.summary()
+       {'sigfoxapi.request': (4, 1.92), 'sigfoxapi.transport': (4, 1.81), ... }
+
+    """
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def _push(self, span):
+        self._stack().append(span)
+
+    def _pop(self, span):
+        self._stack().remove(span)
+        with self._lock:
+            self.spans.append(span)
+
+    def start_as_current_span(self, name, attributes=None):
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        return RecordedSpan(self, name, attributes, parent)
+
+    def clear(self):
+        """Discard all recorded spans."""
+        with self._lock:
+            self.spans = []
+
+    def summary(self):
+        """Return a dictionary mapping span names to tuples of
+           ``(count, total duration in seconds)``.
+        """
+        result = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            count, total = result.get(span.name, (0, 0.0))
+            result[span.name] = (count + 1, total + span.duration)
+        return result
+
+
+__all__ = ['NullSpan', 'NullTracer', 'NULL_SPAN', 'NULL_TRACER', 'RecordedSpan', 'RecordingTracer']
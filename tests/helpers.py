@@ -0,0 +1,76 @@
+"""
+Fakes shared by the tests.
+
+"""
+
+import json
+import threading
+
+import sigfoxapi
+
+
+def response(body, status='200'):
+    """Return the ``(headers, data)`` tuple of a transport for a JSON body."""
+    return {'status': status}, json.dumps(body).encode('utf-8')
+
+
+def make_sigfox(transport, **kwargs):
+    """Return a `sigfoxapi.Sigfox` instance sending its requests to
+       `transport`, a function with the signature of
+       `sigfoxapi.requesthandler.RequestHandler._make_request()`.
+    """
+
+    s = sigfoxapi.Sigfox('login', 'password', **kwargs)
+    s.api.request._make_request = transport
+    return s
+
+
+class PageTransport(object):
+    """Transport answering from a dictionary mapping URLs to bodies.
+
+       :param fail: URL answered with `status` instead.
+
+    """
+
+    def __init__(self, pages, fail=None, status='500'):
+        self.pages = pages
+        self.fail = fail
+        self.status = status
+
+    def __call__(self, url, method, payload=None, headers=None):
+        if url == self.fail:
+            return response({}, self.status)
+        return response(self.pages[url])
+
+
+class FakeSigfox(object):
+    """Stand-in for `sigfoxapi.Sigfox` implementing ``pages('device_list',
+       devicetypeid)`` and `devicetype_list()` over a list of device
+       dictionaries. Tests subclass it for other methods. ``pages(method,
+       ...)`` calls the generator ``_<method>()`` of the subclass.
+
+       :ivar calls: List of the tuples passed to `record()`. `pages()`
+                    records ``(method, identifier)``.
+
+    """
+
+    def __init__(self, devices=()):
+        self.devices = list(devices)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def record(self, *call):
+        with self.lock:
+            self.calls.append(call)
+
+    def devicetype_list(self):
+        return [{'id': devicetypeid} for devicetypeid in sorted(set(d['type'] for d in self.devices))]
+
+    def pages(self, method, identifier, limit=100, **kwargs):
+        self.record(method, identifier)
+        return getattr(self, '_' + method)(identifier, limit=limit, **kwargs)
+
+    def _device_list(self, devicetypeid, limit):
+        devices = [dict(d) for d in self.devices if d['type'] == devicetypeid]
+        for offset in range(0, len(devices), limit):
+            yield devices[offset:offset + limit]
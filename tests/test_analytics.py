@@ -0,0 +1,98 @@
+"""
+Test sigfoxapi.analytics
+
+"""
+
+from nose.plugins.skip import SkipTest
+from nose.tools import assert_almost_equal
+
+try:
+    import numpy
+except ImportError:
+    raise SkipTest('NumPy is not installed')
+
+import sigfoxapi
+from sigfoxapi.analytics import LINK_QUALITIES, LinkQuality, columns, device_columns
+
+T0 = 1496275200
+
+
+def pages(count, size, snr):
+    """Messages of three devices, newest first, in pages of `size`."""
+
+    messages = [{'device': ['002C', '4830', '4831'][n % 3], 'time': (T0 + n) * 1000,
+                 'snr': None if n % 3 == 2 else '%.2f' % (snr(n)),
+                 'linkQuality': LINK_QUALITIES[1 + n % 4],
+                 'computedLocation': {'lat': 43.45, 'lng': 6.54}}
+                for n in reversed(range(count))]
+    return [messages[offset:offset + size] for offset in range(0, count, size)]
+
+
+def test_columns():
+    data = columns(sigfoxapi.Object([{'device': '002C', 'time': T0 * 1000, 'snr': '12.50',
+                                      'linkQuality': 'GOOD'},
+                                     {'device': '4830', 'time': T0, 'computedLocation': {'lat': 1.5}}]))
+    assert list(data['device']) == ['002C', '4830']
+    assert list(data['time']) == [T0, T0]
+    assert data['snr'][0] == 12.5 and numpy.isnan(data['snr'][1])
+    assert list(data['link_quality']) == [3, 0]
+    assert data['lat'][1] == 1.5 and numpy.isnan(data['lng'][1])
+
+
+def test_device_columns():
+    data = device_columns([{'id': '002C', 'averageSnr': 12.5, 'averageRssi': -120.0}, {'id': '4830'}])
+    assert list(data['id']) == ['002C', '4830']
+    assert data['averageRssi'][0] == -120.0 and numpy.isnan(data['averageSnr'][1])
+
+
+def test_incremental():
+    quality = LinkQuality(window=10)
+    for page in pages(90, 7, lambda n: 10 + n % 5):
+        quality.update(page)
+
+    summary = quality.summary()
+    assert quality.devices == ['002C', '4830', '4831']
+    assert list(summary['count']) == [30, 30, 0]
+    assert_almost_equal(summary['mean'][0], numpy.mean([10 + n % 5 for n in range(0, 90, 3)]))
+    assert_almost_equal(summary['std'][1], numpy.std([10 + n % 5 for n in range(1, 90, 3)]))
+    assert summary['min'][0] == 10 and summary['max'][0] == 14
+    assert numpy.isnan(summary['mean'][2]) and numpy.isnan(summary['min'][2])
+    assert list(summary['recent_count']) == [10, 10, 0]
+    # The newest 10 messages of 002C are n = 60, 63, ..., 87.
+    assert_almost_equal(summary['recent_mean'][0], numpy.mean([10 + n % 5 for n in range(60, 90, 3)]))
+
+    distribution = quality.distribution()
+    assert distribution.shape == (3, len(LINK_QUALITIES))
+    assert distribution.sum() == 90 and distribution[:, 0].sum() == 0
+    numpy.testing.assert_allclose(quality.distribution(normalize=True).sum(axis=1), [1, 1, 1])
+
+    times, averages = quality.rolling('002C', span=2)
+    assert list(times) == list(range(T0 + 60, T0 + 90, 3))
+    assert averages[0] == 10 + 60 % 5
+    assert_almost_equal(averages[1], (10 + 60 % 5 + 10 + 63 % 5) / 2.0)
+
+
+def test_degraded():
+    quality = LinkQuality(window=5)
+    for page in pages(60, 10, lambda n: 5.0 if n >= 45 and n % 3 == 1 else 15.0):
+        quality.update(page)
+    assert quality.degraded(drop=3.0) == ['4830']
+    assert quality.degraded(drop=3.0, min_samples=6) == []
+
+
+def test_page_order():
+    # Oldest first (ring buffer) and newest first (merged) give the same
+    # recent statistics.
+    forward = LinkQuality(window=4)
+    backward = LinkQuality(window=4)
+    for page in reversed(pages(50, 6, lambda n: n % 7)):
+        forward.update(list(reversed(page)))
+    for page in pages(50, 6, lambda n: n % 7):
+        backward.update(page)
+
+    for quality in (forward, backward):
+        summary = quality.summary()
+        assert list(summary['recent_count']) == [4, 4, 0]
+        assert_almost_equal(summary['recent_mean'][1], numpy.mean([n % 7 for n in range(40, 50, 3)]))
+        times, _ = quality.rolling('4830')
+        assert list(times) == list(range(T0 + 40, T0 + 50, 3))
@@ -0,0 +1,97 @@
+"""
+Test sigfoxapi.breaker
+
+"""
+
+from nose.tools import assert_raises
+
+import sigfoxapi
+from sigfoxapi.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, endpoint
+
+from helpers import make_sigfox, response
+
+
+class Transport(object):
+
+    def __init__(self):
+        self.status = {}
+        self.calls = []
+
+    def __call__(self, url, method, payload=None, headers=None):
+        path = url.split('/api', 1)[1].split('?')[0]
+        self.calls.append(path)
+        status = self.status.get(path.split('/')[1], '200')
+        return response({'id': '002C'}, status)
+
+
+def test_endpoint():
+    assert endpoint('GET', '/devices/002C/messages') == 'GET devices/*/messages'
+    assert endpoint('POST', '/devicetypes/T1/callbacks/C1/enable') == 'POST devicetypes/*/callbacks/*/enable'
+
+
+def test_open_and_recover():
+    clock = [0.0]
+    breaker = CircuitBreaker(error_rate=0.5, window=4, min_requests=4, reset_timeout=10)
+    transport = Transport()
+    s = make_sigfox(transport, breaker=breaker)
+    transport.status['devices'] = '500'
+
+    sigfoxapi.breaker.time.monotonic, monotonic = (lambda: clock[0]), sigfoxapi.breaker.time.monotonic
+    try:
+        for _ in range(4):
+            with assert_raises(sigfoxapi.SigfoxApiServerError):
+                s.device_info('002C')
+        assert breaker.state('GET', '/devices/002C') == OPEN
+
+        # Fail fast without a request, other endpoints are unaffected.
+        calls = len(transport.calls)
+        with assert_raises(sigfoxapi.SigfoxApiCircuitOpen):
+            s.device_info('4830')
+        assert len(transport.calls) == calls
+        s.devicetype_info('T1')
+        assert breaker.states()['GET devicetypes/*'] == CLOSED
+
+        # A failing probe opens the circuit again.
+        clock[0] = 11
+        with assert_raises(sigfoxapi.SigfoxApiServerError):
+            s.device_info('002C')
+        assert breaker.state('GET', '/devices/002C') == OPEN
+
+        # A successful probe closes it.
+        clock[0] = 22
+        transport.status['devices'] = '200'
+        s.device_info('002C')
+        assert breaker.state('GET', '/devices/002C') == CLOSED
+    finally:
+        sigfoxapi.breaker.time.monotonic = monotonic
+
+
+def test_client_errors_are_healthy():
+    breaker = CircuitBreaker(window=2, min_requests=2)
+    transport = Transport()
+    s = make_sigfox(transport, breaker=breaker)
+    transport.status['devices'] = '404'
+    for _ in range(5):
+        with assert_raises(sigfoxapi.SigfoxApiNotFound):
+            s.device_info('002C')
+    assert breaker.state('GET', '/devices/002C') == CLOSED
+
+
+def test_half_open_single_probe():
+    breaker = CircuitBreaker(window=1, min_requests=1, reset_timeout=0)
+
+    def fail():
+        raise sigfoxapi.SigfoxApiServerError('500')
+
+    with assert_raises(sigfoxapi.SigfoxApiServerError):
+        breaker.call('GET', '/devices/1', fail)
+    assert breaker.state('GET', '/devices/1') == OPEN
+
+    def probe():
+        assert breaker.state('GET', '/devices/1') == HALF_OPEN
+        with assert_raises(sigfoxapi.SigfoxApiCircuitOpen):
+            breaker.call('GET', '/devices/2', lambda: None)
+        return 'ok'
+
+    assert breaker.call('GET', '/devices/1', probe) == 'ok'
+    assert breaker.state('GET', '/devices/1') == CLOSED
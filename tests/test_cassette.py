@@ -0,0 +1,114 @@
+"""
+Test sigfoxapi.cassette
+
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import urllib.parse
+
+from nose.tools import assert_raises
+
+import sigfoxapi
+from sigfoxapi.cassette import Cassette
+
+from helpers import make_sigfox, response
+
+
+class Backend(object):
+    """Serve 5 messages of a device in pages of `limit` messages."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, url, method, payload=None, headers=None):
+        self.requests.append((method, url))
+        path, _, query = url.partition('?')
+        if method != 'GET':
+            return response({'id': 'T1', 'body': json.loads(payload)})
+
+        params = dict(urllib.parse.parse_qsl(query))
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 2))
+        data = {'data': [{'device': '002C', 'time': 100 - n} for n in range(offset, min(offset + limit, 5))]}
+        if offset + limit < 5:
+            data['paging'] = {'next': '%s?offset=%d&limit=%d' % (path, offset + limit, limit)}
+        return {'status': '200', 'content-type': 'application/json'}, json.dumps(data).encode('utf-8')
+
+
+def offline(url, method, payload=None, headers=None):
+    raise AssertionError('request sent in replay mode')
+
+
+class TestCassette(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def record(self, path):
+        backend = Backend()
+        with Cassette(path, mode='record') as cassette:
+            s = make_sigfox(backend, cassette=cassette)
+            pages = [sigfoxapi._unwrap(page) for page in s.pages('device_messages', '002C', limit=2)]
+            created = sigfoxapi._unwrap(s.request('POST', 'devicetypes/edit', {'name': 'x', 'id': 'T1'}))
+        assert cassette.recorded == len(backend.requests) == 4
+        return pages, created
+
+    def test_replay(self):
+        self.check_replay('cassette.jsonl')
+
+    def test_replay_gzip(self):
+        self.check_replay('cassette.jsonl.gz')
+
+    def check_replay(self, name):
+        path = os.path.join(self.tmpdir, name)
+        pages, created = self.record(path)
+        assert [len(page) for page in pages] == [2, 2, 1]
+
+        cassette = Cassette(path)
+        assert len(cassette) == 4
+        s = make_sigfox(offline, cassette=cassette)
+        assert [sigfoxapi._unwrap(page) for page in s.pages('device_messages', '002C', limit=2)] == pages
+        # The JSON keys of the body are matched regardless of their order.
+        assert sigfoxapi._unwrap(s.request('POST', 'devicetypes/edit', {'id': 'T1', 'name': 'x'})) == created
+        assert cassette.hits == 4
+
+    def test_missing(self):
+        path = os.path.join(self.tmpdir, 'cassette.jsonl')
+        self.record(path)
+        s = make_sigfox(offline, cassette=Cassette(path))
+        with assert_raises(sigfoxapi.SigfoxApiError):
+            s.device_messages('4830')
+
+    def test_errors(self):
+        path = os.path.join(self.tmpdir, 'cassette.jsonl')
+        with Cassette(path, mode='record') as cassette:
+            s = make_sigfox(lambda *args, **kwargs: response({}, '404'), cassette=cassette)
+            with assert_raises(sigfoxapi.SigfoxApiNotFound):
+                s.device_info('002C')
+
+        s = make_sigfox(offline, cassette=Cassette(path))
+        with assert_raises(sigfoxapi.SigfoxApiNotFound):
+            s.device_info('002C')
+
+    def test_timing(self):
+        path = os.path.join(self.tmpdir, 'cassette.jsonl')
+        with open(path, 'w') as fp:
+            fp.write(json.dumps({'method': 'GET', 'url': 'https://backend.sigfox.com/api/devices/002C',
+                                 'body': '', 'status': 200, 'headers': {}, 'data': '{"id": "002C"}',
+                                 'elapsed': 0.5}) + '\n')
+
+        slept = []
+        sigfoxapi.cassette.time.sleep, sleep = slept.append, sigfoxapi.cassette.time.sleep
+        try:
+            make_sigfox(offline, cassette=Cassette(path)).device_info('002C')
+            assert slept == []
+            make_sigfox(offline, cassette=Cassette(path, timing=True, speed=2)).device_info('002C')
+            assert slept == [0.25]
+        finally:
+            sigfoxapi.cassette.time.sleep = sleep
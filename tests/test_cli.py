@@ -0,0 +1,155 @@
+"""
+Test sigfoxapi.cli
+
+"""
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+
+import drest.exc
+from nose.tools import assert_raises
+
+import sigfoxapi
+import sigfoxapi.cli
+
+from helpers import PageTransport, make_sigfox
+
+URL = 'https://backend.sigfox.com/api/devices/%s/messages'
+
+
+def make_pages(device, count):
+    """Return fake responses with one message per page."""
+
+    pages = {}
+    for n in range(count):
+        url = URL % (device)
+        if n:
+            url += '?before=%d&offset=%d' % (1000 - n + 1, n)
+        page = {'data': [{'device': device, 'time': 1000 - n, 'data': '%04x' % (n),
+                          'computedLocation': {'lat': 43.45, 'lng': 6.54}}],
+                'paging': {}}
+        if n < count - 1:
+            page['paging']['next'] = URL % (device) + '?before=%d&offset=%d' % (1000 - n, n + 1)
+        pages[url] = page
+    return pages
+
+
+class TestCli(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.pages = make_pages('002C', 3)
+        self.pages.update(make_pages('002D', 2))
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def read_jsonl(self, name):
+        with open(os.path.join(self.tmpdir, name)) as fp:
+            return [json.loads(line) for line in fp]
+
+    def test_output_dir(self):
+        s = make_sigfox(PageTransport(self.pages))
+        rc = sigfoxapi.cli.main(['device-messages', '002C', '002D', '--login', 'l', '--password', 'p',
+                                 '--output-dir', self.tmpdir, '--concurrency', '2'], sigfox=s)
+        assert rc == 0
+        assert [m['time'] for m in self.read_jsonl('002C.jsonl')] == [1000, 999, 998]
+        assert [m['time'] for m in self.read_jsonl('002D.jsonl')] == [1000, 999]
+
+    def test_csv(self):
+        s = make_sigfox(PageTransport(self.pages))
+        output = os.path.join(self.tmpdir, 'out.csv')
+        rc = sigfoxapi.cli.main(['device-messages', '002C', '--login', 'l', '--password', 'p',
+                                 '--format', 'csv', '--output', output], sigfox=s)
+        assert rc == 0
+        with open(output) as fp:
+            rows = list(csv.DictReader(fp))
+        assert len(rows) == 3
+        assert rows[0]['computedLocation.lat'] == '43.45'
+
+    def test_resume(self):
+        checkpoint = os.path.join(self.tmpdir, 'export.ckpt')
+        argv = ['device-messages', '002C', '002D', '--login', 'l', '--password', 'p',
+                '--output-dir', self.tmpdir, '--concurrency', '1', '--resume', checkpoint]
+
+        fail = URL % ('002C') + '?before=999&offset=2'
+        s = make_sigfox(PageTransport(self.pages, fail=fail))
+        assert sigfoxapi.cli.main(argv, sigfox=s) == 1
+        assert len(self.read_jsonl('002C.jsonl')) == 2
+
+        s = make_sigfox(PageTransport(self.pages))
+        assert sigfoxapi.cli.main(argv, sigfox=s) == 0
+        assert [m['time'] for m in self.read_jsonl('002C.jsonl')] == [1000, 999, 998]
+        assert [m['time'] for m in self.read_jsonl('002D.jsonl')] == [1000, 999]
+
+        with open(checkpoint) as fp:
+            assert json.load(fp) == {'done': ['002C', '002D'], 'cursors': {}}
+
+    def test_empty_window(self):
+        # The API answers with HTTP 400 if there are no messages.
+        checkpoint = os.path.join(self.tmpdir, 'export.ckpt')
+        s = make_sigfox(PageTransport(self.pages, fail=URL % ('002C'), status='400'))
+        rc = sigfoxapi.cli.main(['device-messages', '002C', '002D', '--login', 'l', '--password', 'p',
+                                 '--output-dir', self.tmpdir, '--resume', checkpoint], sigfox=s)
+        assert rc == 0
+        assert not os.path.exists(os.path.join(self.tmpdir, '002C.jsonl'))
+        assert len(self.read_jsonl('002D.jsonl')) == 2
+        with open(checkpoint) as fp:
+            assert json.load(fp)['done'] == ['002C', '002D']
+
+    def test_checkpoint_torn_line(self):
+        checkpoint = os.path.join(self.tmpdir, 'export.ckpt')
+        with open(checkpoint, 'w') as fp:
+            fp.write('{"done": [], "cursors": {}}\n')
+            fp.write('{"key": "002D", "cursor": null}\n')
+            fp.write('{"key": "002C", "cur')
+        s = make_sigfox(PageTransport(self.pages))
+        rc = sigfoxapi.cli.main(['device-messages', '002C', '002D', '--login', 'l', '--password', 'p',
+                                 '--output-dir', self.tmpdir, '--resume', checkpoint], sigfox=s)
+        assert rc == 0
+        assert len(self.read_jsonl('002C.jsonl')) == 3
+        assert not os.path.exists(os.path.join(self.tmpdir, '002D.jsonl'))
+        with open(checkpoint) as fp:
+            assert json.load(fp) == {'done': ['002C', '002D'], 'cursors': {}}
+
+    def test_transport_error_continues(self):
+        pages = PageTransport(self.pages)
+
+        def transport(url, method, payload=None, headers=None):
+            if url == URL % ('002C'):
+                raise drest.exc.dRestAPIError('Connection refused')
+            return pages(url, method, payload, headers)
+
+        s = make_sigfox(transport)
+        rc = sigfoxapi.cli.main(['device-messages', '002C', '002D', '--login', 'l', '--password', 'p',
+                                 '--output-dir', self.tmpdir, '--concurrency', '1'], sigfox=s)
+        assert rc == 1
+        assert len(self.read_jsonl('002D.jsonl')) == 2
+
+    def test_error_continues(self):
+        s = make_sigfox(PageTransport(self.pages, fail=URL % ('002C')))
+        rc = sigfoxapi.cli.main(['device-messages', '002C', '002D', '--login', 'l', '--password', 'p',
+                                 '--output-dir', self.tmpdir, '--concurrency', '1'], sigfox=s)
+        assert rc == 1
+        assert len(self.read_jsonl('002D.jsonl')) == 2
+
+
+def test_timestamp():
+    assert sigfoxapi.cli.timestamp('1496239200') == 1496239200
+    assert sigfoxapi.cli.timestamp('2017-05-31T14:00') == 1496239200
+
+
+def test_invalid_filters():
+    for argv in (['devicetype-list', '--limit', '10'],
+                 ['callback-list', '5256c4d6c9a871b80f5a2e50', '--since', '2017-06-01']):
+        with assert_raises(SystemExit):
+            sigfoxapi.cli.parse_args(argv + ['--login', 'l', '--password', 'p'])
+
+
+def test_pages():
+    pages = make_pages('002C', 3)
+    s = make_sigfox(PageTransport(pages))
+    assert [len(page) for page in s.pages('device_messages', '002C')] == [1, 1, 1]
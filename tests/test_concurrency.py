@@ -0,0 +1,232 @@
+"""
+Test sigfoxapi.concurrency
+
+"""
+
+import threading
+import time
+
+import sigfoxapi
+import sigfoxapi.concurrency
+
+from helpers import make_sigfox, response
+
+
+class BlockingTransport(object):
+    """Fake transport that blocks until released."""
+
+    def __init__(self, status='200', body=None):
+        self.status = status
+        self.body = body or {'id': '4d3091a05ee16b3cc86699ab', 'name': 'Sigfox test device'}
+        self.calls = 0
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, url, method, payload=None, headers=None):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(5)
+        return response(self.body, self.status)
+
+
+def run_concurrently(s, transport, count=5):
+    results = [None] * count
+
+    def target(n):
+        try:
+            results[n] = s.devicetype_info('4d3091a05ee16b3cc86699ab')
+        except sigfoxapi.SigfoxApiError as e:
+            results[n] = e
+
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(count)]
+    threads[0].start()
+    transport.entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    transport.release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_coalesce():
+    transport = BlockingTransport()
+    results = run_concurrently(make_sigfox(transport), transport)
+    assert transport.calls == 1
+    assert all(result['name'] == 'Sigfox test device' for result in results)
+    assert len(set(id(result) for result in results)) == len(results)
+
+
+def test_coalesce_error():
+    transport = BlockingTransport(status='404', body={})
+    results = run_concurrently(make_sigfox(transport), transport)
+    assert transport.calls == 1
+    assert all(isinstance(result, sigfoxapi.SigfoxApiNotFound) for result in results)
+    assert len(set(id(result) for result in results)) == len(results)
+
+
+def test_no_coalesce():
+    transport = BlockingTransport()
+    transport.release.set()
+    results = run_concurrently(make_sigfox(transport, coalesce=False), transport)
+    assert transport.calls == 5
+
+
+def test_singleflight_sequential():
+    flight = sigfoxapi.concurrency.SingleFlight()
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.do('key', lambda: 2) == (2, False)
+
+
+def test_singleflight_copies():
+    # The copies of the waiters are made before they are released, so the
+    # leader may modify its result straight away.
+    flight = sigfoxapi.concurrency.SingleFlight(copy=list)
+    entered = threading.Event()
+    release = threading.Event()
+    results = []
+
+    def leader():
+        result, shared = flight.do('key', lambda: entered.set() or release.wait(5) and [1])
+        result.append(2)
+
+    def waiter():
+        results.append(flight.do('key', lambda: [3]))
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    entered.wait(5)
+    threads.extend(threading.Thread(target=waiter) for _ in range(3))
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [([1], True)] * 3
+    assert len(set(id(result) for result, _ in results)) == 3
+
+
+def run_leader(flight, leader_func, waiter_func, waiters=3):
+    """Call `flight.do()` with `leader_func` in one thread and then with
+       `waiter_func` in `waiters` threads while the first call is running.
+       Return the results or exceptions of the leader and the waiters.
+    """
+
+    entered = threading.Event()
+    release = threading.Event()
+    results = [None] * (waiters + 1)
+
+    def blocking():
+        entered.set()
+        release.wait(5)
+        return leader_func()
+
+    def target(n, func):
+        try:
+            results[n] = flight.do('key', func)
+        except BaseException as e:
+            results[n] = e
+
+    threads = [threading.Thread(target=target, args=(0, blocking))]
+    threads[0].start()
+    entered.wait(5)
+    threads.extend(threading.Thread(target=target, args=(n, waiter_func)) for n in range(1, waiters + 1))
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class Interrupt(BaseException):
+    pass
+
+
+def test_singleflight_leader_interrupted():
+    # Only the leader is interrupted, the waiters call the function again.
+    def interrupted():
+        raise Interrupt()
+
+    results = run_leader(sigfoxapi.concurrency.SingleFlight(), interrupted, lambda: 'result')
+    assert isinstance(results[0], Interrupt)
+    assert [result for result, _ in results[1:]] == ['result'] * 3
+
+
+class CustomError(Exception):
+
+    def __init__(self, code):
+        super(CustomError, self).__init__('error %d' % (code))
+
+
+def test_singleflight_error_constructor():
+    def fail():
+        raise CustomError(42)
+
+    results = run_leader(sigfoxapi.concurrency.SingleFlight(), fail, fail)
+    assert all(isinstance(result, CustomError) for result in results)
+
+
+def test_singleflight_copy_error():
+    # The leader keeps its result if the copies for the waiters fail.
+    def copy(result):
+        raise ValueError('cannot copy')
+
+    results = run_leader(sigfoxapi.concurrency.SingleFlight(copy=copy), lambda: [1], lambda: [2])
+    assert results[0] == ([1], True)
+    assert all(isinstance(result, ValueError) for result in results[1:])
+
+
+def test_singleflight_leader_timeout():
+    # The deadline of the leader doesn't apply to the waiters, they call
+    # the function again.
+    flight = sigfoxapi.concurrency.SingleFlight()
+    entered = threading.Event()
+    calls = []
+    results = []
+
+    def func():
+        calls.append(1)
+        if len(calls) == 1:
+            entered.set()
+            time.sleep(0.1)
+            raise sigfoxapi.SigfoxApiTimeout('deadline exceeded')
+        time.sleep(0.05)
+        return 'result'
+
+    def leader():
+        try:
+            flight.do('key', func)
+        except sigfoxapi.SigfoxApiTimeout:
+            results.append('timeout')
+
+    def waiter():
+        results.append(flight.do('key', func)[0])
+
+    threads = [threading.Thread(target=leader)]
+    threads[0].start()
+    entered.wait(5)
+    threads.extend(threading.Thread(target=waiter) for _ in range(3))
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == ['result', 'result', 'result', 'timeout']
+    assert len(calls) == 2
+
+
+def test_ratelimiter():
+    limiter = sigfoxapi.concurrency.RateLimiter(50, burst=2)
+    start = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(7)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Two calls from the burst, five more at 50 per second.
+    assert 0.09 <= time.monotonic() - start < 0.5
@@ -0,0 +1,70 @@
+"""
+Test sigfoxapi.consumption
+
+"""
+
+import array
+import shutil
+import tempfile
+import time
+
+from sigfoxapi.consumption import ConsumptionCache, ConsumptionStore, DAYS
+
+import helpers
+
+
+class FakeSigfox(helpers.FakeSigfox):
+
+    def device_consumptions(self, deviceid, year):
+        self.record(deviceid, year)
+        days = 366 if year % 4 == 0 else 365
+        return {'consumption': {'id': '%s_%s' % (deviceid, year),
+                                'consumptions': [{'frameCount': day % 10, 'downlinkFrameCount': day % 2}
+                                                 for day in range(days)]}}
+
+
+class TestConsumptionCache(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.sigfox = FakeSigfox()
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_past_year_is_stored(self):
+        cache = ConsumptionCache(self.sigfox, self.tmpdir)
+        frames, downlinks = cache.get('002C', 2016)
+        assert len(frames) == DAYS
+        assert frames[13] == 3
+        assert downlinks[13] == 1
+
+        cache = ConsumptionCache(self.sigfox, self.tmpdir)
+        totals = cache.totals(['002C', '002D'], 2016)
+        assert totals['002C'] == totals['002D'] == (sum(d % 10 for d in range(366)), 183)
+        assert sorted(self.sigfox.calls) == [('002C', 2016), ('002D', 2016)]
+
+    def test_current_year_is_refreshed(self):
+        year = time.gmtime().tm_year
+        cache = ConsumptionCache(self.sigfox, self.tmpdir, current_ttl=0)
+        cache.get('002C', year)
+        cache.get('002C', year)
+        assert self.sigfox.calls == [('002C', year)] * 2
+        assert ConsumptionStore(self.tmpdir).get('002C', year) is None
+
+        cache = ConsumptionCache(self.sigfox, self.tmpdir)
+        cache.get('002C', year)
+        cache.get('002C', year)
+        assert len(self.sigfox.calls) == 3
+
+
+def test_store_last_record_wins():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        store = ConsumptionStore(tmpdir)
+        store.put('002C', 2015, array.array('I', [1] * DAYS), array.array('I', [0] * DAYS))
+        store.put('002C', 2015, array.array('I', [2] * DAYS), array.array('I', [0] * DAYS))
+        frames, downlinks = ConsumptionStore(tmpdir).get('002C', 2015)
+        assert sum(frames) == 2 * DAYS
+    finally:
+        shutil.rmtree(tmpdir)
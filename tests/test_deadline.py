@@ -0,0 +1,146 @@
+"""
+Test deadlines and cancellation (sigfoxapi.concurrency.deadline)
+
+"""
+
+import socket
+import threading
+import time
+
+from nose.tools import assert_raises
+
+import sigfoxapi
+from sigfoxapi.concurrency import CancelToken, current, deadline
+
+from helpers import make_sigfox, response
+
+
+
+class PagedTransport(object):
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, url, method, payload=None, headers=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        body = {'data': [{'device': '002C', 'time': 1000 - self.calls}],
+                'paging': {'next': 'https://backend.sigfox.com/api/devices/002C/messages?offset=%d' % (self.calls)}}
+        return response(body)
+
+
+class SilentServer(object):
+    """TCP server that accepts connections and never responds."""
+
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen(5)
+        self.url = 'http://127.0.0.1:%d/' % (self.sock.getsockname()[1])
+        self.connections = []
+        thread = threading.Thread(target=self.accept)
+        thread.daemon = True
+        thread.start()
+
+    def accept(self):
+        while True:
+            try:
+                self.connections.append(self.sock.accept()[0])
+            except socket.error:
+                return
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+        self.sock.close()
+
+
+def test_nesting():
+    token = CancelToken()
+    assert current() is None
+    with deadline(10) as outer:
+        with deadline(100, token) as inner:
+            assert inner.deadline == outer.deadline
+            assert inner.tokens == (token,)
+            assert current() is inner
+        with deadline(1) as inner:
+            assert inner.deadline < outer.deadline
+    assert current() is None
+
+
+def test_pages_budget():
+    transport = PagedTransport(delay=0.05)
+    s = make_sigfox(transport)
+    with deadline(0.18):
+        pages = s.pages('device_messages', '002C')
+    # The budget applies to all pages, although they are fetched outside
+    # of the block.
+    with assert_raises(sigfoxapi.SigfoxApiTimeout):
+        for page in pages:
+            pass
+    assert 3 <= transport.calls <= 5
+    assert current() is None
+
+
+def test_cancel_between_pages():
+    token = CancelToken()
+    s = make_sigfox(PagedTransport())
+    received = []
+    with assert_raises(sigfoxapi.SigfoxApiCancelled):
+        with deadline(token=token):
+            for page in s.pages('device_messages', '002C'):
+                received.append(page)
+                if len(received) == 2:
+                    token.cancel()
+    assert len(received) == 2
+
+
+def test_socket_timeout():
+    server = SilentServer()
+    s = sigfoxapi.Sigfox('login', 'password')
+    try:
+        start = time.monotonic()
+        with assert_raises(sigfoxapi.SigfoxApiTimeout):
+            with deadline(0.2):
+                s.api.request._make_request(server.url, 'GET')
+        assert time.monotonic() - start < 2
+    finally:
+        server.close()
+
+
+def test_cancel_in_flight():
+    server = SilentServer()
+    s = sigfoxapi.Sigfox('login', 'password')
+    token = CancelToken()
+    timer = threading.Timer(0.2, token.cancel)
+    timer.start()
+    try:
+        start = time.monotonic()
+        with assert_raises(sigfoxapi.SigfoxApiCancelled):
+            with deadline(30, token):
+                s.api.request._make_request(server.url, 'GET')
+        assert time.monotonic() - start < 2
+    finally:
+        timer.cancel()
+        server.close()
+
+
+def test_coalesced_wait():
+    release = threading.Event()
+
+    def transport(url, method, payload=None, headers=None):
+        release.wait(5)
+        return {'status': '200'}, b'{"id": "002C"}'
+
+    s = make_sigfox(transport)
+    leader = threading.Thread(target=s.device_info, args=('002C',))
+    leader.start()
+    time.sleep(0.05)
+    try:
+        with assert_raises(sigfoxapi.SigfoxApiTimeout):
+            with deadline(0.1):
+                s.device_info('002C')
+    finally:
+        release.set()
+        leader.join()
@@ -0,0 +1,69 @@
+"""
+Test sigfoxapi.dedup
+
+"""
+
+from sigfoxapi.dedup import BloomFilter, ExactFilter, dedup, message_key
+
+NOW = 1500000000
+
+
+def message(age, data='3235353843fc', device='002C'):
+    return {'device': device, 'time': NOW - age, 'data': data, 'snr': '38.2'}
+
+
+MESSAGES = [message(0), message(10), message(0, data='00'), message(0, device='002D')]
+
+
+def check_filter(seen):
+    first = list(dedup(MESSAGES, seen))
+    second = list(dedup(MESSAGES + [message(20)], seen))
+    assert first == MESSAGES
+    assert second == [message(20)]
+
+
+def test_exact():
+    check_filter(ExactFilter())
+
+
+def test_bloom():
+    check_filter(BloomFilter(capacity=1000))
+
+
+def test_default_filter():
+    assert list(dedup(MESSAGES + MESSAGES)) == MESSAGES
+
+
+def test_key_milliseconds():
+    assert message_key(message(0)) == message_key(dict(message(0), time=NOW * 1000))
+    assert list(dedup([message(0), dict(message(0), time=NOW * 1000)])) == [message(0)]
+
+
+def test_retention():
+    seen = ExactFilter(partition=3600, retention=86400)
+    assert list(dedup([message(0)], seen))
+    assert list(dedup([message(2 * 86400)], seen))
+    # Too old to be checked, passed through every time.
+    assert list(dedup([message(2 * 86400)], seen))
+    assert len(seen) == 1
+
+
+def test_eviction():
+    seen = ExactFilter(partition=3600, retention=86400)
+    list(dedup([message(age) for age in range(0, 10 * 86400, 3600)][::-1], seen))
+    assert len(seen) == 25
+
+
+def test_milliseconds():
+    seen = ExactFilter()
+    assert seen.add(b'key', NOW * 1000)
+    assert not seen.add(b'key', NOW * 1000)
+
+
+def test_bloom_error_rate():
+    seen = BloomFilter(capacity=10000, error_rate=0.01)
+    keys = [message_key(message(0, data='%08x' % n)) for n in range(10000)]
+    for key in keys[:5000]:
+        seen.add(key, NOW)
+    false_positives = sum(1 for key in keys[5000:] if not seen.add(key, NOW))
+    assert false_positives < 100
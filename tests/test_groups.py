@@ -0,0 +1,98 @@
+"""
+Test sigfoxapi.groups
+
+"""
+
+import io
+
+from sigfoxapi.groups import GroupTree, GroupCrawler
+
+import helpers
+
+
+def group(groupid, *path):
+    return {'id': groupid, 'name': 'Group ' + groupid, 'path': list(path)}
+
+
+GROUPS = [
+    group('A', 'R'),
+    group('B', 'R'),
+    group('A1', 'R', 'A'),
+    group('A2', 'R', 'A'),
+    group('A3', 'R', 'A'),
+    group('B1', 'R', 'B'),
+    group('A11', 'R', 'A', 'A1'),
+]
+
+
+class FakeSigfox(helpers.FakeSigfox):
+    """Implement `Sigfox.pages('group_list')` over a list of groups."""
+
+    def __init__(self, groups):
+        super(FakeSigfox, self).__init__()
+        self.groups = groups
+
+    def pages(self, method, limit=100, parentId='R'):
+        assert method == 'group_list'
+        children = [g for g in self.groups if g['path'][-1] == parentId]
+        for offset in range(0, max(len(children), 1), limit):
+            self.record(method, parentId)
+            yield children[offset:offset + limit]
+
+
+class TestGroupTree(object):
+
+    def setup(self):
+        self.tree = GroupTree(GROUPS)
+
+    def test_lookups(self):
+        assert len(self.tree) == 7
+        assert self.tree.get('A1')['name'] == 'Group A1'
+        assert self.tree.parent('A11') == 'A1'
+        assert self.tree.parent('A') is None
+        assert sorted(self.tree.roots()) == ['A', 'B']
+        assert self.tree.children('A') == ['A1', 'A2', 'A3']
+        assert self.tree.ancestors('A11') == ['R', 'A', 'A1']
+        assert self.tree.is_descendant('A11', 'A')
+        assert not self.tree.is_descendant('B1', 'A')
+        assert self.tree.depth('A11') == 3
+
+    def test_subtree(self):
+        assert [g['id'] for g in self.tree.subtree('A')] == ['A', 'A1', 'A2', 'A3', 'A11']
+
+    def test_remove(self):
+        self.tree.remove('A1')
+        assert 'A11' not in self.tree
+        assert self.tree.children('A') == ['A2', 'A3']
+
+    def test_dump_parse(self):
+        fp = io.StringIO()
+        self.tree.dump(fp)
+        fp.seek(0)
+        tree = GroupTree.parse(fp)
+        assert len(tree) == 7
+        assert tree.children('A1') == ['A11']
+
+
+class TestGroupCrawler(object):
+
+    def test_crawl(self):
+        sigfox = FakeSigfox(GROUPS)
+        tree = GroupCrawler(sigfox, limit=2).crawl()
+        assert len(tree) == 7
+        assert sorted(tree.children('A')) == ['A1', 'A2', 'A3']
+        # Two pages for the children of 'A'.
+        assert sigfox.calls.count(('group_list', 'A')) == 2
+
+    def test_refresh(self):
+        sigfox = FakeSigfox(GROUPS)
+        crawler = GroupCrawler(sigfox)
+        tree = crawler.crawl()
+
+        sigfox.groups = [g for g in GROUPS if g['id'] != 'A11'] + [group('A21', 'R', 'A', 'A2')]
+        del sigfox.calls[:]
+        crawler.refresh(tree, 'A')
+
+        assert 'A11' not in tree
+        assert tree.children('A2') == ['A21']
+        assert ('group_list', 'B') not in sigfox.calls
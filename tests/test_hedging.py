@@ -0,0 +1,122 @@
+"""
+Test sigfoxapi.hedging
+
+"""
+
+import threading
+import time
+
+import sigfoxapi
+import sigfoxapi.concurrency
+from sigfoxapi.hedging import Hedger
+
+from helpers import make_sigfox, response
+
+
+class SlowTransport(object):
+    """Fast transport except for calls listed in `slow`. Like the real
+       transport, calls return early when they are cancelled.
+    """
+
+    def __init__(self, slow=()):
+        self.slow = set(slow)
+        self.calls = 0
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def __call__(self, url, method, payload=None, headers=None):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            self.threads.append(threading.current_thread())
+        end = time.monotonic() + (0.5 if call in self.slow else 0.005)
+        context = sigfoxapi.concurrency.current()
+        while time.monotonic() < end:
+            if context is not None:
+                context.check()
+            time.sleep(0.001)
+        return response({'id': '002C', 'call': call})
+
+
+def test_hedge_wins():
+    # No duplicates before the 21st request.
+    hedger = Hedger(percentile=90, budget=0.1, min_samples=20)
+    transport = SlowTransport(slow=[21])
+    s = make_sigfox(transport, hedger=hedger)
+    for _ in range(20):
+        s.device_info('002C')
+    assert hedger.delay is not None and hedger.delay < 0.1
+
+    start = time.monotonic()
+    assert s.device_info('002C')['call'] == 22
+    assert time.monotonic() - start < 0.3
+    assert hedger.stats()['hedged'] == 1
+    assert hedger.stats()['wins'] == 1
+    # Only the duplicate is sent from the thread pool.
+    assert transport.threads[20] is threading.current_thread()
+    assert transport.threads[21] is not threading.current_thread()
+    hedger.close()
+
+
+def test_use_after_close():
+    hedger = Hedger(percentile=90, budget=0.1, min_samples=20)
+    transport = SlowTransport(slow=[21])
+    s = make_sigfox(transport, hedger=hedger)
+    for _ in range(20):
+        s.device_info('002C')
+    hedger.close()
+
+    start = time.monotonic()
+    assert s.device_info('002C')['call'] == 22
+    assert time.monotonic() - start < 0.3
+    assert hedger.stats()['wins'] == 1
+    hedger.close()
+
+
+def test_budget_window():
+    # Tokens don't pile up while requests are fast.
+    hedger = Hedger(budget=0.1, burst=1, min_samples=100)
+    s = make_sigfox(SlowTransport(slow=[101, 103]), hedger=hedger)
+    for _ in range(100):
+        s.device_info('002C')
+    assert s.device_info('002C')['call'] == 102
+    assert s.device_info('002C')['call'] == 103
+    stats = hedger.stats()
+    assert stats['hedged'] == 1
+    assert stats['skipped'] == 1
+    hedger.close()
+
+
+def test_concurrency_not_capped():
+    hedger = Hedger(min_samples=1, max_workers=1)
+    transport = SlowTransport(slow=range(1, 5))
+    s = make_sigfox(transport, hedger=hedger)
+    threads = [threading.Thread(target=s.device_info, args=(deviceid,)) for deviceid in ('1', '2', '3', '4')]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - start < 1.0
+    assert set(transport.threads) == set(threads)
+    hedger.close()
+
+
+def test_budget():
+    hedger = Hedger(budget=0.0, min_samples=5)
+    s = make_sigfox(SlowTransport(slow=[6]), hedger=hedger)
+    for _ in range(6):
+        s.device_info('002C')
+    stats = hedger.stats()
+    assert stats['requests'] == 6
+    assert stats['hedged'] == 0
+    assert stats['skipped'] == 1
+    hedger.close()
+
+
+def test_post_not_hedged():
+    hedger = Hedger(min_samples=1)
+    transport = SlowTransport()
+    s = make_sigfox(transport, hedger=hedger)
+    s.devicetype_edit('T1', {'keepAlive': 0})
+    assert hedger.stats()['requests'] == 0
@@ -0,0 +1,30 @@
+"""
+Test that importing sigfoxapi does not load the transport stack.
+
+"""
+
+import subprocess
+import sys
+
+LAZY_MODULES = ['drest', 'httplib2', 'http.client', 'urllib.request', 'sigfoxapi.requesthandler']
+
+
+def loaded_modules(code):
+    code = 'import sys\n%s\nprint(" ".join(sys.modules))' % (code)
+    out = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+    return set(out.split())
+
+
+def test_import_is_lazy():
+    modules = loaded_modules('import sigfoxapi')
+    assert not modules.intersection(LAZY_MODULES)
+
+
+def test_sigfox_is_lazy():
+    modules = loaded_modules('import sigfoxapi\nsigfoxapi.Sigfox("login", "password")')
+    assert not modules.intersection(LAZY_MODULES)
+
+
+def test_api_loads_transport():
+    modules = loaded_modules('import sigfoxapi\nsigfoxapi.Sigfox("login", "password").api')
+    assert modules.issuperset(['drest', 'httplib2', 'sigfoxapi.requesthandler'])
@@ -0,0 +1,117 @@
+"""
+Test sigfoxapi.log
+
+"""
+
+import os
+import shutil
+import tempfile
+
+from sigfoxapi.log import INDEX, MessageLog, MessageLogWriter, RECORD
+
+T0 = 1496275200
+
+
+def messages(count, start=0):
+    return [{'device': '%04X' % (n % 7), 'time': T0 + n * 60, 'data': '%08x' % (n),
+             'snr': '%.1f' % (n % 40 + 0.5),
+             'computedLocation': {'lat': 43.45, 'lng': 6.54, 'radius': 500},
+             'linkQuality': 'GOOD'}
+            for n in range(start, start + count)]
+
+
+class TestMessageLog(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'log')
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write(self, *pages, **kwargs):
+        with MessageLogWriter(self.path, **kwargs) as writer:
+            for page in pages:
+                writer.append(page)
+            return len(writer)
+
+    def test_roundtrip(self):
+        assert self.write(messages(10)) == 10
+        with MessageLog(self.path) as log:
+            assert len(log) == 10
+            record = log[3]
+            assert record.device == '0003'
+            assert record.time == (T0 + 180) * 1000
+            assert bytes(record.payload) == b'\0\0\0\x03'
+            assert record.link_quality == 'GOOD'
+            assert list(log.messages())[5]['snr'] == '5.5'
+            assert list(log.messages())[5]['computedLocation']['radius'] == 500
+            assert [r.time for r in log] == [(T0 + n * 60) * 1000 for n in range(10)]
+            del record
+
+    def test_payload_is_view(self):
+        self.write(messages(3))
+        with MessageLog(self.path) as log:
+            payload = log[1].payload
+            assert isinstance(payload, memoryview)
+            assert payload.obj is log[2].payload.obj
+            del payload
+
+    def test_time_range(self):
+        self.write(messages(50)[::-1], messages(50, start=50), block=8)
+        with MessageLog(self.path) as log:
+            since = (T0 + 20 * 60) * 1000
+            before = (T0 + 70 * 60) * 1000
+            times = sorted(r.time for r in log.records(since=since, before=before))
+            assert times == [(T0 + n * 60) * 1000 for n in range(20, 70)]
+            # Only the blocks overlapping the range plus the unindexed tail are scanned.
+            assert len(list(log._blocks(since, before))) < len(log._index)
+
+    def test_append_after_reopen(self):
+        self.write(messages(5), block=4)
+        with open(self.path + '.rec', 'ab') as fp:
+            fp.write(b'\0' * (RECORD.size // 2))
+        self.write(messages(5, start=5), block=4)
+        with MessageLog(self.path) as log:
+            assert len(log) == 10
+            assert len(log._index) == 2
+            assert bytes(log[9].payload) == b'\0\0\0\x09'
+            assert list(log.records(since=(T0 + 4 * 60) * 1000, before=(T0 + 5 * 60) * 1000))[0].device == '0004'
+
+    def test_reopen_after_crash(self):
+        self.write(messages(6), block=4)
+        # A crash after writing the payloads of a page and part of its
+        # first record.
+        with open(self.path + '.dat', 'ab') as fp:
+            fp.write(b'\xff' * 8)
+        with open(self.path + '.rec', 'ab') as fp:
+            fp.write(b'\0' * (RECORD.size // 2))
+        # A torn index entry.
+        with open(self.path + '.idx', 'ab') as fp:
+            fp.write(b'\0' * (INDEX.size // 2))
+        self.write(messages(6, start=6), block=4)
+        with MessageLog(self.path) as log:
+            assert len(log) == 12
+            assert [entry[2:] for entry in log._index] == [(0, 4), (4, 4), (8, 4)]
+            assert [bytes(r.payload) for r in log] == [b'\0\0\0' + bytes([n]) for n in range(12)]
+            assert log._index[1][:2] == ((T0 + 4 * 60) * 1000, (T0 + 7 * 60) * 1000)
+
+    def test_missing_index_entry(self):
+        self.write(messages(6), block=4)
+        os.remove(self.path + '.idx')
+        self.write(messages(2, start=6), block=4)
+        with MessageLog(self.path) as log:
+            assert [entry[2:] for entry in log._index] == [(0, 4), (4, 4)]
+
+    def test_close_with_payloads(self):
+        self.write(messages(3))
+        log = MessageLog(self.path)
+        payload = log[1].payload
+        log.close()
+        assert bytes(payload) == b'\0\0\0\x01'
+
+    def test_empty(self):
+        self.write([])
+        with MessageLog(self.path) as log:
+            assert len(log) == 0
+            assert list(log) == []
@@ -0,0 +1,53 @@
+"""
+Test sigfoxapi.metrics
+
+"""
+
+from sigfoxapi.metrics import MessageMetrics
+
+import helpers
+
+NOW = 1500000000
+HOUR = 3600
+DAY = 24 * HOUR
+
+
+def messages(deviceid, *ages):
+    return [{'device': deviceid, 'time': NOW - age, 'data': '00'} for age in ages]
+
+
+class FakeSigfox(helpers.FakeSigfox):
+
+    def device_messagemetrics(self, deviceid):
+        return {'lastDay': 2, 'lastWeek': 3, 'lastMonth': 4}
+
+
+class TestMessageMetrics(object):
+
+    def setup(self):
+        self.metrics = MessageMetrics()
+        self.metrics.update(messages('002C', 0, HOUR, 2 * DAY, 10 * DAY, 40 * DAY))
+
+    def test_get(self):
+        assert self.metrics.get('002C', now=NOW) == {'lastDay': 2, 'lastWeek': 3, 'lastMonth': 4}
+        assert self.metrics.get('FFFF', now=NOW) == {'lastDay': 0, 'lastWeek': 0, 'lastMonth': 0}
+
+    def test_windows_move(self):
+        assert self.metrics.get('002C', now=NOW + DAY) == {'lastDay': 0, 'lastWeek': 3, 'lastMonth': 4}
+        assert self.metrics.get('002C', now=NOW + 6 * DAY) == {'lastDay': 0, 'lastWeek': 2, 'lastMonth': 4}
+        assert self.metrics.get('002C', now=NOW + 25 * DAY) == {'lastDay': 0, 'lastWeek': 0, 'lastMonth': 3}
+        assert self.metrics.get('002C', now=NOW + 60 * DAY) == {'lastDay': 0, 'lastWeek': 0, 'lastMonth': 0}
+
+    def test_out_of_order(self):
+        self.metrics.update(messages('002C', 3 * HOUR, 8 * DAY))
+        assert self.metrics.get('002C', now=NOW) == {'lastDay': 3, 'lastWeek': 4, 'lastMonth': 6}
+
+    def test_milliseconds(self):
+        self.metrics.add('002D', NOW * 1000)
+        assert self.metrics.get('002D', now=NOW)['lastDay'] == 1
+
+    def test_reconcile(self):
+        metrics = MessageMetrics()
+        metrics.update(messages('002C', 0, 1, 2 * DAY, 10 * DAY))
+        metrics.update(messages('002D', 0))
+        assert list(metrics.reconcile(FakeSigfox(), now=NOW)) == ['002D']
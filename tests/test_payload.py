@@ -0,0 +1,78 @@
+"""
+Test sigfoxapi.payload
+
+"""
+
+import copy
+import pickle
+
+from nose.tools import assert_raises
+
+import sigfoxapi
+from sigfoxapi.payload import Message, PageBuffer, columnar, messages
+
+PAGE = [{'device': '002C', 'time': 1343321977000, 'data': '3235353843fc'},
+        {'device': '4830', 'time': 1343321978000},
+        {'device': '4831', 'time': 1343321979000, 'data': '0102'}]
+
+
+def test_message():
+    message = Message(PAGE[0])
+    assert message == PAGE[0]
+    assert message.payload == b'2558C\xfc'
+    assert message.payload is message.payload
+    assert Message(PAGE[1]).payload == b''
+
+    with assert_raises(ValueError):
+        Message({'data': 'zz'}).payload
+
+
+def test_object_payload():
+    page = sigfoxapi.Object(PAGE)
+    message = page[0]
+    assert message.payload == b'2558C\xfc'
+    assert message.payload is message.payload
+    assert message.device == '002C'
+    assert sigfoxapi.Object({'data': None}).payload == b''
+    assert sigfoxapi.Object({'payload': 'field'}).payload == 'field'
+
+    # Objects without a data field, such as pages.
+    for obj in (page, page[1], sigfoxapi.Object({'id': '002C'})):
+        with assert_raises(AttributeError):
+            obj.payload
+
+
+def test_messages():
+    result = messages(sigfoxapi.Object(PAGE))
+    assert [message.payload for message in result] == [b'2558C\xfc', b'', b'\x01\x02']
+    assert all(isinstance(message, Message) for message in result)
+
+
+def test_page_buffer():
+    page = PageBuffer(PAGE)
+    assert len(page) == 3
+    assert page.buffer == b'2558C\xfc\x01\x02'
+    assert list(page.offsets) == [0, 6, 6, 8]
+    assert [bytes(message.payload) for message in page] == [b'2558C\xfc', b'', b'\x01\x02']
+    assert isinstance(page[2].payload, memoryview)
+    assert page.payload(2) == b'\x01\x02'
+
+    # Messages can still be copied and pickled.
+    assert pickle.loads(pickle.dumps(page[0])).payload == b'2558C\xfc'
+    assert copy.deepcopy(page[2]).payload == b'\x01\x02'
+
+
+def test_page_buffer_invalid():
+    page = PageBuffer([{'data': '010'}, {'data': '02'}, {'data': 'zz'}])
+    assert page.buffer is None
+    assert page[1].payload == b'\x02'
+    with assert_raises(ValueError):
+        page[0].payload
+    with assert_raises(ValueError):
+        page[2].payload
+
+
+def test_columnar():
+    pages = list(columnar([PAGE, PAGE[:1]]))
+    assert [len(page) for page in pages] == [3, 1]
+    assert pages[1].buffer == b'2558C\xfc'
@@ -0,0 +1,63 @@
+"""
+Test sigfoxapi.pipeline
+
+"""
+
+import binascii
+import concurrent.futures
+import struct
+
+from nose.tools import assert_raises
+
+import sigfoxapi
+from sigfoxapi.pipeline import decode, decode_batch, encode_batch
+
+
+def temperature(device, time, payload):
+    return {'device': device, 'time': time, 'temperature': struct.unpack_from('<h', payload)[0] / 10.0}
+
+
+def pages(count, size):
+    for start in range(0, count, size):
+        yield [{'device': '%04X' % (n % 13), 'time': 1496275200 + n,
+                'data': binascii.hexlify(struct.pack('<h', n - 500)).decode('ascii'), 'snr': '12.5'}
+               for n in range(start, min(count, start + size))]
+
+
+def failing():
+    yield [{'device': '0001', 'time': 1, 'data': '0100'}]
+    raise sigfoxapi.SigfoxApiServerError('500')
+
+
+def test_batch_roundtrip():
+    messages = [{'device': '002C', 'time': 1343321977000, 'data': '3235353843fc'},
+                {'device': '4830', 'time': 1343321978000},
+                {'device': 'ABCDEF01', 'time': 1, 'data': ''}]
+    assert decode_batch(encode_batch(messages)) == [
+        ('002C', 1343321977000, b'2558C\xfc'), ('4830', 1343321978000, b''), ('ABCDEF01', 1, b'')]
+    assert decode_batch(encode_batch([])) == []
+
+    with assert_raises(ValueError):
+        decode_batch(encode_batch([{'device': '002C', 'time': 1, 'data': '123'}]))
+
+
+def test_decode_processes():
+    result = list(decode(pages(2000, 100), temperature, batch=150, max_workers=2))
+    assert len(result) == 2000
+    assert [m['time'] for m in result] == list(range(1496275200, 1496275200 + 2000))
+    assert all(m['decoded']['device'] == m['device'] for m in result)
+    assert result[0]['decoded']['temperature'] == -50.0
+    assert result[0]['snr'] == '12.5'
+
+
+def test_decode_executor():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        stream = decode(pages(1000, 10), temperature, field='t', batch=7, executor=executor)
+        assert next(stream)['t']['temperature'] == -50.0
+        stream.close()
+
+
+def test_decode_error():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        with assert_raises(sigfoxapi.SigfoxApiServerError):
+            list(decode(failing(), temperature, executor=executor))
@@ -0,0 +1,116 @@
+"""
+Test sigfoxapi.planner
+
+"""
+
+from sigfoxapi.metrics import MessageMetrics
+from sigfoxapi.planner import QueryPlanner
+from sigfoxapi.registry import DeviceRegistry
+
+import sigfoxapi
+
+import helpers
+
+NOW = 1496275200
+
+
+class FakeSigfox(helpers.FakeSigfox):
+
+    def __init__(self):
+        super(FakeSigfox, self).__init__(
+            [{'id': 'A%03d' % (n), 'type': 'T1'} for n in range(100)] +
+            [{'id': 'B%03d' % (n), 'type': 'T2'} for n in range(1000)])
+
+    def _messages(self, deviceids, **kwargs):
+        assert kwargs == {'since': NOW - 86400, 'before': NOW, 'limit': 100}
+        assert all(isinstance(value, int) for value in kwargs.values())
+        yield [{'device': d, 'time': (NOW - 60) * 1000} for d in deviceids]
+        yield [{'device': d, 'time': (NOW - 120) * 1000} for d in deviceids]
+
+    def _devicetype_messages(self, devicetypeid, **kwargs):
+        return self._messages([d['id'] for d in self.devices if d['type'] == devicetypeid], **kwargs)
+
+    def _device_messages(self, deviceid, **kwargs):
+        if deviceid.startswith('B9'):
+            # Idle device: the API answers with HTTP 400 if there are no
+            # messages in the window.
+            raise sigfoxapi.SigfoxApiBadRequest('400')
+        for page in self._messages([deviceid], **kwargs):
+            yield page
+
+    def device_messagemetrics(self, deviceid):
+        self.record('device_messagemetrics', deviceid)
+        return {'lastDay': 24, 'lastWeek': 168, 'lastMonth': 720}
+
+
+def make_planner(sigfox, **kwargs):
+    registry = DeviceRegistry(sigfox, devicetypeids=['T1', 'T2'])
+    registry.refresh()
+    return QueryPlanner(sigfox, registry, **kwargs)
+
+
+def test_plan_sampled():
+    sigfox = FakeSigfox()
+    planner = make_planner(sigfox, sample=5)
+    deviceids = ['A%03d' % (n) for n in range(50)] + ['B000', 'B001', 'X999']
+    plan = planner.plan(deviceids, NOW - 86400, NOW)
+
+    assert plan.streams == {'T1': set('A%03d' % (n) for n in range(50))}
+    assert sorted(plan.devices) == ['B000', 'B001', 'X999']
+    # 24 pages for T1, one request for each of the other devices.
+    assert plan.requests == 24 + 3
+    assert len([c for c in sigfox.calls if c[0] == 'device_messagemetrics']) == 5 + 2
+    # The sample is spread over the selected devices.
+    assert sorted(c[1] for c in sigfox.calls if c[1].startswith('A')) == [
+        'A000', 'A010', 'A020', 'A030', 'A040']
+
+
+def test_plan_sample_zero():
+    sigfox = FakeSigfox()
+    planner = make_planner(sigfox, sample=0)
+    plan = planner.plan(['A000', 'A001'], NOW - 86400, NOW)
+    assert sorted(plan.devices) == ['A000', 'A001']
+    assert len([c for c in sigfox.calls if c[0] == 'device_messagemetrics']) == 1
+
+
+def test_plan_local_metrics():
+    sigfox = FakeSigfox()
+    metrics = MessageMetrics()
+    for n in range(100):
+        for hour in range(0 if n < 10 else 23, 24):
+            metrics.add('A%03d' % (n), NOW - 86400 + hour * 3600)
+
+    planner = make_planner(sigfox, metrics=metrics)
+    # Few busy devices: cheaper one by one.
+    plan = planner.plan(['A000', 'A001', 'A002'], NOW - 86400, NOW)
+    assert plan.streams == {}
+    assert plan.requests == 3
+    # Many quiet devices: cheaper as one stream of 330 messages.
+    plan = planner.plan(['A%03d' % (n) for n in range(10, 100)], NOW - 86400, NOW)
+    assert list(plan.streams) == ['T1']
+    assert plan.requests == 4
+    assert not [c for c in sigfox.calls if c[0] == 'device_messagemetrics']
+
+
+def test_execute():
+    sigfox = FakeSigfox()
+    planner = make_planner(sigfox)
+    plan = planner.plan(['A000', 'A001', 'B000'], NOW - 86400 + 0.25, NOW + 0.75)
+    assert (plan.since, plan.before) == (NOW - 86400, NOW)
+    plan.streams = {'T1': set(['A000', 'A001'])}
+    plan.devices = ['B000']
+    messages = list(planner.execute(plan))
+    assert sorted((m['device'], m['time']) for m in messages) == sorted(
+        (d, (NOW - s) * 1000) for d in ('A000', 'A001', 'B000') for s in (60, 120))
+    assert [m['time'] for m in messages] == sorted((m['time'] for m in messages), reverse=True)
+
+
+def test_execute_idle_device():
+    sigfox = FakeSigfox()
+    planner = make_planner(sigfox)
+    plan = planner.plan(['A000'], NOW - 86400, NOW)
+    plan.streams = {}
+    plan.devices = ['A000', 'B900', 'B901']
+    messages = list(planner.execute(plan))
+    assert [(m['device'], m['time']) for m in messages] == [
+        ('A000', (NOW - 60) * 1000), ('A000', (NOW - 120) * 1000)]
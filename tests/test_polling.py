@@ -0,0 +1,105 @@
+"""
+Test sigfoxapi.polling
+
+"""
+
+import os
+import shutil
+import tempfile
+
+import sigfoxapi
+from sigfoxapi.polling import ChangePoller
+
+import helpers
+
+T0 = 1496275200
+
+
+class FakeSigfox(helpers.FakeSigfox):
+
+    def __init__(self, deviceids):
+        super(FakeSigfox, self).__init__({'id': deviceid, 'type': 'T1', 'last': T0} for deviceid in deviceids)
+        self.messages = dict((deviceid, []) for deviceid in deviceids)
+        self.failing = set()
+
+    def send(self, deviceid, time):
+        self.messages[deviceid].insert(0, {'device': deviceid, 'time': time * 1000})
+        for device in self.devices:
+            if device['id'] == deviceid:
+                device['last'] = time
+
+    def fetched(self):
+        return [identifier for method, identifier in self.calls if method == 'device_messages']
+
+    def _device_messages(self, deviceid, limit, since):
+        messages = [m for m in self.messages[deviceid] if m['time'] >= since * 1000]
+        for offset in range(0, len(messages), limit):
+            yield messages[offset:offset + limit]
+            if deviceid in self.failing:
+                raise sigfoxapi.SigfoxApiServerError('500')
+
+
+class TestChangePoller(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'marks.json')
+        self.sigfox = FakeSigfox(['%04X' % (n) for n in range(10)])
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def poller(self, **kwargs):
+        return ChangePoller(self.sigfox, devicetypeids=['T1'], path=self.path, limit=2, **kwargs)
+
+    def test_poll(self):
+        poller = self.poller()
+        assert poller.poll() == {}
+        assert self.sigfox.fetched() == []
+
+        for time in (T0 + 10, T0 + 20, T0 + 30):
+            self.sigfox.send('0003', time)
+        self.sigfox.send('0007', T0 + 15)
+        result = poller.poll()
+        assert sorted(self.sigfox.fetched()) == ['0003', '0007']
+        assert [m['time'] for m in result['0003']] == [(T0 + 30) * 1000, (T0 + 20) * 1000, (T0 + 10) * 1000]
+        assert len(result['0007']) == 1
+        assert poller.skipped == 8
+
+        # Nothing new.
+        del self.sigfox.calls[:]
+        assert poller.poll() == {}
+        assert self.sigfox.fetched() == []
+
+        # Marks survive a restart.
+        self.sigfox.send('0003', T0 + 40)
+        assert [m['time'] for m in self.poller().poll()['0003']] == [(T0 + 40) * 1000]
+
+    def test_since(self):
+        self.sigfox.send('0001', T0 + 10)
+        poller = self.poller(since=T0 + 5)
+        assert list(poller.poll()) == ['0001']
+        assert poller.marks['0001'] == T0 + 10
+        assert poller.marks['0002'] == T0 + 5
+
+    def test_error(self):
+        poller = self.poller()
+        poller.poll()
+        for time in (T0 + 10, T0 + 20, T0 + 30):
+            self.sigfox.send('0003', time)
+        self.sigfox.send('0007', T0 + 15)
+        self.sigfox.failing.add('0003')
+
+        # The messages of 0007 are returned, 0003 keeps its mark.
+        result = poller.poll()
+        assert list(result) == ['0007']
+        assert list(poller.errors) == ['0003']
+        assert isinstance(poller.errors['0003'], sigfoxapi.SigfoxApiServerError)
+        assert poller.marks['0003'] == T0
+        assert poller.marks['0007'] == T0 + 15
+
+        self.sigfox.failing.clear()
+        result = poller.poll()
+        assert [m['time'] for m in result['0003']] == [(T0 + 30) * 1000, (T0 + 20) * 1000, (T0 + 10) * 1000]
+        assert poller.errors == {}
+        assert poller.marks['0003'] == T0 + 30
@@ -0,0 +1,85 @@
+"""
+Test sigfoxapi.pool
+
+"""
+
+import json
+import time
+
+from nose.tools import assert_raises
+
+from sigfoxapi.pool import SigfoxPool
+
+ACCOUNTS = {
+    'north': {'devicetypes': [{'id': 'T1', 'group': 'G1'}, {'id': 'T2', 'group': 'G1'}],
+              'groups': [{'id': 'G3'}]},
+    'south': {'devicetypes': [{'id': 'T3', 'group': 'G2'}], 'groups': []},
+}
+
+
+class Transport(object):
+
+    def __init__(self, name, active):
+        self.name = name
+        self.active = active
+        self.paths = []
+
+    def __call__(self, url, method, payload=None, headers=None):
+        path = url.split('/api', 1)[1].split('?')[0]
+        self.paths.append(path)
+        if path == '/devicetypes':
+            body = ACCOUNTS[self.name]['devicetypes']
+        elif path == '/groups':
+            body = {'data': ACCOUNTS[self.name]['groups'], 'paging': {}}
+        else:
+            self.active.add(self.name)
+            time.sleep(0.05)
+            body = {'account': self.name, 'path': path}
+        return {'status': '200'}, json.dumps(body).encode('utf-8')
+
+
+class TestSigfoxPool(object):
+
+    def setup(self):
+        self.active = set()
+        self.pool = SigfoxPool(dict((name, (name, 'password')) for name in ACCOUNTS), max_workers=2)
+        self.transports = {}
+        for name in self.pool:
+            self.transports[name] = Transport(name, self.active)
+            self.pool[name].api.request._make_request = self.transports[name]
+        assert self.pool.discover() == (3, 3)
+
+    def teardown(self):
+        self.pool.close()
+
+    def test_routing(self):
+        assert self.pool.devicetype_owner('T3') == 'south'
+        assert self.pool.group_owner('G3') == 'north'
+        assert self.pool.for_group('G2') is self.pool['south']
+        with assert_raises(KeyError):
+            self.pool.for_devicetype('T9')
+        self.pool.assign('south', devicetypeids=['T9'])
+        assert self.pool.for_devicetype('T9') is self.pool['south']
+
+    def test_map(self):
+        results = self.pool.map(lambda s, devicetypeid: s.devicetype_info(devicetypeid),
+                                ['T1', 'T3', 'T2'])
+        assert [r['account'] for r in results] == ['north', 'south', 'north']
+        assert [r['path'] for r in results] == ['/devicetypes/T1', '/devicetypes/T3', '/devicetypes/T2']
+        assert self.active == set(['north', 'south'])
+
+    def test_broadcast(self):
+        results = self.pool.broadcast('group_info', 'G1')
+        assert results == {'north': {'account': 'north', 'path': '/groups/G1'},
+                           'south': {'account': 'south', 'path': '/groups/G1'}}
+
+
+def test_rate():
+    pool = SigfoxPool({'a': ('a', 'password'), 'b': ('b', 'password')}, rate=20, max_workers=4)
+    for name in pool:
+        pool[name].api.request._make_request = Transport(name, set())
+    start = time.monotonic()
+    pool.map(lambda s, n: s.device_info('%04X' % (n)), range(8), route=lambda n: 'ab'[n % 2])
+    # Four requests per account at 20 per second, both accounts in parallel.
+    assert 0.14 <= time.monotonic() - start < 0.4
+    pool.close()
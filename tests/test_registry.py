@@ -0,0 +1,78 @@
+"""
+Test sigfoxapi.registry
+
+"""
+
+from sigfoxapi.registry import DeviceRegistry
+
+from helpers import FakeSigfox
+
+
+def device(deviceid, devicetypeid, last, tokenEnd, state=0, contractId='c1'):
+    return {'id': deviceid, 'name': 'Device ' + deviceid, 'type': devicetypeid, 'last': last,
+            'tokenEnd': tokenEnd, 'state': state, 'contractId': contractId}
+
+
+DEVICES = [
+    device('0001', 'T1', 100, 5000),
+    device('0002', 'T1', 200, 4000, contractId='c2'),
+    device('0003', 'T2', 300, 3000, state=1),
+    device('0004', 'T2', 400, 2000),
+]
+
+
+class TestDeviceRegistry(object):
+
+    def setup(self):
+        self.sigfox = FakeSigfox(list(DEVICES))
+        self.registry = DeviceRegistry(self.sigfox, limit=1)
+        assert self.registry.refresh() == (4, 0, 0)
+
+    def test_get(self):
+        assert len(self.registry) == 4
+        assert self.registry.get('0003')['name'] == 'Device 0003'
+        assert self.registry.get('9999') is None
+
+    def test_find(self):
+        assert sorted(d['id'] for d in self.registry.find('contractId', 'c1')) == ['0001', '0003', '0004']
+        assert [d['id'] for d in self.registry.find('state', 1)] == ['0003']
+        assert sorted(d['id'] for d in self.registry.find('type', 'T2')) == ['0003', '0004']
+
+    def test_range(self):
+        assert [d['id'] for d in self.registry.range('tokenEnd', before=4000)] == ['0004', '0003']
+        assert [d['id'] for d in self.registry.range('last', since=200, before=400)] == ['0002', '0003']
+        assert [d['id'] for d in self.registry.range('last', since=300)] == ['0003', '0004']
+
+    def test_refresh(self):
+        self.sigfox.devices = [
+            device('0001', 'T1', 100, 5000),
+            device('0002', 'T1', 250, 4000, contractId='c2'),
+            device('0004', 'T2', 400, 2000),
+            device('0005', 'T2', 500, 1000),
+        ]
+        assert self.registry.refresh() == (1, 1, 1)
+        assert '0003' not in self.registry
+        assert [d['id'] for d in self.registry.range('last', since=200)] == ['0002', '0004', '0005']
+        assert self.registry.find('state', 1) == []
+
+    def test_refresh_bulk(self):
+        self.registry.BULK = 2
+        self.test_refresh()
+        assert [d['id'] for d in self.registry.range('tokenEnd')] == ['0005', '0004', '0002', '0001']
+
+    def test_refresh_devicetype(self):
+        self.sigfox.devices = [device('0001', 'T1', 150, 5000)]
+        assert self.registry.refresh(['T1']) == (0, 1, 1)
+        assert sorted(d['id'] for d in self.registry) == ['0001', '0003', '0004']
+
+    def test_refresh_duplicate(self):
+        # A device that moved while the list was paged is returned twice.
+        self.sigfox.devices = [
+            device('0005', 'T2', 500, 1000),
+            device('0003', 'T2', 300, 3000, state=1),
+            device('0004', 'T2', 400, 2000),
+            device('0005', 'T2', 550, 1000),
+        ]
+        assert self.registry.refresh(['T2']) == (1, 0, 0)
+        assert self.registry.get('0005')['last'] == 550
+        assert [d['id'] for d in self.registry.range('tokenEnd')] == ['0005', '0004', '0003', '0002', '0001']
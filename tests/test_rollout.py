@@ -0,0 +1,200 @@
+"""
+Test sigfoxapi.rollout
+
+"""
+
+import json
+
+import sigfoxapi
+from sigfoxapi.rollout import Action, CallbackReconciler, DeviceTypeRollout, Result, diff_callbacks
+
+import helpers
+
+URL = 'http://myserver.com/sigfox/callback'
+
+
+def callback(url=URL, enabled=True, **kwargs):
+    result = {'channel': 'URL', 'callbackType': 0, 'callbackSubtype': 2,
+              'url': url, 'httpMethod': 'POST', 'enabled': enabled}
+    result.update(kwargs)
+    return result
+
+
+def listed(callbackid, url=URL, enabled=True, **kwargs):
+    """A callback as returned by callback_list()."""
+    result = callback(url, enabled, id=callbackid, dead=False, downlinkHook=False, **kwargs)
+    result['urlPattern'] = result.pop('url')
+    return result
+
+
+class FakeSigfox(helpers.FakeSigfox):
+
+    def __init__(self, callbacks):
+        super(FakeSigfox, self).__init__()
+        self.callbacks = callbacks
+
+    def callback_list(self, devicetypeid):
+        if devicetypeid == 'missing':
+            raise sigfoxapi.SigfoxApiNotFound('404')
+        return [dict(c) for c in self.callbacks.get(devicetypeid, [])]
+
+    def _find(self, devicetypeid, callbackid):
+        return [c for c in self.callbacks[devicetypeid] if c['id'] == callbackid][0]
+
+    def callback_new(self, devicetypeid, callbacks):
+        self.record('callback_new', devicetypeid)
+        with self.lock:
+            for n, new in enumerate(callbacks):
+                new = dict(new, id='new%d' % (n), downlinkHook=False)
+                new['urlPattern'] = new.pop('url')
+                self.callbacks.setdefault(devicetypeid, []).append(new)
+
+    def callback_delete(self, devicetypeid, callbackid):
+        self.record('callback_delete', devicetypeid, callbackid)
+        with self.lock:
+            self.callbacks[devicetypeid].remove(self._find(devicetypeid, callbackid))
+
+    def callback_enable(self, devicetypeid, callbackid):
+        self.record('callback_enable', devicetypeid, callbackid)
+        self._find(devicetypeid, callbackid)['enabled'] = True
+
+    def callback_disable(self, devicetypeid, callbackid):
+        self.record('callback_disable', devicetypeid, callbackid)
+        self._find(devicetypeid, callbackid)['enabled'] = False
+
+    def callback_downlink(self, devicetypeid, callbackid):
+        if devicetypeid == 'broken':
+            raise sigfoxapi.SigfoxApiBadRequest('400')
+        self.record('callback_downlink', devicetypeid, callbackid)
+        for c in self.callbacks[devicetypeid]:
+            c['downlinkHook'] = c['id'] == callbackid
+
+
+def test_diff_up_to_date():
+    assert diff_callbacks('T1', [listed('a', headers={})], [callback()]) == []
+
+
+def test_diff():
+    current = [listed('a', enabled=False), listed('b', url='http://old'), listed('c', url='http://other')]
+    desired = [callback(), callback(url='http://other', downlinkHook=True), callback(url='http://new')]
+    actions = diff_callbacks('T1', current, desired)
+    assert actions == [
+        Action('T1', 'callback_new', ([callback(url='http://new')],)),
+        Action('T1', 'callback_enable', ('a',)),
+        Action('T1', 'callback_downlink', ('c',)),
+        Action('T1', 'callback_delete', ('b',)),
+    ]
+    assert diff_callbacks('T1', current, desired, prune=False)[-1].method == 'callback_downlink'
+
+
+def test_reconcile():
+    sigfox = FakeSigfox({
+        'T1': [listed('a')],
+        'T2': [listed('a', enabled=False), listed('b', url='http://old')],
+        'T3': [],
+    })
+    reconciler = CallbackReconciler(sigfox, [callback(downlinkHook=True)], rate=1000)
+    plan = reconciler.plan(['T1', 'T2', 'T3'])
+    assert [a.method for a in plan['T1']] == ['callback_downlink']
+    assert [a.method for a in plan['T2']] == ['callback_enable', 'callback_downlink', 'callback_delete']
+    assert [a.method for a in plan['T3']] == ['callback_new', 'callback_downlink']
+
+    results = reconciler.apply(plan)
+    assert all(result.error is None for result in results.values())
+    assert ('callback_downlink', 'T3', 'new0') in sigfox.calls
+    for devicetypeid in ('T1', 'T2', 'T3'):
+        assert len(sigfox.callbacks[devicetypeid]) == 1
+        assert sigfox.callbacks[devicetypeid][0]['downlinkHook']
+
+    # Nothing left to do.
+    del sigfox.calls[:]
+    results = reconciler.reconcile(['T1', 'T2', 'T3'])
+    assert results == dict((devicetypeid, Result(devicetypeid, [], None)) for devicetypeid in ('T1', 'T2', 'T3'))
+    assert sigfox.calls == []
+
+
+def test_reconcile_error():
+    sigfox = FakeSigfox({'broken': [listed('a', url='http://old')], 'T1': []})
+    results = CallbackReconciler(sigfox, [callback(downlinkHook=True)], rate=None).reconcile(['broken', 'T1'])
+    assert isinstance(results['broken'].error, sigfoxapi.SigfoxApiBadRequest)
+    assert [a.method for a in results['broken'].applied] == ['callback_new']
+    assert ('callback_delete', 'broken', 'a') not in sigfox.calls
+    assert results['T1'].error is None
+
+
+def test_reconcile_list_error():
+    sigfox = FakeSigfox({'T1': []})
+    results = CallbackReconciler(sigfox, [callback()], rate=None).reconcile(['missing', 'T1'])
+    assert isinstance(results['missing'].error, sigfoxapi.SigfoxApiNotFound)
+    assert results['missing'].applied == []
+    assert [a.method for a in results['T1'].applied] == ['callback_new']
+
+
+class FakeDeviceTypes(object):
+
+    def __init__(self, devicetypes):
+        self.devicetypes = devicetypes
+        self.info = []
+        self.edits = []
+
+    def devicetype_info(self, devicetypeid):
+        if devicetypeid == 'missing':
+            raise sigfoxapi.SigfoxApiNotFound('404')
+        self.info.append(devicetypeid)
+        return dict(self.devicetypes[devicetypeid])
+
+    def devicetype_edit(self, devicetypeid, changes):
+        if devicetypeid == 'broken':
+            raise sigfoxapi.SigfoxApiBadRequest('400')
+        self.edits.append((devicetypeid, changes))
+        self.devicetypes[devicetypeid].update(changes)
+
+
+def test_devicetype_rollout():
+    devicetypes = {
+        'T1': {'id': 'T1', 'name': 'one', 'keepAlive': 3600, 'description': ''},
+        'T2': {'id': 'T2', 'name': 'two', 'keepAlive': 0, 'description': ''},
+        'T3': {'id': 'T3', 'name': 'three', 'keepAlive': 3600, 'description': 'three'},
+        'broken': {'id': 'broken', 'name': 'broken', 'keepAlive': 0},
+    }
+    sigfox = FakeDeviceTypes(devicetypes)
+    rollout = DeviceTypeRollout(sigfox, lambda devicetype: {'keepAlive': 3600,
+                                                            'description': devicetype['name']},
+                                current=[dict(devicetypes['T1'])], rate=None)
+    results = rollout.reconcile(['T1', 'T2', 'T3', 'broken'])
+
+    assert sorted(sigfox.info) == ['T2', 'T3', 'broken']
+    assert sorted(results) == ['T1', 'T2', 'T3', 'broken']
+    assert results['T3'] == Result('T3', [], None)
+    assert results['T1'].applied == [Action('T1', 'devicetype_edit', ({'description': 'one'},))]
+    assert sorted(sigfox.edits) == [('T1', {'description': 'one'}),
+                                    ('T2', {'keepAlive': 3600, 'description': 'two'})]
+    assert isinstance(results['broken'].error, sigfoxapi.SigfoxApiBadRequest)
+    assert results['broken'].applied == []
+
+
+def test_devicetype_rollout_read_error():
+    sigfox = FakeDeviceTypes({'T1': {'id': 'T1', 'keepAlive': 0}})
+    rollout = DeviceTypeRollout(sigfox, {'keepAlive': 3600}, rate=None)
+    plan = rollout.plan(['missing', 'T1'])
+    assert list(plan) == ['T1']
+    assert isinstance(plan.errors['missing'], sigfoxapi.SigfoxApiNotFound)
+
+    results = rollout.apply(plan)
+    assert results['missing'] == Result('missing', [], plan.errors['missing'])
+    assert results['T1'].error is None
+    assert sigfox.edits == [('T1', {'keepAlive': 3600})]
+
+
+def test_devicetype_edit_keeps_changes():
+    requests = []
+
+    def transport(url, method, payload=None, headers=None):
+        requests.append(json.loads(payload))
+        return helpers.response({})
+
+    s = helpers.make_sigfox(transport)
+    changes = {'keepAlive': 3600}
+    s.devicetype_edit('T1', changes)
+    assert changes == {'keepAlive': 3600}
+    assert requests == [{'keepAlive': 3600, 'id': 'T1'}]
@@ -0,0 +1,103 @@
+"""
+Test sigfoxapi.spatial
+
+"""
+
+import os
+import random
+import shutil
+import tempfile
+
+from nose.tools import assert_raises, assert_almost_equal
+
+from sigfoxapi.spatial import SpatialIndex, distance
+
+
+def brute_radius(points, lat, lng, radius):
+    return sorted((distance(lat, lng, plat, plng), key) for key, (plat, plng) in points.items()
+                  if distance(lat, lng, plat, plng) <= radius)
+
+
+class TestSpatialIndex(object):
+
+    def setup(self):
+        self.tmpdir = tempfile.mkdtemp()
+        rnd = random.Random(42)
+        self.points = {}
+        for n in range(500):
+            self.points['D%03d' % (n)] = (43.4 + rnd.uniform(-0.2, 0.2), 1.5 + rnd.uniform(-0.2, 0.2))
+        for n in range(100):
+            self.points['W%03d' % (n)] = (rnd.uniform(-90, 90), rnd.uniform(-180, 180))
+        self.index = SpatialIndex()
+        for key, (lat, lng) in self.points.items():
+            self.index.add(key, lat, lng)
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_distance(self):
+        assert_almost_equal(distance(0, 0, 0, 1), 111195, delta=10)
+        assert_almost_equal(distance(48.8566, 2.3522, 51.5074, -0.1278), 343500, delta=3000)
+
+    def test_radius(self):
+        for lat, lng, radius in [(43.4, 1.5, 2000), (43.5, 1.6, 10000), (43.4, 1.5, 0),
+                                 (89.9, 0, 500000), (0, 179.9, 2000000), (10, -20, 1e8)]:
+            assert self.index.radius(lat, lng, radius) == brute_radius(self.points, lat, lng, radius)
+
+    def test_bbox(self):
+        assert sorted(self.index.bbox(43.3, 1.4, 43.5, 1.6)) == sorted(
+            key for key, (lat, lng) in self.points.items() if 43.3 <= lat <= 43.5 and 1.4 <= lng <= 1.6)
+        # Across the antimeridian
+        assert sorted(self.index.bbox(-90, 170, 90, -170)) == sorted(
+            key for key, (lat, lng) in self.points.items() if lng >= 170 or lng <= -170)
+
+    def test_nearest(self):
+        for lat, lng in [(43.4, 1.5), (-60, 100), (0, 0)]:
+            expected = sorted((distance(lat, lng, plat, plng), key)
+                              for key, (plat, plng) in self.points.items())[:5]
+            assert self.index.nearest(lat, lng, k=5) == expected
+        assert len(self.index.nearest(0, 0, k=1000)) == 600
+
+    def test_update(self):
+        self.index.add('D000', 0.0, 0.0)
+        self.index.remove('D001')
+        self.index.remove('missing')
+        assert self.index.get('D000') == (0.0, 0.0) and 'D001' not in self.index
+        assert self.index.radius(0, 0, 1) == [(0.0, 'D000')]
+        with assert_raises(ValueError):
+            self.index.add('X', 91, 0)
+
+        self.index.update_devices([{'id': 'D002', 'lat': 10, 'lng': 10,
+                                    'computedLocation': {'lat': 20, 'lng': 20}},
+                                   {'id': 'D003'}])
+        assert self.index.get('D002') == (10.0, 10.0) and 'D003' not in self.index
+        self.index.update_devices([{'id': 'D002', 'lat': 10, 'lng': 10,
+                                    'computedLocation': {'lat': 20, 'lng': 20}}], computed=True)
+        assert self.index.get('D002') == (20.0, 20.0)
+
+        self.index.update_locations('002C', [{'time': 1, 'valid': True, 'lat': 1.0, 'lng': 2.0},
+                                             {'time': 2, 'valid': False, 'lat': 3.0, 'lng': 4.0}])
+        assert self.index.get('002C/1') == (1.0, 2.0) and '002C/2' not in self.index
+
+    def test_bulk_update(self):
+        devices = [{'id': key, 'lat': lat, 'lng': lng} for key, (lat, lng) in sorted(self.points.items())]
+        devices[0] = {'id': devices[0]['id']}
+        devices[1]['lat'] = 0.0
+        index = SpatialIndex()
+        index.add(devices[0]['id'], 1.0, 1.0)
+        index.update_devices(devices)
+
+        points = dict(self.points)
+        del points[devices[0]['id']]
+        points[devices[1]['id']] = (0.0, devices[1]['lng'])
+        assert len(index) == len(points)
+        assert index.radius(43.4, 1.5, 20000) == brute_radius(points, 43.4, 1.5, 20000)
+        assert index.radius(0.0, devices[1]['lng'], 1) == [(0.0, devices[1]['id'])]
+
+    def test_persistence(self):
+        path = os.path.join(self.tmpdir, 'index.json')
+        self.index.save(path)
+        loaded = SpatialIndex(path)
+        assert len(loaded) == len(self.index)
+        assert loaded.radius(43.4, 1.5, 5000) == self.index.radius(43.4, 1.5, 5000)
+        assert len(SpatialIndex(os.path.join(self.tmpdir, 'missing.json'))) == 0
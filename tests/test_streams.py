@@ -0,0 +1,87 @@
+"""
+Test sigfoxapi.streams
+
+"""
+
+from nose.tools import assert_raises
+
+import sigfoxapi
+from sigfoxapi.streams import device_events, devicetype_events, merge_pages
+
+import helpers
+
+
+def events(source, times, size=2):
+    """Pages of events, newest first."""
+    times = sorted(times, reverse=True)
+    return [[{'time': t, 'source': source} for t in times[n:n + size]]
+            for n in range(0, len(times), size)]
+
+
+class FakeSigfox(helpers.FakeSigfox):
+
+    def __init__(self, data):
+        super(FakeSigfox, self).__init__()
+        self.data = data
+
+    def pages(self, method, identifier, **kwargs):
+        assert kwargs == {'limit': 2}
+        for page in self.data.get((method, identifier), [[]]):
+            self.record(method, identifier)
+            if page == 'error':
+                raise sigfoxapi.SigfoxApiServerError('500')
+            if page == 'empty':
+                raise sigfoxapi.SigfoxApiBadRequest('400')
+            yield page
+
+
+def test_devicetype_events():
+    sigfox = FakeSigfox({
+        ('devicetype_errors', 'T1'): events('e1', [1000, 5000, 9000, 9500]),
+        ('devicetype_warnings', 'T1'): events('w1', [2000, 6000]),
+        ('devicetype_errors', 'T2'): events('e2', [3000, 9000]),
+    })
+    result = list(devicetype_events(sigfox, ['T1', 'T2'], limit=2))
+    assert [e['time'] for e in result] == [9500, 9000, 9000, 6000, 5000, 3000, 2000, 1000]
+    # Equal times are yielded in the order of the sources.
+    assert [e['source'] for e in result[1:3]] == ['e1', 'e2']
+
+
+def test_lazy():
+    sigfox = FakeSigfox({('device_errors', '0001'): events('a', range(1000, 2000)),
+                         ('device_warnings', '0001'): events('b', range(3000, 4000))})
+    stream = device_events(sigfox, ['0001'], limit=2, prefetch=3)
+    assert [next(stream)['time'] for _ in range(3)] == [3999, 3998, 3997]
+    stream.close()
+    # At most prefetch + 1 pages per source.
+    assert len(sigfox.calls) <= 2 * 4
+
+
+def test_error():
+    sigfox = FakeSigfox({('device_errors', '0001'): events('a', [5, 4]) + ['error']})
+    stream = device_events(sigfox, ['0001'], limit=2)
+    with assert_raises(sigfoxapi.SigfoxApiServerError):
+        list(stream)
+
+
+def test_empty_source():
+    # The API answers with HTTP 400 if there are no events in the window.
+    sigfox = FakeSigfox({
+        ('devicetype_errors', 'A'): events('e', [3000, 1000]),
+        ('devicetype_warnings', 'A'): events('w', [2000]),
+        ('devicetype_errors', 'B'): ['empty'],
+        ('devicetype_warnings', 'B'): ['empty'],
+    })
+    result = list(devicetype_events(sigfox, ['A', 'B'], limit=2))
+    assert [e['time'] for e in result] == [3000, 2000, 1000]
+
+
+def test_bad_request_after_first_page():
+    sigfox = FakeSigfox({('device_errors', '0001'): events('a', [5, 4]) + ['empty']})
+    with assert_raises(sigfoxapi.SigfoxApiBadRequest):
+        list(device_events(sigfox, ['0001'], limit=2))
+
+
+def test_merge_pages_key():
+    result = list(merge_pages([[[1, 4], [], [7]], [[2, 3], [9]]], key=lambda x: x, max_workers=1))
+    assert result == [1, 2, 3, 4, 7, 9]
@@ -0,0 +1,97 @@
+"""
+Test sigfoxapi.tracing
+
+"""
+
+import sigfoxapi
+import sigfoxapi.tracing
+
+from helpers import PageTransport, make_sigfox
+
+PAGES = {
+    'https://backend.sigfox.com/api/devicetypes/1234/messages':
+        {'data': [{'device': '002C', 'time': 1343321977, 'data': '3235353843fc'}],
+         'paging': {'next': 'https://backend.sigfox.com/api/devicetypes/1234/messages?before=1343321977&offset=1'}},
+    'https://backend.sigfox.com/api/devicetypes/1234/messages?before=1343321977&offset=1':
+        {'data': [{'device': '002C', 'time': 1343321900, 'data': '3235353843fd'}],
+         'paging': {}},
+}
+
+
+def make_traced(tracer):
+    return make_sigfox(PageTransport(PAGES), tracer=tracer)
+
+
+class TestRecordingTracer(object):
+
+    def test_phases(self):
+        tracer = sigfoxapi.tracing.RecordingTracer()
+        s = make_traced(tracer)
+        s.devicetype_messages('1234')
+
+        names = [span.name for span in tracer.spans]
+        assert names == ['sigfoxapi.serialize', 'sigfoxapi.transport', 'sigfoxapi.deserialize',
+                         'sigfoxapi.paginate', 'sigfoxapi.request']
+
+        request = tracer.spans[-1]
+        assert all(span.parent is request for span in tracer.spans[:-1])
+        assert request.attributes['sigfoxapi.page'] == 0
+        assert 'sigfoxapi.cursor' not in request.attributes
+        assert tracer.spans[1].attributes['http.status_code'] == 200
+
+    def test_pagination_lineage(self):
+        tracer = sigfoxapi.tracing.RecordingTracer()
+        s = make_traced(tracer)
+        messages = s.devicetype_messages('1234')
+        while s.next:
+            messages += s.next()
+
+        assert len(messages) == 2
+        requests = [span for span in tracer.spans if span.name == 'sigfoxapi.request']
+        assert [span.attributes['sigfoxapi.page'] for span in requests] == [0, 1]
+        assert requests[1].attributes['sigfoxapi.cursor'] == 'before=1343321977&offset=1'
+
+    def test_summary(self):
+        tracer = sigfoxapi.tracing.RecordingTracer()
+        s = make_traced(tracer)
+        s.devicetype_messages('1234')
+        s.next()
+
+        summary = tracer.summary()
+        assert summary['sigfoxapi.request'][0] == 2
+        assert summary['sigfoxapi.transport'][0] == 2
+
+    def test_objects(self):
+        tracer = sigfoxapi.tracing.RecordingTracer()
+        s = make_traced(tracer)
+        sigfoxapi.RETURN_OBJECTS = True
+        try:
+            messages = s.devicetype_messages('1234')
+        finally:
+            sigfoxapi.RETURN_OBJECTS = False
+
+        assert messages[0].device == '002C'
+        assert tracer.spans[-1].name == 'sigfoxapi.request'
+
+
+class OpenTelemetryLikeTracer(sigfoxapi.tracing.RecordingTracer):
+    """Tracer with the signature of the OpenTelemetry ``Tracer``."""
+
+    def start_as_current_span(self, name, context=None, kind=None, attributes=None):
+        assert context is None
+        return super(OpenTelemetryLikeTracer, self).start_as_current_span(name, attributes=attributes)
+
+
+def test_attributes_keyword():
+    tracer = OpenTelemetryLikeTracer()
+    make_traced(tracer).devicetype_messages('1234')
+
+    spans = dict((span.name, span) for span in tracer.spans)
+    assert spans['sigfoxapi.request'].attributes['sigfoxapi.path'] == '/devicetypes/1234/messages'
+    assert spans['sigfoxapi.transport'].attributes['http.method'] == 'GET'
+
+
+def test_null_tracer():
+    s = make_traced(None)
+    assert s.tracer is sigfoxapi.tracing.NULL_TRACER
+    assert s.devicetype_messages('1234')[0]['device'] == '002C'